@@ -24,7 +24,7 @@ if config.config_file_name is not None:
 # for 'autogenerate' support
 from app.core.database import Base
 # 导入所有模型以确保Alembic能检测到它们
-from app.models import Project, MergeRequest, CodeReview, ReviewComment, PromptTemplate
+from app.models import Project, MergeRequest, CodeReview, ReviewComment, PromptTemplate, ProjectSyncState, MergeRequestSyncState, ReviewJob, TokenUsagePrompt
 target_metadata = Base.metadata
 
 # other values from the config, defined by the needs of env.py,
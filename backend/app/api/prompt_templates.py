@@ -19,6 +19,7 @@ from app.schemas.prompt_template import (
     TemplateVariableInfo, AITemplateGenerationRequest, AITemplateGenerationResponse
 )
 from app.services.review_template.template_service import TemplateService, TemplateRenderError
+from app.services.review.template_registry import template_registry
 from app.services.ai import template_generator
 from app.services.task import task_manager, TaskStatus
 from app.services.review_template.template_variables import TemplateVariables
@@ -138,6 +139,7 @@ async def create_prompt_template(
     session.add(db_template)
     await session.commit()
     await session.refresh(db_template)
+    template_registry.invalidate()
     
     response_data = PromptTemplateResponse.model_validate(db_template)
     return response_data
@@ -206,6 +208,8 @@ async def update_prompt_template(
     if template.created_by == "system":
         raise HTTPException(status_code=400, detail="系统默认模板不能修改")
     
+    old_content = template.template_content
+    
     # 更新模板字段
     for field, value in template_update.dict(exclude_unset=True).items():
         setattr(template, field, value)
@@ -213,6 +217,9 @@ async def update_prompt_template(
     template.updated_at = datetime.utcnow()
     await session.commit()
     await session.refresh(template)
+    template_registry.invalidate()
+    if template.template_content != old_content:
+        template_service.invalidate_template(old_content)
     
     response_data = PromptTemplateResponse.model_validate(template)
     return response_data
@@ -237,8 +244,11 @@ async def delete_prompt_template(
     if template.is_default:
         raise HTTPException(status_code=400, detail="默认模板不能删除，请先设置其他模板为默认")
     
+    template_content = template.template_content
     await session.delete(template)
     await session.commit()
+    template_registry.invalidate()
+    template_service.invalidate_template(template_content)
     
     return {"message": "模板删除成功"}
 
@@ -266,6 +276,7 @@ async def set_default_template(
         )
     # 持久化修改，确保默认模板切换真正生效
     await session.commit()
+    template_registry.invalidate()
     
     return {"message": "默认模板设置成功"}
 
@@ -621,6 +632,7 @@ async def save_ai_generated_template(
     session.add(db_template)
     await session.commit()
     await session.refresh(db_template)
+    template_registry.invalidate()
     
     response_data = PromptTemplateResponse.model_validate(db_template)
     return response_data
\ No newline at end of file
@@ -12,7 +12,8 @@ from app.core.database import get_session
 from app.core.security import get_current_user
 from app.models import CodeReview, MergeRequest, TokenUsage
 from app.schemas.review import CodeReviewResponse, ReviewResult
-from app.services.review import ReviewService
+from app.services.ai import ai_service
+from app.services.review import ReviewQueueFullError, ReviewService, diff_minimizer, review_cache, review_executor
 from app.services.task import task_manager, TaskStatus
 
 router = APIRouter()
@@ -79,6 +80,11 @@ async def trigger_review(
                 detail="创建审查记录失败"
             )
         
+    except ReviewQueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -117,6 +123,11 @@ async def trigger_enhanced_review(
             review_id=review.id if review else None
         )
         
+    except ReviewQueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
     except Exception as e:
         return ReviewResult(
             success=False,
@@ -156,6 +167,11 @@ async def trigger_review_with_template(
             review_id=review.id if review else None
         )
         
+    except ReviewQueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
     except Exception as e:
         return ReviewResult(
             success=False,
@@ -278,6 +294,30 @@ async def get_merge_request_reviews(
     }
 
 
+@router.get("/queue/stats", summary="审查队列统计")
+async def get_review_queue_stats(current_user: UserDep):
+    """获取审查队列深度、执行中任务数和排队等待时间"""
+    return await review_executor.stats()
+
+
+@router.get("/cache/stats", summary="审查缓存统计")
+async def get_review_cache_stats(current_user: UserDep):
+    """获取文件级审查缓存的条目数、命中率和淘汰数"""
+    return review_cache.stats()
+
+
+@router.get("/diff-minimizer/stats", summary="diff精简统计")
+async def get_diff_minimizer_stats(current_user: UserDep):
+    """获取diff精简累计节省的字节数和估算token数"""
+    return diff_minimizer.stats()
+
+
+@router.get("/ai-http/stats", summary="AI提供商连接复用统计")
+async def get_ai_http_stats(current_user: UserDep):
+    """获取各AI提供商HTTP客户端的请求数、新建连接数和连接复用率"""
+    return ai_service.get_http_stats()
+
+
 # 异步任务相关API端点
 @router.get("/tasks/{task_id}/status", summary="查询代码审查任务状态")
 async def get_review_task_status(
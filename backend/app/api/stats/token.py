@@ -10,8 +10,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_session
 from app.core.security import get_current_user
-from app.models import TokenUsage, AIModel, CodeReview, MergeRequest, Project
-from app.schemas.statistics import TokenUsageTrend, TokenUsageByModel, TokenUsageByProject
+from app.models import TokenUsage, TokenUsagePrompt, AIModel, CodeReview, MergeRequest, Project
+from app.schemas.statistics import TokenUsageTrend, TokenUsageByModel, TokenUsageByProject, TokenUsageByTemplate
 
 router = APIRouter()
 
@@ -154,6 +154,51 @@ async def get_token_usage_by_project(
     return projects
 
 
+@router.get("/by-template", summary="按模板统计缓存命中率")
+async def get_token_usage_by_template(
+    session: SessionDep,
+    current_user: UserDep,
+    days: int = 30
+):
+    """按模板和提示词布局统计输入token的缓存命中率"""
+    # 计算时间范围
+    from datetime import timedelta
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=days-1)
+    start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    
+    token_by_template_query = select(
+        TokenUsagePrompt.template_name,
+        TokenUsagePrompt.prompt_layout,
+        func.sum(TokenUsage.prompt_tokens).label('prompt_tokens'),
+        func.sum(TokenUsage.cache_tokens).label('cache_tokens'),
+        func.count(TokenUsage.id).label('usage_count')
+    ).select_from(
+        TokenUsage.__table__.join(TokenUsagePrompt.__table__, TokenUsagePrompt.token_usage_id == TokenUsage.id)
+    ).where(
+        TokenUsage.created_at >= start_date,
+        TokenUsage.created_at <= end_date
+    ).group_by(
+        TokenUsagePrompt.template_name, TokenUsagePrompt.prompt_layout
+    ).order_by(func.sum(TokenUsage.prompt_tokens).desc())
+    
+    token_by_template_result = await session.execute(token_by_template_query)
+    templates = []
+    for row in token_by_template_result:
+        prompt_tokens = row.prompt_tokens or 0
+        cache_tokens = row.cache_tokens or 0
+        templates.append(TokenUsageByTemplate(
+            template_name=row.template_name,
+            prompt_layout=row.prompt_layout,
+            prompt_tokens=prompt_tokens,
+            cache_tokens=cache_tokens,
+            cache_hit_ratio=round(cache_tokens / prompt_tokens, 4) if prompt_tokens else 0.0,
+            usage_count=row.usage_count or 0
+        ))
+    
+    return templates
+
+
 @router.get("/summary", summary="获取Token使用汇总")
 async def get_token_summary(
     session: SessionDep,
@@ -12,6 +12,7 @@ from app.core.security import get_current_user
 from app.models.prompt_template import PromptTemplate
 from app.schemas.prompt_template import PromptTemplateResponse
 from app.services.review_template.template_service import TemplateService
+from app.services.review.template_registry import template_registry
 from app.core.logging import get_logger
 
 logger = get_logger("template_standard")
@@ -71,6 +72,7 @@ async def create_standard_template(
         )
         
         if template:
+            template_registry.invalidate()
             response_data = PromptTemplateResponse.model_validate(template)
             return response_data
         else:
@@ -4,7 +4,7 @@ GitLab Webhook处理API路由
 import hashlib
 import hmac
 from typing import Any, Dict, Optional
-from datetime import datetime
+from datetime import datetime, timezone
 
 from fastapi import APIRouter, Request, HTTPException, status, Header
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -12,8 +12,9 @@ from sqlalchemy import select
 
 from app.core.config import settings
 from app.core.database import AsyncSessionLocal
-from app.models import Project, MergeRequest
+from app.models import Project, MergeRequest, MergeRequestSyncState
 from app.services.sync import SyncService
+from app.services.webhook import webhook_queue, WebhookQueueFullError
 from app.core.logging import get_logger
 
 logger = get_logger("webhook")
@@ -61,21 +62,36 @@ async def handle_gitlab_webhook(
             detail=f"Invalid JSON: {str(e)}"
         )
     
-    # 根据事件类型处理
+    # 入队后立即返回，事件由后台worker处理
+    try:
+        queue_result = webhook_queue.enqueue(x_gitlab_event, data)
+    except WebhookQueueFullError as e:
+        logger.error(f"Webhook入队失败: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
+    
+    return {
+        "status": "accepted",
+        "event": x_gitlab_event,
+        **queue_result
+    }
+
+
+async def process_queued_webhook_event(event_type: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """在独立会话中处理队列中的webhook事件"""
     async with AsyncSessionLocal() as session:
         try:
-            result = await process_webhook_event(session, x_gitlab_event, data)
+            result = await process_webhook_event(session, event_type, data)
             await session.commit()
-            logger.info(f"Webhook事件处理成功: {x_gitlab_event}")
             return result
-            
-        except Exception as e:
+        except Exception:
             await session.rollback()
-            logger.error(f"Webhook处理失败: {str(e)}", exc_info=True)
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Error processing webhook: {str(e)}"
-            )
+            raise
+
+
+webhook_queue.set_processor(process_queued_webhook_event)
 
 
 async def process_webhook_event(session: AsyncSession, event_type: str, data: Dict[str, Any]) -> Dict[str, Any]:
@@ -108,23 +124,12 @@ async def handle_merge_request_event(session: AsyncSession, data: Dict[str, Any]
     # 确保项目存在
     project = await get_or_create_project(session, project_data)
     
-    # 获取或创建合并请求
-    mr = await get_or_create_merge_request(session, mr_data, project.id)
+    # 直接用事件载荷更新合并请求，不再回源GitLab拉取
+    mr = await get_or_create_merge_request(session, mr_data, project.id, data.get("user"))
     
-    # 处理具体的动作
     action = mr_data.get("action")
     logger.info(f"合并请求事件: {action} - {mr_data.get('title', 'Unknown')}")
     
-    # 根据动作执行不同的处理
-    if action in ["opened", "reopened", "updated"]:
-        # 触发数据同步
-        try:
-            sync_service = SyncService()
-            sync_result = await sync_service.sync_merge_request(session, mr.gitlab_id, project.gitlab_id)
-            logger.info(f"合并请求同步完成: {sync_result}")
-        except Exception as e:
-            logger.error(f"合并请求同步失败: {str(e)}")
-    
     return {
         "status": "success",
         "event": "Merge Request Hook",
@@ -277,17 +282,68 @@ async def get_or_create_project(session: AsyncSession, project_data: Dict[str, A
     return project
 
 
+def parse_webhook_time(value: Optional[str]) -> Optional[datetime]:
+    """解析webhook中的时间（兼容 ISO8601 与 "2024-01-01 12:00:00 UTC" 两种格式）"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        try:
+            parsed = datetime.strptime(value, "%Y-%m-%d %H:%M:%S %Z")
+        except ValueError:
+            logger.warning(f"无法解析webhook时间: {value}")
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _as_utc(value: datetime) -> datetime:
+    """数据库读出的无时区时间按UTC处理"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+async def mark_merge_request_stats_stale(session: AsyncSession, mr: MergeRequest) -> None:
+    """
+    标记合并请求的变更统计已过期
+    
+    已有状态记录时，其SHA与MR新的SHA不一致即视为过期；没有记录时按当前（旧）SHA补建一条。
+    """
+    result = await session.execute(
+        select(MergeRequestSyncState.id).where(MergeRequestSyncState.merge_request_id == mr.id)
+    )
+    if result.first() is None:
+        session.add(MergeRequestSyncState(merge_request_id=mr.id, stats_commit_sha=mr.last_commit_sha))
+
+
 async def get_or_create_merge_request(
     session: AsyncSession, 
     mr_data: Dict[str, Any], 
-    project_id: int
+    project_id: int,
+    user_data: Optional[Dict[str, Any]] = None
 ) -> MergeRequest:
-    """获取或创建合并请求"""
+    """
+    获取或创建合并请求，字段直接取自webhook的object_attributes
+    
+    提交数、增删行数等统计不在载荷中，SHA变化时标记为过期，由审查或界面按需刷新。
+    """
     gitlab_id = mr_data.get("iid")  # 注意：这里使用iid而不是id
     
     if not gitlab_id:
         raise ValueError("合并请求ID不能为空")
     
+    mr_created_at = parse_webhook_time(mr_data.get("created_at"))
+    mr_updated_at = parse_webhook_time(mr_data.get("updated_at")) or datetime.now(timezone.utc)
+    last_commit_sha = (mr_data.get("last_commit") or {}).get("id")
+    
+    # 载荷中只有author_id，事件触发者恰好是作者时才能拿到用户名
+    author = None
+    if user_data and user_data.get("id") == mr_data.get("author_id"):
+        author = user_data.get("username")
+    
     # 查找现有合并请求
     result = await session.execute(
         select(MergeRequest).where(
@@ -304,27 +360,49 @@ async def get_or_create_merge_request(
             project_id=project_id,
             title=mr_data.get("title", ""),
             description=mr_data.get("description", ""),
-            author=mr_data.get("author", {}).get("username", ""),
+            author=author or "",
             source_branch=mr_data.get("source_branch", ""),
             target_branch=mr_data.get("target_branch", ""),
             state=mr_data.get("state", ""),
-            created_at=mr_data.get("created_at"),
-            updated_at=mr_data.get("updated_at"),
+            mr_created_at=mr_created_at or mr_updated_at,
+            mr_updated_at=mr_updated_at,
+            last_commit_sha=last_commit_sha,
         )
         session.add(mr)
         await session.flush()
+        await mark_merge_request_stats_stale(session, mr)
         logger.info(f"创建新合并请求: {mr.title} (ID: {gitlab_id})")
-    else:
-        # 更新合并请求信息
-        mr.title = mr_data.get("title", mr.title)
-        mr.description = mr_data.get("description", mr.description)
-        mr.state = mr_data.get("state", mr.state)
-        mr.updated_at = mr_data.get("updated_at", mr.updated_at)
-        logger.debug(f"更新合并请求: {mr.title}")
-    
+        return mr
+    
+    # 乱序到达的旧事件不覆盖较新的数据
+    if mr.mr_updated_at and _as_utc(mr.mr_updated_at) > mr_updated_at:
+        logger.debug(f"忽略过期的合并请求事件: {mr.title}")
+        return mr
+    
+    # 更新合并请求信息
+    mr.title = mr_data.get("title", mr.title)
+    mr.description = mr_data.get("description", mr.description)
+    mr.state = mr_data.get("state", mr.state)
+    mr.source_branch = mr_data.get("source_branch", mr.source_branch)
+    mr.target_branch = mr_data.get("target_branch", mr.target_branch)
+    mr.mr_updated_at = mr_updated_at
+    if author:
+        mr.author = author
+    
+    if last_commit_sha and last_commit_sha != mr.last_commit_sha:
+        await mark_merge_request_stats_stale(session, mr)
+        mr.last_commit_sha = last_commit_sha
+    
+    logger.debug(f"更新合并请求: {mr.title}")
     return mr
 
 
+@router.get("/queue/stats", summary="Webhook队列统计")
+async def get_webhook_queue_stats():
+    """获取webhook队列统计信息"""
+    return webhook_queue.stats()
+
+
 @router.get("/test", summary="测试Webhook连接")
 async def test_webhook():
     """测试webhook连接"""
@@ -38,6 +38,24 @@ class Settings(BaseSettings):
     GITLAB_URL: str = "https://gitlab.example.com"
     GITLAB_TOKEN: str = ""
     GITLAB_WEBHOOK_SECRET: str = ""
+    GITLAB_TIMEOUT_SECONDS: int = 30  # GitLab请求超时时间（秒）
+    GITLAB_MAX_CONNECTIONS: int = 20  # GitLab连接池最大连接数
+    GITLAB_MAX_KEEPALIVE_CONNECTIONS: int = 10  # GitLab连接池最大保活连接数
+    GITLAB_HTTP_CACHE_SIZE: int = 1024  # ETag条件请求缓存的最大URL数，0表示不启用
+    GITLAB_RATE_LIMIT_PER_SECOND: float = 10.0  # GitLab请求基础放行速率（请求/秒）
+    GITLAB_RATE_LIMIT_BURST: int = 20  # 限流令牌桶容量
+    GITLAB_RATE_LIMIT_INTERACTIVE_RESERVE: float = 0.2  # 为审查等交互式请求保留的额度比例
+    GITLAB_MAX_RETRIES: int = 3  # 遇到429时的最大重试次数
+    
+    # Webhook配置
+    WEBHOOK_COALESCE_SECONDS: float = 2.0  # 合并窗口，窗口内同一MR的事件只处理一次
+    WEBHOOK_WORKERS: int = 2  # 后台处理webhook事件的worker数
+    WEBHOOK_QUEUE_MAXSIZE: int = 1000  # 最多待处理事件数，超出返回503让GitLab重试
+    
+    # 同步配置
+    SYNC_MAX_CONCURRENCY: int = 8  # 同时同步的项目数
+    SYNC_PROJECT_CONCURRENCY: int = 4  # 单个项目内并发的GitLab请求数
+    SYNC_DIFF_STATS_MODE: str = "diffs"  # diffs: 分页流式统计增删行数, none: 不统计行数，仅使用changes_count
     
     # AI配置
     AI_PROVIDER: str = "deepseek"
@@ -45,6 +63,18 @@ class Settings(BaseSettings):
     AI_MODEL: str = "deepseek-chat"
     AI_MAX_TOKENS: int = 4000
     AI_TIMEOUT_SECONDS: int = 120  # AI请求超时时间（秒）
+    AI_PROMPT_CACHE_AWARE: bool = True  # 静态提示词作为system消息放在最前，提高提供商前缀缓存命中率
+    AI_JSON_MODE_ENABLED: bool = True  # 模型支持时审查请求使用response_format JSON模式
+    AI_STREAM_ENABLED: bool = True  # 模型支持时流式生成，可汇报进度并提前中止
+    AI_STREAM_TOKEN_BUDGET: int = 0  # 流式生成的输出token预算，0表示使用模型max_tokens
+    AI_STREAM_IDLE_TIMEOUT_SECONDS: int = 30  # 流式生成中两次数据之间的最长等待时间
+    AI_HTTP2_ENABLED: bool = True  # 提供商支持时使用HTTP/2（需要安装h2）
+    AI_HTTP_MAX_CONNECTIONS: int = 20  # 每个提供商的最大连接数
+    AI_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10  # 每个提供商保持的空闲连接数
+    AI_HTTP_KEEPALIVE_EXPIRY: float = 30.0  # 空闲连接保持时间（秒）
+    AI_HTTP_KEEPALIVE_EXPIRY_DEEPSEEK: float = 0  # 按提供商覆盖空闲连接保持时间，0表示使用默认值
+    AI_HTTP_KEEPALIVE_EXPIRY_OPENAI: float = 0
+    AI_HTTP_KEEPALIVE_EXPIRY_CLAUDE: float = 0
     
     # 认证配置
     SECRET_KEY: str = "your-secret-key-change-in-production"
@@ -70,6 +100,30 @@ class Settings(BaseSettings):
     REVIEW_SCORE_EXCELLENT: int = 80
     REVIEW_SCORE_GOOD: int = 60
     REVIEW_SCORE_POOR: int = 0
+    REVIEW_DEFAULT_CONCURRENCY: int = 2  # 模型未声明concurrent_requests时每个模型的并发审查数
+    REVIEW_MAX_CONCURRENCY: int = 0  # 单个模型并发审查数上限，0表示按模型能力
+    REVIEW_QUEUE_MAXSIZE: int = 500  # 最多排队的审查任务数
+    REVIEW_JOB_LEASE_SECONDS: int = 120  # 审查任务租约时长，超时未心跳的任务重新入队
+    REVIEW_JOB_HEARTBEAT_SECONDS: int = 30  # 心跳续约间隔
+    REVIEW_JOB_POLL_SECONDS: int = 5  # 空闲时轮询任务表的间隔
+    REVIEW_JOB_MAX_ATTEMPTS: int = 3  # 任务最多执行次数，超过后标记审查失败
+    REVIEW_CHUNK_ENABLED: bool = True  # diff超出模型上下文时按文件/hunk分片审查
+    REVIEW_CHUNK_OUTPUT_RESERVE_TOKENS: int = 2048  # 为模型输出预留的token数
+    REVIEW_CHUNK_MIN_TOKENS: int = 1024  # 单个分片的最小diff预算
+    REVIEW_CHUNK_CONCURRENCY: int = 4  # 单次审查内并发审查的分片数（同时受模型请求并发数限制）
+    REVIEW_MAX_ESTIMATED_COST: float = 0  # 预检估算的单次审查成本上限（按模型定价货币），超出时拒绝，0表示不限制
+    REVIEW_INCREMENTAL_ENABLED: bool = True  # 基于上次完成的审查只审查新变更的文件
+    REVIEW_CACHE_ENABLED: bool = True  # 按文件缓存审查结果，相同diff不再调用模型
+    REVIEW_CACHE_MAXSIZE: int = 5000  # 最多缓存的文件条目数
+    REVIEW_CACHE_TTL_SECONDS: int = 604800  # 缓存条目过期时间（秒），0表示不过期
+    REVIEW_DIFF_MINIMIZE_ENABLED: bool = True  # 渲染Prompt前精简diff，降低token消耗
+    REVIEW_DIFF_DROP_WHITESPACE_HUNKS: bool = True  # 去掉只有空白变化的hunk（缩进敏感的文件保留缩进变化）
+    REVIEW_DIFF_COLLAPSE_RENAMES: bool = True  # 内容未变的重命名只保留一行说明
+    REVIEW_DIFF_COLLAPSE_MOVED_BLOCKS: bool = True  # 折叠原样移动的代码块
+    REVIEW_DIFF_MOVED_BLOCK_MIN_LINES: int = 5  # 视为移动代码块的最少非空行数
+    REVIEW_DIFF_COLLAPSE_GENERATED: bool = True  # 漏过文件过滤的锁文件和生成代码只保留一行说明
+    REVIEW_DIFF_CONTEXT_LINES: int = 3  # 变更行前后保留的上下文行数，-1表示不裁剪
+    REVIEW_TEMPLATE_CACHE_TTL_SECONDS: int = 300  # 审查模板进程内缓存过期时间（秒），0表示只在模板API写入时刷新
     
     # 菜单配置
     MENU_DASHBOARD: bool = True
@@ -0,0 +1,39 @@
+"""
+GitLab客户端共享实例管理
+"""
+from typing import Optional
+
+from app.core.config import settings
+from app.libs.gitlabx import AsyncGitLabClient, GitLabRateLimiter
+
+_gitlab_client: Optional[AsyncGitLabClient] = None
+
+
+def get_gitlab_client() -> AsyncGitLabClient:
+    """获取共享的GitLab异步客户端（复用连接池）"""
+    global _gitlab_client
+    if _gitlab_client is None:
+        _gitlab_client = AsyncGitLabClient(
+            url=settings.GITLAB_URL,
+            token=settings.GITLAB_TOKEN,
+            timeout=settings.GITLAB_TIMEOUT_SECONDS,
+            max_connections=settings.GITLAB_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.GITLAB_MAX_KEEPALIVE_CONNECTIONS,
+            http_cache_size=settings.GITLAB_HTTP_CACHE_SIZE,
+            # 同步与审查共用同一个限流额度
+            rate_limiter=GitLabRateLimiter(
+                rate=settings.GITLAB_RATE_LIMIT_PER_SECOND,
+                burst=settings.GITLAB_RATE_LIMIT_BURST,
+                interactive_reserve=settings.GITLAB_RATE_LIMIT_INTERACTIVE_RESERVE,
+            ),
+            max_retries=settings.GITLAB_MAX_RETRIES,
+        )
+    return _gitlab_client
+
+
+async def close_gitlab_client():
+    """关闭GitLab客户端连接池"""
+    global _gitlab_client
+    if _gitlab_client is not None:
+        await _gitlab_client.aclose()
+        _gitlab_client = None
@@ -9,6 +9,7 @@ from .models.base import ModelDefinition
 from .models.capabilities import ModelCapabilities, ModelPricing
 from .models.registry import ModelRegistry
 from .utils.validation import validate_model_definition
+from .utils.tokens import TokenEstimator, estimate_tokens, get_token_estimator, register_token_estimator
 
 # 全局模型注册器实例
 _registry = ModelRegistry()
@@ -52,5 +53,9 @@ __all__ = [
     "get_model_definition",
     "list_models",
     "register_model",
-    "validate_definition"
+    "validate_definition",
+    "TokenEstimator",
+    "estimate_tokens",
+    "get_token_estimator",
+    "register_token_estimator"
 ]
@@ -98,6 +98,7 @@ class ModelDefinition:
                 "context_window": self.capabilities.context_window,
                 "supports_streaming": self.capabilities.supports_streaming,
                 "supports_function_calling": self.capabilities.supports_function_calling,
+                "supports_json_mode": self.capabilities.supports_json_mode,
                 "supports_code_generation": self.capabilities.supports_code_generation,
                 "supports_code_review": self.capabilities.supports_code_review,
                 "supports_embedding": self.capabilities.supports_embedding,
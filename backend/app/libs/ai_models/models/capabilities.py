@@ -17,6 +17,7 @@ class ModelCapabilities:
     context_window: int = 4096
     supports_streaming: bool = False
     supports_function_calling: bool = False
+    supports_json_mode: bool = False  # 支持response_format JSON模式（结构化输出）
     
     # 功能能力
     supports_code_generation: bool = False
@@ -23,6 +23,7 @@ DEEPSEEK_MODELS = [
                 context_window=8192,
                 supports_streaming=True,
                 supports_function_calling=True,
+                supports_json_mode=True,
                 supports_code_generation=True,
                 supports_code_review=True,
                 response_speed="fast",
@@ -53,6 +53,7 @@ OPENAI_MODELS = [
                 context_window=128000,
                 supports_streaming=True,
                 supports_function_calling=True,
+                supports_json_mode=True,
                 supports_code_generation=True,
                 supports_code_review=True,
                 supports_image_analysis=True,
@@ -83,6 +84,7 @@ OPENAI_MODELS = [
                 context_window=4096,
                 supports_streaming=True,
                 supports_function_calling=True,
+                supports_json_mode=True,
                 supports_code_generation=True,
                 supports_code_review=True,
                 response_speed="fast",
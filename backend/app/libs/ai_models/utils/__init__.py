@@ -1,13 +1,18 @@
 """
 工具类模块
 
-提供模型定义验证等工具函数。
+提供模型定义验证、本地token估算等工具函数。
 """
 
 from .validation import validate_model_definition, validate_capabilities, validate_pricing
+from .tokens import TokenEstimator, estimate_tokens, get_token_estimator, register_token_estimator
 
 __all__ = [
     "validate_model_definition",
     "validate_capabilities", 
-    "validate_pricing"
+    "validate_pricing",
+    "TokenEstimator",
+    "estimate_tokens",
+    "get_token_estimator",
+    "register_token_estimator"
 ]
@@ -0,0 +1,106 @@
+"""
+本地token估算
+
+按提供商家族估算文本和消息的token数，用于请求前的上下文预算和成本预估。
+各家分词器不同，这里按字符类别做近似：ASCII字符按每token字符数折算，
+中文等非ASCII字符按每字符token数折算；安装了tiktoken时OpenAI家族使用精确分词。
+"""
+import importlib.util
+from typing import Dict, Iterable, Optional, Tuple
+
+# tiktoken为可选依赖
+TIKTOKEN_AVAILABLE = importlib.util.find_spec("tiktoken") is not None
+
+
+class TokenEstimator:
+    """基于字符类别的token估算器"""
+
+    def __init__(
+        self,
+        family: str,
+        ascii_chars_per_token: float = 4.0,
+        tokens_per_other_char: float = 1.0,
+        tokens_per_message: int = 4,
+    ):
+        """
+        Args:
+            family: 提供商家族名称
+            ascii_chars_per_token: ASCII文本平均每token字符数
+            tokens_per_other_char: 非ASCII字符（中文等）平均每字符token数
+            tokens_per_message: 每条消息的格式开销（角色、分隔符）
+        """
+        self.family = family
+        self.ascii_chars_per_token = ascii_chars_per_token
+        self.tokens_per_other_char = tokens_per_other_char
+        self.tokens_per_message = tokens_per_message
+
+    @staticmethod
+    def split_chars(text: str) -> Tuple[int, int]:
+        """返回(ASCII字符数, 非ASCII字符数)"""
+        # UTF-8下中文占3字节，用字节数差值近似非ASCII字符数
+        other = (len(text.encode("utf-8")) - len(text)) // 2
+        return len(text) - other, other
+
+    def tokens_for(self, ascii_chars: int, other_chars: int) -> int:
+        """按字符数折算token数"""
+        return int(ascii_chars / self.ascii_chars_per_token + other_chars * self.tokens_per_other_char)
+
+    def count(self, text: str) -> int:
+        """估算文本的token数"""
+        if not text:
+            return 0
+        return self.tokens_for(*self.split_chars(text)) + 1
+
+    def count_messages(self, messages: Iterable[Dict[str, str]]) -> int:
+        """估算一组对话消息的token数（含每条消息的格式开销）"""
+        return sum(self.count(message.get("content") or "") + self.tokens_per_message for message in messages)
+
+
+class TiktokenEstimator(TokenEstimator):
+    """使用tiktoken精确计数的估算器，流式增量计数仍按字符类别折算"""
+
+    def __init__(self, family: str, encoding: str = "cl100k_base", **kwargs):
+        super().__init__(family, **kwargs)
+        import tiktoken
+        self._encoding = tiktoken.get_encoding(encoding)
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+
+_estimators: Dict[str, TokenEstimator] = {}
+_default_estimator = TokenEstimator("default")
+
+
+def register_token_estimator(family: str, estimator: TokenEstimator) -> None:
+    """注册提供商家族的token估算器"""
+    _estimators[family.lower()] = estimator
+
+
+def get_token_estimator(family: Optional[str] = None) -> TokenEstimator:
+    """获取提供商家族的token估算器，未注册时使用通用估算"""
+    if not family:
+        return _default_estimator
+    return _estimators.get(family.lower(), _default_estimator)
+
+
+def estimate_tokens(text: str, family: Optional[str] = None) -> int:
+    """按提供商家族估算文本token数"""
+    return get_token_estimator(family).count(text)
+
+
+def _init_default_estimators() -> None:
+    # DeepSeek官方换算：1个英文字符约0.3 token，1个中文字符约0.6 token
+    register_token_estimator("deepseek", TokenEstimator("deepseek", ascii_chars_per_token=3.3, tokens_per_other_char=0.6))
+    # Claude分词器对英文约3.5字符/token，中文接近1字符/token
+    register_token_estimator("claude", TokenEstimator("claude", ascii_chars_per_token=3.5, tokens_per_other_char=1.0, tokens_per_message=3))
+    openai_options = {"ascii_chars_per_token": 4.0, "tokens_per_other_char": 1.0, "tokens_per_message": 4}
+    if TIKTOKEN_AVAILABLE:
+        register_token_estimator("openai", TiktokenEstimator("openai", **openai_options))
+    else:
+        register_token_estimator("openai", TokenEstimator("openai", **openai_options))
+
+
+_init_default_estimators()
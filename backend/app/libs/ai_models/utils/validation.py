@@ -108,7 +108,7 @@ def _validate_capabilities(capabilities: ModelCapabilities) -> None:
     
     # 布尔值验证
     bool_fields = [
-        "supports_streaming", "supports_function_calling", "supports_code_generation",
+        "supports_streaming", "supports_function_calling", "supports_json_mode", "supports_code_generation",
         "supports_code_review", "supports_embedding", "supports_image_analysis"
     ]
     
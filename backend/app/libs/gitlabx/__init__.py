@@ -2,11 +2,18 @@
 GitLabX - GitLab API 封装库
 """
 from .client import GitLabClient
+from .async_client import AsyncGitLabClient
+from .rate_limiter import GitLabRateLimiter, request_priority, PRIORITY_BULK, PRIORITY_INTERACTIVE
 from .models import ProjectInfo, MergeRequestInfo, PaginationInfo
 from .exceptions import GitLabError, GitLabConnectionError, GitLabAuthError
 
 __all__ = [
     "GitLabClient",
+    "AsyncGitLabClient",
+    "GitLabRateLimiter",
+    "request_priority",
+    "PRIORITY_BULK",
+    "PRIORITY_INTERACTIVE",
     "ProjectInfo",
     "MergeRequestInfo", 
     "PaginationInfo",
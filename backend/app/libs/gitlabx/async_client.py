@@ -0,0 +1,745 @@
+"""
+GitLabX 异步客户端
+
+基于共享连接池的 httpx.AsyncClient 直接调用 GitLab REST API v4，
+与 GitLabClient 保持相同的方法签名，但所有方法均为协程，不会阻塞事件循环。
+"""
+from datetime import datetime
+from types import SimpleNamespace
+from typing import List, Optional, AsyncIterator, Tuple, Dict, Any, Callable, TypeVar
+from urllib.parse import urlparse, quote
+
+import httpx
+
+from .models import ProjectInfo, MergeRequestInfo, CommitInfo, PaginationInfo, FileChangeInfo
+from .diff_utils import count_diff_lines
+from .rate_limiter import GitLabRateLimiter
+from .exceptions import (
+    GitLabError,
+    GitLabConnectionError,
+    GitLabAuthError,
+    GitLabPermissionError,
+    GitLabNotFoundError,
+    GitLabRateLimitError,
+)
+from app.core.cache import LRUCache
+from app.core.logging import get_logger
+
+logger = get_logger("gitlab_async_client")
+
+T = TypeVar("T")
+
+
+class AsyncGitLabClient:
+    """GitLab API 异步客户端封装"""
+
+    def __init__(
+        self,
+        url: str,
+        token: str,
+        timeout: int = 30,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        http_cache_size: int = 1024,
+        rate_limiter: Optional[GitLabRateLimiter] = None,
+        max_retries: int = 3,
+    ):
+        """
+        初始化GitLab异步客户端
+
+        Args:
+            url: GitLab实例URL
+            token: 访问令牌
+            timeout: 请求超时时间
+            max_connections: 连接池最大连接数
+            max_keepalive_connections: 连接池最大保活连接数
+            keepalive_expiry: 保活连接空闲过期时间（秒）
+            http_cache_size: 条件请求缓存的最大URL数，0表示不启用
+            rate_limiter: 共享限流器，None表示不限流
+            max_retries: 遇到429时的最大重试次数
+        """
+        self.url = self._normalize_url(url)
+        self.token = token
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+
+        self._client = httpx.AsyncClient(
+            base_url=f"{self.url}/api/v4",
+            headers={"PRIVATE-TOKEN": token},
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+
+        # 条件请求缓存：URL -> (ETag, Last-Modified, 解析后的结果)
+        self._http_cache = LRUCache(maxsize=http_cache_size)
+
+    def _normalize_url(self, url: str) -> str:
+        """标准化URL格式"""
+        if not url.startswith(('http://', 'https://')):
+            url = f"http://{url}"
+
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}"
+
+    @staticmethod
+    def _project_ref(project_id: Any) -> str:
+        """项目ID或路径（路径需要URL编码）"""
+        return quote(str(project_id), safe="")
+
+    def _handle_response_error(self, response: httpx.Response) -> None:
+        """处理GitLab响应错误"""
+        if response.is_success:
+            return
+
+        detail = f"{response.status_code} {response.text[:200]}"
+        if response.status_code == 401:
+            raise GitLabAuthError(f"认证失败: {detail}")
+        elif response.status_code == 403:
+            raise GitLabPermissionError(f"权限不足: {detail}")
+        elif response.status_code == 404:
+            raise GitLabNotFoundError(f"资源不存在: {detail}")
+        elif response.status_code == 429:
+            raise GitLabRateLimitError(f"API限流: {detail}")
+        else:
+            raise GitLabError(f"GitLab API错误: {detail}")
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> httpx.Response:
+        """发送请求并统一处理异常（经过共享限流器，429时按Retry-After重试）"""
+        attempt = 0
+        while True:
+            if self.rate_limiter:
+                await self.rate_limiter.acquire()
+
+            try:
+                response = await self._client.request(method, path, params=params, json=json, headers=headers)
+            except httpx.TimeoutException as e:
+                raise GitLabConnectionError(f"GitLab请求超时: {e}")
+            except httpx.TransportError as e:
+                raise GitLabConnectionError(f"GitLab连接失败: {e}")
+
+            if self.rate_limiter:
+                self.rate_limiter.update_from_response(response.status_code, response.headers)
+
+            if response.status_code == 429 and self.rate_limiter and attempt < self.max_retries:
+                attempt += 1
+                logger.warning(f"GitLab限流，第{attempt}次重试: {method} {path}")
+                continue
+            break
+
+        if response.status_code == 304:
+            return response
+
+        self._handle_response_error(response)
+        return response
+
+    async def _get_conditional(
+        self,
+        path: str,
+        params: Optional[Dict[str, Any]],
+        parse: Callable[[httpx.Response], T],
+    ) -> T:
+        """
+        带ETag/Last-Modified的条件GET请求
+
+        已缓存的URL会携带 If-None-Match / If-Modified-Since，
+        GitLab返回304时直接复用上次解析好的结果，省去传输和解析开销。
+        """
+        cache_key = (path, tuple(sorted((params or {}).items())))
+        cached = self._http_cache.peek(cache_key)
+
+        headers = {}
+        if cached:
+            etag, last_modified, _ = cached
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        response = await self._request("GET", path, params=params, headers=headers or None)
+
+        if response.status_code == 304 and cached:
+            self._http_cache.record_hit()
+            self._http_cache.set(cache_key, cached)
+            return cached[2]
+
+        self._http_cache.record_miss()
+        result = parse(response)
+
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            self._http_cache.set(cache_key, (etag, last_modified, result))
+
+        return result
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """条件请求缓存统计"""
+        return self._http_cache.stats()
+
+    def rate_limit_stats(self) -> Optional[Dict[str, Any]]:
+        """限流器统计"""
+        return self.rate_limiter.stats() if self.rate_limiter else None
+
+    async def _get_json(self, path: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """GET请求并返回JSON"""
+        response = await self._request("GET", path, params=params)
+        return response.json()
+
+    @staticmethod
+    def _build_pagination(response: httpx.Response, page: int, per_page: int) -> PaginationInfo:
+        """从GitLab分页响应头构建分页信息"""
+        def _int_header(name: str) -> Optional[int]:
+            value = response.headers.get(name)
+            return int(value) if value and value.isdigit() else None
+
+        return PaginationInfo(
+            page=page,
+            per_page=per_page,
+            total_pages=_int_header("X-Total-Pages"),
+            total_items=_int_header("X-Total"),
+            has_next=bool(response.headers.get("X-Next-Page")),
+        )
+
+    # 项目相关方法
+    async def get_projects(
+        self,
+        page: int = 1,
+        per_page: int = 100,
+        owned: bool = False,
+        membership: bool = True,
+        search: Optional[str] = None,
+        visibility: Optional[str] = None,
+    ) -> Tuple[List[ProjectInfo], PaginationInfo]:
+        """
+        获取项目列表
+
+        Args:
+            page: 页码
+            per_page: 每页数量
+            owned: 仅获取拥有的项目
+            membership: 获取有成员权限的项目
+            search: 搜索关键词
+            visibility: 可见性过滤 (public, internal, private)
+
+        Returns:
+            (项目列表, 分页信息)
+        """
+        params: Dict[str, Any] = {
+            'page': page,
+            'per_page': per_page,
+            'owned': str(owned).lower(),
+            'membership': str(membership).lower(),
+        }
+        if search:
+            params['search'] = search
+        if visibility:
+            params['visibility'] = visibility
+
+        def _parse(response: httpx.Response) -> Tuple[List[ProjectInfo], PaginationInfo]:
+            project_infos = []
+            for item in response.json():
+                try:
+                    project_infos.append(ProjectInfo.from_gitlab_project(SimpleNamespace(**item)))
+                except Exception as e:
+                    logger.warning(f"转换项目信息失败 {item.get('name')}: {e}")
+                    continue
+            return project_infos, self._build_pagination(response, page, per_page)
+
+        return await self._get_conditional("/projects", params, _parse)
+
+    async def get_project(self, project_id: int) -> ProjectInfo:
+        """
+        获取单个项目信息
+
+        Args:
+            project_id: 项目ID
+
+        Returns:
+            项目信息
+        """
+        return await self._get_conditional(
+            f"/projects/{self._project_ref(project_id)}",
+            None,
+            lambda response: ProjectInfo.from_gitlab_project(SimpleNamespace(**response.json())),
+        )
+
+    async def get_project_by_path(self, project_path: str) -> ProjectInfo:
+        """
+        通过路径获取项目信息
+
+        Args:
+            project_path: 项目路径 (如 namespace/project)
+
+        Returns:
+            项目信息
+        """
+        return await self.get_project(project_path)
+
+    # 合并请求相关方法
+    async def get_merge_requests(
+        self,
+        project_id: int,
+        state: str = "opened",
+        page: int = 1,
+        per_page: int = 100,
+        order_by: str = "created_at",
+        sort: str = "desc",
+        source_branch: Optional[str] = None,
+        target_branch: Optional[str] = None,
+        author_id: Optional[int] = None,
+        updated_after: Optional[datetime] = None,
+    ) -> Tuple[List[MergeRequestInfo], PaginationInfo]:
+        """
+        获取合并请求列表
+
+        Args:
+            project_id: 项目ID
+            state: 状态 (opened, closed, merged, all)
+            page: 页码
+            per_page: 每页数量
+            order_by: 排序字段 (created_at, updated_at, title)
+            sort: 排序方向 (asc, desc)
+            source_branch: 源分支
+            target_branch: 目标分支
+            author_id: 作者ID
+            updated_after: 仅返回该时间之后更新的合并请求
+
+        Returns:
+            (合并请求列表, 分页信息)
+        """
+        params: Dict[str, Any] = {
+            'state': state,
+            'page': page,
+            'per_page': per_page,
+            'order_by': order_by,
+            'sort': sort,
+        }
+        if source_branch:
+            params['source_branch'] = source_branch
+        if target_branch:
+            params['target_branch'] = target_branch
+        if author_id:
+            params['author_id'] = author_id
+        if updated_after:
+            params['updated_after'] = updated_after.isoformat()
+
+        def _parse(response: httpx.Response) -> Tuple[List[MergeRequestInfo], PaginationInfo]:
+            mr_infos = []
+            for item in response.json():
+                try:
+                    mr_infos.append(MergeRequestInfo.from_gitlab_mr(SimpleNamespace(**item)))
+                except Exception as e:
+                    logger.warning(f"转换合并请求信息失败 {item.get('title')}: {e}")
+                    continue
+            return mr_infos, self._build_pagination(response, page, per_page)
+
+        return await self._get_conditional(
+            f"/projects/{self._project_ref(project_id)}/merge_requests", params, _parse
+        )
+
+    async def get_merge_request(self, project_id: int, mr_iid: int) -> MergeRequestInfo:
+        """
+        获取单个合并请求信息
+
+        Args:
+            project_id: 项目ID
+            mr_iid: 合并请求IID
+
+        Returns:
+            合并请求信息
+        """
+        return await self._get_conditional(
+            f"/projects/{self._project_ref(project_id)}/merge_requests/{mr_iid}",
+            None,
+            lambda response: MergeRequestInfo.from_gitlab_mr(SimpleNamespace(**response.json())),
+        )
+
+    @staticmethod
+    def _parse_file_change(change: Dict[str, Any]) -> FileChangeInfo:
+        """解析GitLab返回的单个文件diff"""
+        return FileChangeInfo(
+            old_path=change.get('old_path'),
+            new_path=change.get('new_path'),
+            new_file=change.get('new_file', False),
+            renamed_file=change.get('renamed_file', False),
+            deleted_file=change.get('deleted_file', False),
+            diff=change.get('diff') or '',
+            too_large=bool(change.get('too_large')),
+            collapsed=bool(change.get('collapsed')),
+        )
+
+    async def get_merge_request_changes(
+        self,
+        project_id: int,
+        mr_iid: int
+    ) -> List[FileChangeInfo]:
+        """
+        获取合并请求的文件变更
+
+        Args:
+            project_id: 项目ID
+            mr_iid: 合并请求IID
+
+        Returns:
+            文件变更列表
+        """
+        data = await self._get_json(
+            f"/projects/{self._project_ref(project_id)}/merge_requests/{mr_iid}/changes"
+        )
+        if data.get('overflow'):
+            logger.warning(f"合并请求变更超过GitLab限制，部分文件未返回: project {project_id} mr {mr_iid}")
+
+        return [
+            self._parse_file_change(change)
+            for change in data.get('changes', [])
+        ]
+
+    async def get_merge_request_commits(
+        self,
+        project_id: int,
+        mr_iid: int
+    ) -> List[CommitInfo]:
+        """
+        获取合并请求的提交列表
+
+        Args:
+            project_id: 项目ID
+            mr_iid: 合并请求IID
+
+        Returns:
+            提交列表
+        """
+        path = f"/projects/{self._project_ref(project_id)}/merge_requests/{mr_iid}/commits"
+        commit_infos = []
+        page = 1
+
+        while True:
+            response = await self._request("GET", path, params={'page': page, 'per_page': 100})
+            for item in response.json():
+                try:
+                    commit_infos.append(CommitInfo.from_gitlab_commit(SimpleNamespace(**item)))
+                except Exception as e:
+                    logger.warning(f"转换提交信息失败 {item.get('id')}: {e}")
+                    continue
+
+            if not response.headers.get("X-Next-Page"):
+                break
+            page += 1
+
+        return commit_infos
+
+    async def iter_merge_request_diffs(
+        self,
+        project_id: int,
+        mr_iid: int,
+        per_page: int = 20
+    ) -> AsyncIterator[FileChangeInfo]:
+        """
+        分页流式获取合并请求的文件diff（/merge_requests/:iid/diffs）
+
+        每次只在内存中保留一页文件，适合超大合并请求。
+
+        Args:
+            project_id: 项目ID
+            mr_iid: 合并请求IID
+            per_page: 每页文件数
+
+        Yields:
+            文件变更信息
+        """
+        path = f"/projects/{self._project_ref(project_id)}/merge_requests/{mr_iid}/diffs"
+        page = 1
+
+        while True:
+            response = await self._request("GET", path, params={'page': page, 'per_page': per_page})
+            for change in response.json():
+                yield self._parse_file_change(change)
+
+            if not response.headers.get("X-Next-Page"):
+                break
+            page += 1
+
+    async def get_merge_request_changes_stats(
+        self,
+        project_id: int,
+        mr_iid: int
+    ) -> Dict[str, int]:
+        """
+        获取合并请求的变更统计信息
+
+        基于分页diff接口流式计数，内存占用与单页大小相关而与MR规模无关；
+        GitLab版本过低不支持 /diffs 时退化为 /changes。
+
+        Args:
+            project_id: 项目ID
+            mr_iid: 合并请求IID
+
+        Returns:
+            变更统计信息 {'additions': 新增行数, 'deletions': 删除行数, 'total': 总变更行数, 'files': 文件数}
+        """
+        total_additions = 0
+        total_deletions = 0
+        total_files = 0
+
+        try:
+            async for change in self.iter_merge_request_diffs(project_id, mr_iid):
+                additions, deletions = count_diff_lines(change.diff)
+                total_additions += additions
+                total_deletions += deletions
+                total_files += 1
+        except GitLabNotFoundError:
+            if total_files:
+                raise
+            logger.debug(f"diffs接口不可用，退化为changes接口: project {project_id} mr {mr_iid}")
+            for change in await self.get_merge_request_changes(project_id, mr_iid):
+                additions, deletions = count_diff_lines(change.diff)
+                total_additions += additions
+                total_deletions += deletions
+                total_files += 1
+
+        return {
+            'additions': total_additions,
+            'deletions': total_deletions,
+            'total': total_additions + total_deletions,
+            'files': total_files,
+        }
+
+    async def compare_commits(
+        self,
+        project_id: int,
+        from_sha: str,
+        to_sha: str,
+    ) -> Dict[str, Any]:
+        """
+        比较两个提交（/repository/compare）
+
+        Args:
+            project_id: 项目ID
+            from_sha: 起始提交
+            to_sha: 目标提交
+
+        Returns:
+            {"diffs": 文件变更列表, "commits_count": 提交数, "compare_timeout": 是否超时（diff不完整）}
+        """
+        data = await self._get_json(
+            f"/projects/{self._project_ref(project_id)}/repository/compare",
+            params={'from': from_sha, 'to': to_sha},
+        )
+
+        return {
+            'diffs': [self._parse_file_change(change) for change in data.get('diffs', [])],
+            'commits_count': len(data.get('commits') or []),
+            'compare_timeout': bool(data.get('compare_timeout')),
+        }
+
+    async def create_merge_request_note(
+        self,
+        project_id: int,
+        mr_iid: int,
+        body: str,
+    ) -> Dict[str, Any]:
+        """
+        在合并请求中创建评论
+
+        Args:
+            project_id: 项目ID
+            mr_iid: 合并请求IID
+            body: 评论内容
+
+        Returns:
+            评论信息
+        """
+        response = await self._request(
+            "POST",
+            f"/projects/{self._project_ref(project_id)}/merge_requests/{mr_iid}/notes",
+            json={'body': body},
+        )
+        note = response.json()
+
+        return {
+            'id': note.get('id'),
+            'body': note.get('body'),
+            'author': note.get('author'),
+            'created_at': note.get('created_at'),
+            'updated_at': note.get('updated_at'),
+        }
+
+    async def get_file_content(
+        self,
+        project_id: int,
+        file_path: str,
+        ref: str = "main"
+    ) -> str:
+        """
+        获取文件内容
+
+        Args:
+            project_id: 项目ID
+            file_path: 文件路径
+            ref: 分支或提交ID
+
+        Returns:
+            文件内容
+        """
+        response = await self._request(
+            "GET",
+            f"/projects/{self._project_ref(project_id)}/repository/files/{quote(file_path, safe='')}/raw",
+            params={'ref': ref},
+        )
+        return response.text
+
+    async def get_repository_tree(
+        self,
+        project_id: int,
+        path: str = "",
+        ref: str = "main",
+        recursive: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        获取仓库目录树
+
+        Args:
+            project_id: 项目ID
+            path: 路径
+            ref: 分支或提交ID
+            recursive: 是否递归
+
+        Returns:
+            目录树列表
+        """
+        tree = []
+        page = 1
+
+        while True:
+            response = await self._request(
+                "GET",
+                f"/projects/{self._project_ref(project_id)}/repository/tree",
+                params={
+                    'path': path,
+                    'ref': ref,
+                    'recursive': str(recursive).lower(),
+                    'page': page,
+                    'per_page': 100,
+                },
+            )
+            tree.extend(
+                {
+                    'id': item['id'],
+                    'name': item['name'],
+                    'type': item['type'],
+                    'path': item['path'],
+                    'mode': item['mode'],
+                }
+                for item in response.json()
+            )
+
+            if not response.headers.get("X-Next-Page"):
+                break
+            page += 1
+
+        return tree
+
+    async def iter_all_projects(
+        self,
+        per_page: int = 100,
+        **kwargs
+    ) -> AsyncIterator[ProjectInfo]:
+        """
+        迭代获取所有项目
+
+        Args:
+            per_page: 每页数量
+            **kwargs: 其他过滤参数
+
+        Yields:
+            项目信息
+        """
+        page = 1
+        while True:
+            try:
+                projects, pagination = await self.get_projects(
+                    page=page,
+                    per_page=per_page,
+                    **kwargs
+                )
+            except Exception as e:
+                logger.error(f"迭代项目失败 (page {page}): {e}")
+                break
+
+            for project in projects:
+                yield project
+
+            if not pagination.has_next:
+                break
+
+            page += 1
+
+    async def iter_all_merge_requests(
+        self,
+        project_id: int,
+        per_page: int = 100,
+        **kwargs
+    ) -> AsyncIterator[MergeRequestInfo]:
+        """
+        迭代获取项目的所有合并请求
+
+        Args:
+            project_id: 项目ID
+            per_page: 每页数量
+            **kwargs: 其他过滤参数
+
+        Yields:
+            合并请求信息
+        """
+        page = 1
+        while True:
+            try:
+                merge_requests, pagination = await self.get_merge_requests(
+                    project_id=project_id,
+                    page=page,
+                    per_page=per_page,
+                    **kwargs
+                )
+            except Exception as e:
+                logger.error(f"迭代合并请求失败 (page {page}): {e}")
+                break
+
+            for mr in merge_requests:
+                yield mr
+
+            if not pagination.has_next:
+                break
+
+            page += 1
+
+    async def test_connection(self) -> bool:
+        """
+        测试GitLab连接
+
+        Returns:
+            连接是否成功
+        """
+        try:
+            user = await self._get_json("/user")
+            logger.info(f"GitLab连接成功，当前用户: {user.get('username')}")
+            return True
+        except Exception as e:
+            logger.error(f"GitLab连接失败: {e}")
+            return False
+
+    async def aclose(self) -> None:
+        """关闭底层连接池"""
+        await self._client.aclose()
@@ -2,10 +2,12 @@
 GitLabX 客户端
 """
 import gitlab
+from datetime import datetime
 from typing import List, Optional, Iterator, Tuple, Dict, Any
 from urllib.parse import urlparse
 
 from .models import ProjectInfo, MergeRequestInfo, CommitInfo, PaginationInfo, FileChangeInfo
+from .diff_utils import count_diff_lines
 from .exceptions import (
     GitLabError,
     GitLabConnectionError,
@@ -184,6 +186,7 @@ class GitLabClient:
         source_branch: Optional[str] = None,
         target_branch: Optional[str] = None,
         author_id: Optional[int] = None,
+        updated_after: Optional[datetime] = None,
     ) -> Tuple[List[MergeRequestInfo], PaginationInfo]:
         """
         获取合并请求列表
@@ -198,6 +201,7 @@ class GitLabClient:
             source_branch: 源分支
             target_branch: 目标分支
             author_id: 作者ID
+            updated_after: 仅返回该时间之后更新的合并请求
             
         Returns:
             (合并请求列表, 分页信息)
@@ -219,6 +223,8 @@ class GitLabClient:
                 kwargs['target_branch'] = target_branch
             if author_id:
                 kwargs['author_id'] = author_id
+            if updated_after:
+                kwargs['updated_after'] = updated_after.isoformat()
             
             merge_requests = project.mergerequests.list(**kwargs, lazy=False)
             
@@ -285,6 +291,8 @@ class GitLabClient:
             project = self._client.projects.get(project_id, lazy=True)
             mr = project.mergerequests.get(mr_iid)
             changes = mr.changes()
+            if changes.get('overflow'):
+                logger.warning(f"合并请求变更超过GitLab限制，部分文件未返回: project {project_id} mr {mr_iid}")
             
             file_changes = []
             for change in changes.get('changes', []):
@@ -294,7 +302,9 @@ class GitLabClient:
                     new_file=change.get('new_file', False),
                     renamed_file=change.get('renamed_file', False),
                     deleted_file=change.get('deleted_file', False),
-                    diff=change.get('diff', ''),
+                    diff=change.get('diff') or '',
+                    too_large=bool(change.get('too_large')),
+                    collapsed=bool(change.get('collapsed')),
                 )
                 file_changes.append(file_change)
             
@@ -350,36 +360,31 @@ class GitLabClient:
             mr_iid: 合并请求IID
             
         Returns:
-            变更统计信息 {'additions': 新增行数, 'deletions': 删除行数, 'total': 总变更行数}
+            变更统计信息 {'additions': 新增行数, 'deletions': 删除行数, 'total': 总变更行数, 'files': 文件数}
         """
         try:
-            project = self._client.projects.get(project_id, lazy=True)
-            mr = project.mergerequests.get(mr_iid)
-            changes = mr.changes().get('changes', [])
+            # 分页迭代 /diffs 接口，逐页计数，不一次性加载整个MR的diff
+            diffs = self._client.http_list(
+                f"/projects/{project_id}/merge_requests/{mr_iid}/diffs",
+                iterator=True,
+                per_page=20,
+            )
             
             total_additions = 0
             total_deletions = 0
+            total_files = 0
             
-            for change in changes:
-                diff = change.get('diff', '')
-                if diff:
-                    # 解析diff统计行数
-                    additions = 0
-                    deletions = 0
-                    
-                    for line in diff.split('\n'):
-                        if line.startswith('+') and not line.startswith('+++'):
-                            additions += 1
-                        elif line.startswith('-') and not line.startswith('---'):
-                            deletions += 1
-                    
-                    total_additions += additions
-                    total_deletions += deletions
+            for change in diffs:
+                additions, deletions = count_diff_lines(change.get('diff') or '')
+                total_additions += additions
+                total_deletions += deletions
+                total_files += 1
             
             return {
                 'additions': total_additions,
                 'deletions': total_deletions,
-                'total': total_additions + total_deletions
+                'total': total_additions + total_deletions,
+                'files': total_files,
             }
             
         except Exception as e:
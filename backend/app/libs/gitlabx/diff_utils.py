@@ -0,0 +1,25 @@
+"""
+GitLabX diff工具函数
+"""
+from typing import Tuple
+
+
+def count_diff_lines(diff: str) -> Tuple[int, int]:
+    """
+    统计diff中的新增/删除行数
+
+    基于str.count在C层完成计数，不拆分行、不产生中间列表，
+    大文件diff也只占用原字符串本身的内存。
+
+    Args:
+        diff: 单个文件的unified diff文本
+
+    Returns:
+        (新增行数, 删除行数)，不计入 +++/--- 文件头
+    """
+    if not diff:
+        return 0, 0
+
+    additions = diff.count('\n+') + diff.startswith('+') - diff.count('\n+++') - diff.startswith('+++')
+    deletions = diff.count('\n-') + diff.startswith('-') - diff.count('\n---') - diff.startswith('---')
+    return additions, deletions
@@ -81,6 +81,16 @@ class ProjectInfo(BaseModel):
         )
 
 
+def _parse_count(value: Any) -> Optional[int]:
+    """解析GitLab计数字段（超过上限时为 "1000+" 形式的字符串）"""
+    if value is None:
+        return None
+    try:
+        return int(str(value).rstrip('+'))
+    except ValueError:
+        return None
+
+
 class MergeRequestInfo(BaseModel):
     """合并请求信息"""
     id: int
@@ -111,6 +121,7 @@ class MergeRequestInfo(BaseModel):
     user_notes_count: int = 0
     changes_count: Optional[int] = None
     commits_count: Optional[int] = None
+    sha: Optional[str] = None  # 源分支最新提交SHA
     
     @classmethod
     def from_gitlab_mr(cls, mr: Any) -> "MergeRequestInfo":
@@ -149,8 +160,9 @@ class MergeRequestInfo(BaseModel):
             upvotes=getattr(mr, 'upvotes', 0),
             downvotes=getattr(mr, 'downvotes', 0),
             user_notes_count=getattr(mr, 'user_notes_count', 0),
-            changes_count=getattr(mr, 'changes_count', None),
+            changes_count=_parse_count(getattr(mr, 'changes_count', None)),
             commits_count=getattr(mr, 'commits_count', None),
+            sha=getattr(mr, 'sha', None),
         )
 
 
@@ -194,3 +206,10 @@ class FileChangeInfo(BaseModel):
     renamed_file: bool = False
     deleted_file: bool = False
     diff: str
+    too_large: bool = False  # diff超过GitLab限制，内容被省略
+    collapsed: bool = False  # diff被GitLab折叠（overflow），内容被省略
+
+    @property
+    def is_truncated(self) -> bool:
+        """diff内容是否被GitLab省略"""
+        return self.too_large or self.collapsed
@@ -0,0 +1,186 @@
+"""
+GitLabX 自适应限流器
+
+令牌桶 + GitLab RateLimit 响应头反馈：
+- 根据 RateLimit-Remaining / RateLimit-Reset 动态调整放行速率，在触发429之前主动减速；
+- 收到429时按 Retry-After 暂停所有请求；
+- 为交互式请求（审查拉取diff、发表评论等）保留一部分额度，批量同步不能把额度耗尽。
+"""
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Mapping, Optional
+
+from app.core.logging import get_logger
+
+logger = get_logger("gitlab_rate_limiter")
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BULK = "bulk"
+
+_request_priority: ContextVar[str] = ContextVar("gitlab_request_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def request_priority(priority: str) -> Iterator[None]:
+    """
+    设置当前上下文中GitLab请求的优先级
+
+    在其中创建的子任务（asyncio.gather / create_task）会继承该优先级。
+    """
+    token = _request_priority.set(priority)
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+
+def current_priority() -> str:
+    """获取当前上下文的请求优先级"""
+    return _request_priority.get()
+
+
+class GitLabRateLimiter:
+    """GitLab请求共享限流器"""
+
+    def __init__(
+        self,
+        rate: float = 10.0,
+        burst: int = 20,
+        interactive_reserve: float = 0.2,
+    ):
+        """
+        初始化限流器
+
+        Args:
+            rate: 基础放行速率（请求/秒）
+            burst: 令牌桶容量
+            interactive_reserve: 为交互式请求保留的额度比例（本地令牌与服务端剩余额度）
+        """
+        self.rate = rate
+        self.burst = burst
+        self.interactive_reserve = interactive_reserve
+
+        self._tokens = float(burst)
+        self._refilled_at = time.monotonic()
+        self._blocked_until = 0.0
+
+        # 服务端反馈的额度信息
+        self._limit: Optional[int] = None
+        self._remaining: Optional[int] = None
+        self._reset_at: Optional[float] = None
+
+        self.throttled_count = 0
+        self.wait_seconds = 0.0
+
+    def _server_reserve(self) -> int:
+        """服务端剩余额度中为交互式请求保留的数量"""
+        if not self._limit:
+            return 0
+        return int(self._limit * self.interactive_reserve)
+
+    def _effective_rate(self, now: float) -> float:
+        """结合服务端剩余额度计算当前放行速率"""
+        if self._remaining is None or self._reset_at is None or now >= self._reset_at:
+            return self.rate
+
+        # 剩余额度按重置前的时间均摊，额度紧张时提前减速
+        usable = max(self._remaining - self._server_reserve(), 1)
+        return max(min(self.rate, usable / (self._reset_at - now)), 0.1)
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        self._tokens = min(float(self.burst), self._tokens + elapsed * self._effective_rate(now))
+
+    def _try_acquire(self, priority: str) -> float:
+        """尝试获取令牌，成功返回0，否则返回建议等待的秒数"""
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+
+        if self._reset_at is not None and now >= self._reset_at:
+            # 额度窗口已重置
+            self._remaining = None
+            self._reset_at = None
+
+        self._refill(now)
+
+        is_bulk = priority == PRIORITY_BULK
+        if self._remaining is not None and self._reset_at is not None:
+            floor = self._server_reserve() if is_bulk else 0
+            if self._remaining <= floor:
+                return self._reset_at - now
+
+        needed = 1.0 + (self.burst * self.interactive_reserve if is_bulk else 0.0)
+        if self._tokens >= needed:
+            self._tokens -= 1.0
+            if self._remaining is not None:
+                self._remaining -= 1
+            return 0.0
+
+        return (needed - self._tokens) / self._effective_rate(now)
+
+    async def acquire(self, priority: Optional[str] = None) -> None:
+        """
+        等待获取一次请求额度
+
+        Args:
+            priority: 请求优先级，默认取当前上下文中的优先级
+        """
+        priority = priority or current_priority()
+        waited = 0.0
+        while True:
+            wait = self._try_acquire(priority)
+            if wait <= 0:
+                break
+            wait = min(wait, 60.0)
+            waited += wait
+            await asyncio.sleep(wait)
+
+        if waited:
+            self.wait_seconds += waited
+
+    def update_from_response(self, status_code: int, headers: Mapping[str, str]) -> None:
+        """根据GitLab响应头更新额度信息"""
+        now = time.monotonic()
+
+        limit = headers.get("RateLimit-Limit")
+        remaining = headers.get("RateLimit-Remaining")
+        reset = headers.get("RateLimit-Reset")
+
+        if limit and limit.isdigit():
+            self._limit = int(limit)
+        if remaining and remaining.isdigit():
+            self._remaining = int(remaining)
+        if reset and reset.isdigit():
+            # RateLimit-Reset 为Unix时间戳
+            self._reset_at = now + max(int(reset) - time.time(), 0)
+
+        if status_code == 429:
+            self.throttled_count += 1
+            retry_after = headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                delay = float(retry_after)
+            elif self._reset_at is not None:
+                delay = max(self._reset_at - now, 1.0)
+            else:
+                delay = 1.0
+            self._blocked_until = max(self._blocked_until, now + delay)
+            self._tokens = 0.0
+            logger.warning(f"GitLab限流(429)，暂停请求 {delay:.1f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        """限流器统计信息"""
+        now = time.monotonic()
+        return {
+            "rate": round(self._effective_rate(now), 3),
+            "tokens": round(self._tokens, 2),
+            "limit": self._limit,
+            "remaining": self._remaining,
+            "reset_in": round(self._reset_at - now, 1) if self._reset_at else None,
+            "blocked_for": round(max(self._blocked_until - now, 0.0), 1),
+            "throttled_count": self.throttled_count,
+            "wait_seconds": round(self.wait_seconds, 2),
+        }
@@ -10,7 +10,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
 from app.core.config import settings
-from app.core.database import create_db_and_tables
+from app.core.database import create_db_and_tables, close_db
+from app.core.gitlab import close_gitlab_client
 from app.core.logging import setup_logging, get_logger
 from app.api import (
     dashboard, merge_requests, reviews, sync, scheduler, auth, webhook, 
@@ -49,6 +50,21 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         except Exception as e:
             logger.error(f"默认模板创建/更新失败: {str(e)}")
 
+        # 启动webhook事件队列
+        from app.services.webhook import webhook_queue
+        await webhook_queue.start()
+        logger.info("Webhook事件队列启动完成")
+
+        # 创建AI提供商HTTP客户端池
+        from app.services.ai import ai_service
+        await ai_service.start()
+        logger.info("AI提供商客户端池创建完成")
+
+        # 启动审查执行器（回收上次未完成任务的租约）
+        from app.services.review import review_executor
+        await review_executor.start()
+        logger.info("审查执行器启动完成")
+
         # 启动任务管理器清理调度器
         try:
             from app.services.task import task_manager
@@ -63,6 +79,14 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
         raise
     yield
     logger.info("应用关闭中...")
+    from app.services.webhook import webhook_queue
+    await webhook_queue.stop()
+    from app.services.review import review_executor
+    await review_executor.stop()
+    from app.services.ai import ai_service
+    await ai_service.aclose()
+    await close_gitlab_client()
+    await close_db()
 
 
 # 创建FastAPI应用
@@ -5,7 +5,9 @@ from .project import Project
 from .merge_request import MergeRequest
 from .review import CodeReview, ReviewComment
 from .prompt_template import PromptTemplate
-from .ai_model import AIModel, TokenUsage
+from .ai_model import AIModel, TokenUsage, TokenUsagePrompt
+from .sync_state import ProjectSyncState, MergeRequestSyncState
+from .review_job import ReviewJob
 
 __all__ = [
     "Project",
@@ -15,4 +17,8 @@ __all__ = [
     "PromptTemplate",
     "AIModel",
     "TokenUsage",
+    "TokenUsagePrompt",
+    "ProjectSyncState",
+    "MergeRequestSyncState",
+    "ReviewJob",
 ]
@@ -101,3 +101,26 @@ class TokenUsage(Base):
     
     def __repr__(self) -> str:
         return f"<TokenUsage(id={self.id}, model_id={self.model_id}, total_tokens={self.total_tokens})>"
+
+
+class TokenUsagePrompt(Base):
+    """Token使用记录对应的提示词信息，用于按模板统计缓存命中率"""
+    __tablename__ = "token_usage_prompt"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    token_usage_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("token_usage.id", ondelete="CASCADE"),
+        nullable=False,
+        unique=True
+    )
+    template_name: Mapped[str] = mapped_column(String(100), nullable=False, index=True)  # 使用的模板名称
+    prompt_layout: Mapped[str] = mapped_column(String(20), nullable=False, default="inline")  # 提示词布局: cache_aware/inline
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
+
+    def __repr__(self) -> str:
+        return f"<TokenUsagePrompt(token_usage_id={self.token_usage_id}, template_name='{self.template_name}')>"
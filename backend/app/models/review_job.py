@@ -0,0 +1,54 @@
+"""
+审查任务模型
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import String, Integer, Text, DateTime, ForeignKey, JSON, func, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.database import Base
+
+
+class ReviewJob(Base):
+    """审查任务表（持久化队列，worker通过租约领取任务）"""
+    __tablename__ = "review_job"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    review_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("code_review.id", ondelete="CASCADE"),
+        unique=True,
+        nullable=False,
+        index=True
+    )
+    model_id: Mapped[str] = mapped_column(String(100), nullable=False)  # 执行审查的模型，用于按模型限制并发
+    status: Mapped[str] = mapped_column(String(20), default="queued", nullable=False)  # queued, running, completed, failed
+    payload: Mapped[dict] = mapped_column(JSON, nullable=False)  # 审查参数
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)  # 已领取次数
+    lease_owner: Mapped[Optional[str]] = mapped_column(String(100), nullable=True)  # 持有租约的worker
+    lease_expires_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)  # 租约到期时间（UTC），过期未续约视为worker已失联
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)  # 最近一次心跳时间（UTC）
+    queued_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)  # 入队时间（UTC）
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)  # 最近一次领取时间（UTC）
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+    last_error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False
+    )
+
+    __table_args__ = (
+        Index("idx_review_job_claim", "status", "model_id", "id"),
+        Index("idx_review_job_lease", "status", "lease_expires_at"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<ReviewJob(id={self.id}, review_id={self.review_id}, status='{self.status}')>"
@@ -0,0 +1,70 @@
+"""
+同步状态模型
+"""
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Integer, String, DateTime, ForeignKey, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.database import Base
+
+
+class ProjectSyncState(Base):
+    """项目同步状态表（增量同步水位线）"""
+    __tablename__ = "project_sync_state"
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    project_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("project.id", ondelete="CASCADE"),
+        unique=True,
+        nullable=False,
+        index=True
+    )
+    mr_updated_watermark: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)  # 已同步MR的最大更新时间
+    last_synced_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)  # 最近一次同步完成时间
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False
+    )
+    
+    def __repr__(self) -> str:
+        return f"<ProjectSyncState(project_id={self.project_id}, mr_updated_watermark={self.mr_updated_watermark})>"
+
+
+class MergeRequestSyncState(Base):
+    """合并请求同步状态表（变更统计是否过期）"""
+    __tablename__ = "merge_request_sync_state"
+    
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
+    merge_request_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("merge_request.id", ondelete="CASCADE"),
+        unique=True,
+        nullable=False,
+        index=True
+    )
+    stats_commit_sha: Mapped[Optional[str]] = mapped_column(String(40), nullable=True)  # 变更统计对应的commit SHA，与MR最新SHA不一致时统计已过期
+    stats_synced_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)  # 最近一次拉取统计的时间
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        nullable=False
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False
+    )
+    
+    def __repr__(self) -> str:
+        return f"<MergeRequestSyncState(merge_request_id={self.merge_request_id}, stats_commit_sha={self.stats_commit_sha})>"
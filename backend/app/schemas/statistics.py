@@ -104,5 +104,15 @@ class TokenUsageByProject(BaseModel):
     review_count: int = Field(..., description="审查次数")
 
 
+class TokenUsageByTemplate(BaseModel):
+    """按模板统计Token使用和缓存命中率"""
+    template_name: str = Field(..., description="模板名称")
+    prompt_layout: str = Field(..., description="提示词布局: cache_aware/inline")
+    prompt_tokens: int = Field(..., description="输入token数")
+    cache_tokens: int = Field(..., description="缓存命中token数")
+    cache_hit_ratio: float = Field(..., description="缓存命中率（缓存token/输入token）")
+    usage_count: int = Field(..., description="使用次数")
+
+
 # 注意：StatisticsResponse 和 StatisticsRequest 已废弃
 # 现在使用分接口，每个接口有自己的请求和响应格式
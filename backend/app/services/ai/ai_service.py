@@ -6,10 +6,12 @@
 
 import httpx
 import arrow
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from app.core.config import settings
 from app.core.logging import get_logger
 from app.libs.ai_models import get_model_definition, list_models
+from app.services.ai.client_pool import create_client_pool
+from app.services.ai.streaming import StreamAbortedError, StreamMonitor, iter_sse_events
 from app.services.review.ai_interfaces import ModelConfig, ModelProvider
 
 logger = get_logger("ai_service")
@@ -20,6 +22,21 @@ class AIService:
     
     def __init__(self):
         self.default_model = self._get_default_model()
+        # 提供商HTTP客户端池，随应用生命周期创建和关闭
+        self.client_pool = create_client_pool()
+
+    async def start(self) -> None:
+        """为已启用模型的提供商预先创建HTTP客户端"""
+        providers = {model.provider.lower() for model in list_models(active_only=True)}
+        self.client_pool.start(providers)
+
+    async def aclose(self) -> None:
+        """关闭提供商HTTP客户端"""
+        await self.client_pool.aclose()
+
+    def get_http_stats(self) -> Dict[str, Any]:
+        """获取提供商HTTP连接复用统计"""
+        return self.client_pool.stats()
     
     def _get_default_model(self):
         """获取默认模型"""
@@ -56,9 +73,23 @@ class AIService:
         system_prompt: str = "你是一个专业的AI助手，请根据用户的要求提供帮助。",
         model_id: Optional[str] = None,
         temperature: float = 0.3,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        stream: Optional[bool] = None,
+        task_result=None,
+        token_budget: Optional[int] = None,
+        static_prompt: Optional[str] = None,
+        json_mode: bool = False
     ) -> Dict[str, Any]:
-        """生成AI响应"""
+        """
+        生成AI响应
+
+        Args:
+            json_mode: 请求JSON模式输出，模型不支持时忽略，实际是否启用见返回值中的json_mode
+            static_prompt: 请求间不变的提示词部分（如模板的输出格式、审查规范），缓存友好布局下作为system消息放在最前
+            stream: 是否流式生成，默认按配置和模型能力决定
+            task_result: 任务结果对象，流式生成时汇报进度并检测取消
+            token_budget: 流式生成的输出token预算，超出后中止
+        """
         start_time = arrow.now()
         
         try:
@@ -70,23 +101,33 @@ class AIService:
                 model_config.temperature = temperature
             if max_tokens:
                 model_config.max_tokens = max_tokens
+            model_config.json_mode = json_mode and self.supports_json_mode(model_config)
             
-            # 构建完整的提示词
-            full_prompt = f"{system_prompt}\n\n{prompt}"
+            # 构建消息
+            messages = self._build_messages(prompt, system_prompt, static_prompt)
             
             # 调用相应的AI提供商
-            if model_config.provider == ModelProvider.DEEPSEEK:
-                result = await self._call_deepseek(full_prompt, model_config)
+            if self._should_stream(model_config, stream):
+                monitor = StreamMonitor(
+                    token_budget=token_budget or settings.AI_STREAM_TOKEN_BUDGET,
+                    task_result=task_result,
+                    expected_tokens=model_config.max_tokens,
+                    family=model_config.provider.value
+                )
+                result = await self._call_stream(messages, model_config, monitor)
+            elif model_config.provider == ModelProvider.DEEPSEEK:
+                result = await self._call_deepseek(messages, model_config)
             elif model_config.provider == ModelProvider.OPENAI:
-                result = await self._call_openai(full_prompt, model_config)
+                result = await self._call_openai(messages, model_config)
             elif model_config.provider == ModelProvider.CLAUDE:
-                result = await self._call_claude(full_prompt, model_config)
+                result = await self._call_claude(messages, model_config)
             else:
                 raise ValueError(f"Unsupported provider: {model_config.provider}")
             
             # 计算请求耗时
             request_duration = (arrow.now() - start_time).total_seconds()
             result["request_duration"] = request_duration
+            result["json_mode"] = model_config.json_mode
             
             return result
                 
@@ -94,7 +135,171 @@ class AIService:
             logger.error(f"AI服务调用失败: {e}")
             raise
     
-    async def _call_deepseek(self, prompt: str, config: ModelConfig) -> Dict[str, Any]:
+    def _build_messages(self, prompt: str, system_prompt: str, static_prompt: Optional[str] = None) -> List[Dict[str, str]]:
+        """
+        构建对话消息
+
+        缓存友好布局下，系统提示词和静态提示词依次作为system消息放在最前，可变的请求数据放在最后，
+        使请求前缀在不同MR之间逐字节相同，从而命中提供商的前缀缓存。
+        """
+        if not settings.AI_PROMPT_CACHE_AWARE:
+            parts = [system_prompt, static_prompt, prompt]
+            return [{"role": "user", "content": "\n\n".join(part for part in parts if part)}]
+
+        messages = [{"role": "system", "content": system_prompt}]
+        if static_prompt:
+            messages.append({"role": "system", "content": static_prompt})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    @staticmethod
+    def _claude_payload_messages(messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """Claude的system消息通过顶层system参数传入，最后一个system块标记为可缓存"""
+        system_blocks = [{"type": "text", "text": m["content"]} for m in messages if m["role"] == "system"]
+        if system_blocks:
+            system_blocks[-1]["cache_control"] = {"type": "ephemeral"}
+        payload: Dict[str, Any] = {"messages": [m for m in messages if m["role"] != "system"]}
+        if system_blocks:
+            payload["system"] = system_blocks
+        return payload
+
+    @staticmethod
+    def _openai_cache_usage(usage: Dict[str, Any], tokens_used: int) -> Tuple[int, int]:
+        """从OpenAI兼容的usage中拆分(非缓存token, 缓存token)"""
+        if "prompt_cache_hit_tokens" in usage or "prompt_cache_miss_tokens" in usage:
+            # DeepSeek
+            return usage.get("prompt_cache_miss_tokens", 0), usage.get("prompt_cache_hit_tokens", 0)
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+        return tokens_used - cached, cached
+
+    @staticmethod
+    def _claude_cache_usage(usage: Dict[str, Any]) -> Tuple[int, int, int, int]:
+        """从Claude的usage中拆分(输入token, 输出token, 非缓存token, 缓存token)，input_tokens不含缓存读写部分"""
+        cache_read = usage.get("cache_read_input_tokens") or 0
+        prompt_token = usage.get("input_tokens", 0) + cache_read + (usage.get("cache_creation_input_tokens") or 0)
+        completion_token = usage.get("output_tokens", 0)
+        return prompt_token, completion_token, prompt_token + completion_token - cache_read, cache_read
+
+    def supports_json_mode(self, config: ModelConfig) -> bool:
+        """模型是否支持response_format JSON模式（Claude没有该参数）"""
+        if config.provider not in (ModelProvider.DEEPSEEK, ModelProvider.OPENAI):
+            return False
+        model_def = get_model_definition(config.model_name)
+        return bool(model_def and model_def.capabilities and model_def.capabilities.supports_json_mode)
+
+    def _should_stream(self, config: ModelConfig, stream: Optional[bool]) -> bool:
+        """判断是否使用流式生成：需要模型支持，未显式指定时按配置"""
+        if stream is False or (stream is None and not settings.AI_STREAM_ENABLED):
+            return False
+        if config.provider not in (ModelProvider.DEEPSEEK, ModelProvider.OPENAI, ModelProvider.CLAUDE):
+            return False
+        model_def = get_model_definition(config.model_name)
+        return bool(model_def and model_def.capabilities and model_def.capabilities.supports_streaming)
+
+    async def _call_stream(self, messages: List[Dict[str, str]], config: ModelConfig, monitor: StreamMonitor) -> Dict[str, Any]:
+        """流式调用模型，逐块消费SSE响应"""
+        is_claude = config.provider == ModelProvider.CLAUDE
+        if is_claude:
+            api_url = f"{config.base_url}/messages"
+            headers = {
+                "x-api-key": config.api_key,
+                "Content-Type": "application/json",
+                "anthropic-version": "2023-06-01"
+            }
+            payload = {
+                "model": config.model_name,
+                "max_tokens": config.max_tokens or 4000,
+                "temperature": config.temperature,
+                **self._claude_payload_messages(messages),
+                "stream": True
+            }
+        else:
+            base_url = config.base_url or "https://api.openai.com/v1"
+            api_url = f"{base_url}/chat/completions"
+            headers = {
+                "Authorization": f"Bearer {config.api_key}",
+                "Content-Type": "application/json",
+                "Accept": "text/event-stream"
+            }
+            payload = {
+                "model": config.model_name,
+                "messages": messages,
+                "temperature": config.temperature,
+                "stream": True,
+                "stream_options": {"include_usage": True}
+            }
+            if config.json_mode:
+                payload["response_format"] = {"type": "json_object"}
+            if config.max_tokens and config.max_tokens > 0:
+                payload["max_tokens"] = config.max_tokens
+
+        provider_name = config.provider.value
+        usage: Dict[str, Any] = {}
+        client = self.client_pool.get_client(provider_name)
+        # 两个数据块之间的最长等待时间，超过即视为生成卡住
+        timeout = httpx.Timeout(config.timeout, read=settings.AI_STREAM_IDLE_TIMEOUT_SECONDS)
+        try:
+            async with client.stream("POST", api_url, headers=headers, json=payload, timeout=timeout) as response:
+                if response.is_error:
+                    await response.aread()
+                    response.raise_for_status()
+                async for event, data in iter_sse_events(response):
+                    if is_claude:
+                        if data.get("type") == "message_start":
+                            usage.update(data.get("message", {}).get("usage") or {})
+                        elif data.get("type") == "message_delta":
+                            usage.update(data.get("usage") or {})
+                        elif data.get("type") == "error":
+                            raise ValueError(f"Claude API 流式响应错误: {data.get('error')}")
+                        delta = data.get("delta") or {}
+                        monitor.feed(delta.get("text", "") if delta.get("type") == "text_delta" else "")
+                    else:
+                        if data.get("usage"):
+                            usage = data["usage"]
+                        choices = data.get("choices") or [{}]
+                        monitor.feed((choices[0].get("delta") or {}).get("content") or "")
+        except httpx.HTTPStatusError as e:
+            logger.error(f"{provider_name} API error: {e.response.status_code} - {e.response.text}")
+            raise ValueError(f"{provider_name} API 请求失败: {e.response.status_code} - {e.response.text}")
+        except httpx.ReadTimeout:
+            raise StreamAbortedError(
+                f"{settings.AI_STREAM_IDLE_TIMEOUT_SECONDS}秒内没有收到新的响应数据，已中止生成",
+                monitor.content,
+                monitor.counter.tokens
+            )
+        except StreamAbortedError as e:
+            logger.warning(f"{provider_name} 流式生成中止: {e.reason} (已生成约 {e.completion_tokens} tokens)")
+            raise
+
+        content = monitor.content
+        if not content:
+            raise ValueError(f"{provider_name} API 流式响应中没有生成内容")
+
+        if is_claude:
+            if not usage.get("output_tokens"):
+                usage["output_tokens"] = monitor.counter.tokens
+            prompt_token, completion_token, direct_token, cache_token = self._claude_cache_usage(usage)
+            tokens_used = prompt_token + completion_token
+        else:
+            prompt_token = usage.get("prompt_tokens", 0)
+            completion_token = usage.get("completion_tokens", 0) or monitor.counter.tokens
+            tokens_used = usage.get("total_tokens") or prompt_token + completion_token
+            direct_token, cache_token = self._openai_cache_usage(usage, tokens_used)
+
+        logger.info(f"{provider_name} stream token usage - total: {tokens_used}, direct: {direct_token}, cache: {cache_token}")
+
+        return {
+            "content": content,
+            "tokens_used": tokens_used,
+            "direct_token": direct_token,
+            "cache_token": cache_token,
+            "prompt_token": prompt_token,
+            "completion_token": completion_token,
+            "model": config.model_name,
+            "provider": provider_name
+        }
+
+    async def _call_deepseek(self, messages: List[Dict[str, str]], config: ModelConfig) -> Dict[str, Any]:
         """调用DeepSeek API"""
         headers = {
             "Authorization": f"Bearer {config.api_key}",
@@ -104,36 +309,34 @@ class AIService:
 
         payload = {
             "model": config.model_name,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
+            "messages": messages,
             "temperature": config.temperature,
             "stream": False
         }
+        if config.json_mode:
+            payload["response_format"] = {"type": "json_object"}
 
         if config.max_tokens and config.max_tokens > 0:
             payload["max_tokens"] = config.max_tokens
 
-        async with httpx.AsyncClient(timeout=config.timeout) as client:
-            try:
-                # 使用模型配置中的base_url
-                api_url = f"{config.base_url}/chat/completions"
-                response = await client.post(
-                    api_url,
-                    headers=headers,
-                    json=payload
-                )
-                response.raise_for_status()
-                result = response.json()
-            except httpx.HTTPStatusError as e:
-                logger.error(f"DeepSeek API error: {e.response.status_code} - {e.response.text}")
-                raise ValueError(f"DeepSeek API 请求失败: {e.response.status_code} - {e.response.text}")
-            except Exception as e:
-                logger.error(f"DeepSeek API request failed: {e}")
-                raise
+        client = self.client_pool.get_client(config.provider.value)
+        try:
+            # 使用模型配置中的base_url
+            api_url = f"{config.base_url}/chat/completions"
+            response = await client.post(
+                api_url,
+                headers=headers,
+                json=payload,
+                timeout=config.timeout
+            )
+            response.raise_for_status()
+            result = response.json()
+        except httpx.HTTPStatusError as e:
+            logger.error(f"DeepSeek API error: {e.response.status_code} - {e.response.text}")
+            raise ValueError(f"DeepSeek API 请求失败: {e.response.status_code} - {e.response.text}")
+        except Exception as e:
+            logger.error(f"DeepSeek API request failed: {e}")
+            raise
 
         if not result.get("choices") or len(result["choices"]) == 0:
             raise ValueError("DeepSeek API 返回的响应格式异常：没有找到 choices")
@@ -163,7 +366,7 @@ class AIService:
             "provider": config.provider.value
         }
     
-    async def _call_openai(self, prompt: str, config: ModelConfig) -> Dict[str, Any]:
+    async def _call_openai(self, messages: List[Dict[str, str]], config: ModelConfig) -> Dict[str, Any]:
         """调用OpenAI API"""
         headers = {
             "Authorization": f"Bearer {config.api_key}",
@@ -172,36 +375,34 @@ class AIService:
 
         payload = {
             "model": config.model_name,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
+            "messages": messages,
             "temperature": config.temperature,
             "stream": False
         }
+        if config.json_mode:
+            payload["response_format"] = {"type": "json_object"}
 
         if config.max_tokens and config.max_tokens > 0:
             payload["max_tokens"] = config.max_tokens
 
         base_url = config.base_url or "https://api.openai.com/v1"
         
-        async with httpx.AsyncClient(timeout=config.timeout) as client:
-            try:
-                response = await client.post(
-                    f"{base_url}/chat/completions",
-                    headers=headers,
-                    json=payload
-                )
-                response.raise_for_status()
-                result = response.json()
-            except httpx.HTTPStatusError as e:
-                logger.error(f"OpenAI API error: {e.response.status_code} - {e.response.text}")
-                raise ValueError(f"OpenAI API 请求失败: {e.response.status_code} - {e.response.text}")
-            except Exception as e:
-                logger.error(f"OpenAI API request failed: {str(e)}")
-                raise
+        client = self.client_pool.get_client(config.provider.value)
+        try:
+            response = await client.post(
+                f"{base_url}/chat/completions",
+                headers=headers,
+                json=payload,
+                timeout=config.timeout
+            )
+            response.raise_for_status()
+            result = response.json()
+        except httpx.HTTPStatusError as e:
+            logger.error(f"OpenAI API error: {e.response.status_code} - {e.response.text}")
+            raise ValueError(f"OpenAI API 请求失败: {e.response.status_code} - {e.response.text}")
+        except Exception as e:
+            logger.error(f"OpenAI API request failed: {str(e)}")
+            raise
 
         if not result.get("choices") or len(result["choices"]) == 0:
             raise ValueError("OpenAI API 返回的响应格式异常：没有找到 choices")
@@ -210,18 +411,20 @@ class AIService:
         usage = result.get("usage", {})
         tokens_used = usage.get("total_tokens", 0)
 
+        direct_token, cache_token = self._openai_cache_usage(usage, tokens_used)
+
         return {
             "content": ai_response,
             "tokens_used": tokens_used,
-            "direct_token": tokens_used,  # OpenAI没有缓存token概念
-            "cache_token": 0,
+            "direct_token": direct_token,
+            "cache_token": cache_token,
             "prompt_token": usage.get("prompt_tokens", 0),
             "completion_token": usage.get("completion_tokens", 0),
             "model": config.model_name,
             "provider": config.provider.value
         }
     
-    async def _call_claude(self, prompt: str, config: ModelConfig) -> Dict[str, Any]:
+    async def _call_claude(self, messages: List[Dict[str, str]], config: ModelConfig) -> Dict[str, Any]:
         """调用Claude API"""
         headers = {
             "x-api-key": config.api_key,
@@ -233,46 +436,43 @@ class AIService:
             "model": config.model_name,
             "max_tokens": config.max_tokens or 4000,
             "temperature": config.temperature,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
+            **self._claude_payload_messages(messages)
         }
 
-        async with httpx.AsyncClient(timeout=config.timeout) as client:
-            try:
-                # 使用模型配置中的base_url
-                api_url = f"{config.base_url}/messages"
-                response = await client.post(
-                    api_url,
-                    headers=headers,
-                    json=payload
-                )
-                response.raise_for_status()
-                result = response.json()
-            except httpx.HTTPStatusError as e:
-                logger.error(f"Claude API error: {e.response.status_code} - {e.response.text}")
-                raise ValueError(f"Claude API 请求失败: {e.response.status_code} - {e.response.text}")
-            except Exception as e:
-                logger.error(f"Claude API request failed: {str(e)}")
-                raise
+        client = self.client_pool.get_client(config.provider.value)
+        try:
+            # 使用模型配置中的base_url
+            api_url = f"{config.base_url}/messages"
+            response = await client.post(
+                api_url,
+                headers=headers,
+                json=payload,
+                timeout=config.timeout
+            )
+            response.raise_for_status()
+            result = response.json()
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Claude API error: {e.response.status_code} - {e.response.text}")
+            raise ValueError(f"Claude API 请求失败: {e.response.status_code} - {e.response.text}")
+        except Exception as e:
+            logger.error(f"Claude API request failed: {str(e)}")
+            raise
 
         if not result.get("content") or len(result["content"]) == 0:
             raise ValueError("Claude API 返回的响应格式异常：没有找到 content")
 
         ai_response = result["content"][0]["text"]
         usage = result.get("usage", {})
-        tokens_used = usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+        prompt_token, completion_token, direct_token, cache_token = self._claude_cache_usage(usage)
+        tokens_used = prompt_token + completion_token
 
         return {
             "content": ai_response,
             "tokens_used": tokens_used,
-            "direct_token": tokens_used,  # Claude没有缓存token概念
-            "cache_token": 0,
-            "prompt_token": usage.get("input_tokens", 0),
-            "completion_token": usage.get("output_tokens", 0),
+            "direct_token": direct_token,
+            "cache_token": cache_token,
+            "prompt_token": prompt_token,
+            "completion_token": completion_token,
             "model": config.model_name,
             "provider": config.provider.value
         }
@@ -0,0 +1,139 @@
+"""
+AI提供商HTTP客户端池
+
+每个提供商共用一个长连接的 httpx.AsyncClient，避免每次调用都重新进行TCP/TLS握手。
+"""
+import importlib.util
+from typing import Any, Dict, Iterable, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger("ai_client_pool")
+
+# HTTP/2 依赖可选的 h2 包
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class ProviderClientPool:
+    """按提供商复用的HTTP客户端池"""
+
+    def __init__(
+        self,
+        timeout: float = 120,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        http2: bool = True,
+        provider_keepalive_expiry: Optional[Dict[str, float]] = None,
+    ):
+        """
+        初始化客户端池
+
+        Args:
+            timeout: 默认请求超时（秒），调用时可按模型配置覆盖
+            max_connections: 每个提供商的最大连接数
+            max_keepalive_connections: 每个提供商保持的空闲连接数
+            keepalive_expiry: 空闲连接保持时间（秒）
+            http2: 是否启用HTTP/2（需要安装h2）
+            provider_keepalive_expiry: 按提供商覆盖的空闲连接保持时间
+        """
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.provider_keepalive_expiry = provider_keepalive_expiry or {}
+        self._http2_requested = http2
+
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _make_hooks(self, provider: str):
+        stats = self._stats.setdefault(provider, {"requests": 0, "new_connections": 0})
+
+        async def _trace(event: str, info: Dict[str, Any]) -> None:
+            # 只有新建连接时才会触发connect_tcp，复用连接的请求不会
+            if event == "connection.connect_tcp.complete":
+                stats["new_connections"] += 1
+
+        async def _on_request(request: httpx.Request) -> None:
+            stats["requests"] += 1
+            request.extensions["trace"] = _trace
+
+        return {"request": [_on_request]}
+
+    def get_client(self, provider: str) -> httpx.AsyncClient:
+        """获取提供商的共享客户端，不存在或已关闭时创建"""
+        client = self._clients.get(provider)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                timeout=self.timeout,
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.provider_keepalive_expiry.get(provider) or self.keepalive_expiry,
+                ),
+                event_hooks=self._make_hooks(provider),
+            )
+            self._clients[provider] = client
+        return client
+
+    def start(self, providers: Iterable[str]) -> None:
+        """预先创建提供商客户端"""
+        if self._http2_requested and not HTTP2_AVAILABLE:
+            logger.info("未安装h2，AI提供商客户端使用HTTP/1.1")
+        for provider in providers:
+            self.get_client(provider)
+        logger.info(f"AI提供商客户端池已创建: {sorted(self._clients)} (http2={self.http2})")
+
+    async def aclose(self) -> None:
+        """关闭所有客户端连接"""
+        for provider, client in list(self._clients.items()):
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"关闭{provider}客户端失败: {e}")
+        self._clients.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """各提供商的请求数、新建连接数和连接复用率"""
+        providers = {}
+        for provider, stats in self._stats.items():
+            requests = stats["requests"]
+            reused = max(requests - stats["new_connections"], 0)
+            client = self._clients.get(provider)
+            providers[provider] = {
+                "requests": requests,
+                "new_connections": stats["new_connections"],
+                "reused_connections": reused,
+                "reuse_rate": round(reused / requests, 4) if requests else 0.0,
+                "open": client is not None and not client.is_closed,
+            }
+        return {
+            "http2": self.http2,
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+            "keepalive_expiry": self.keepalive_expiry,
+            "providers": providers,
+        }
+
+
+def create_client_pool() -> ProviderClientPool:
+    """按配置创建客户端池"""
+    provider_keepalive_expiry = {
+        "deepseek": settings.AI_HTTP_KEEPALIVE_EXPIRY_DEEPSEEK,
+        "openai": settings.AI_HTTP_KEEPALIVE_EXPIRY_OPENAI,
+        "claude": settings.AI_HTTP_KEEPALIVE_EXPIRY_CLAUDE,
+    }
+    return ProviderClientPool(
+        timeout=settings.AI_TIMEOUT_SECONDS,
+        max_connections=settings.AI_HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.AI_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.AI_HTTP_KEEPALIVE_EXPIRY,
+        http2=settings.AI_HTTP2_ENABLED,
+        provider_keepalive_expiry={key: value for key, value in provider_keepalive_expiry.items() if value > 0},
+    )
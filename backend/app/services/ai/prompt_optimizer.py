@@ -18,7 +18,8 @@ class PromptOptimizerService:
         self,
         original_prompt: str,
         context: str = "",
-        optimization_goals: List[str] = None
+        optimization_goals: List[str] = None,
+        task_result=None
     ) -> Dict[str, Any]:
         """优化AI提示词"""
         
@@ -50,7 +51,8 @@ class PromptOptimizerService:
             prompt=optimization_prompt,
             system_prompt="你是一个专业的提示词优化专家，擅长改进AI提示词的质量和效果。",
             temperature=0.5,
-            max_tokens=1000
+            max_tokens=1000,
+            task_result=task_result
         )
         
         return result
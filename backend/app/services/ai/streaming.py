@@ -0,0 +1,211 @@
+"""
+流式响应处理
+
+逐块消费提供商的SSE响应，增量解析JSON结构以汇报进度，
+任务取消或超出token预算时立即中止，避免卡住的生成继续消耗token和时间。
+"""
+import json
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+import httpx
+
+from app.core.logging import get_logger
+from app.libs.ai_models import get_token_estimator
+
+logger = get_logger("ai_streaming")
+
+
+class StreamAbortedError(Exception):
+    """流式生成被中止"""
+
+    def __init__(self, reason: str, content: str = "", completion_tokens: int = 0):
+        super().__init__(reason)
+        self.reason = reason
+        self.content = content
+        self.completion_tokens = completion_tokens
+
+
+class IncrementalJSONParser:
+    """
+    增量JSON结构解析器
+
+    不构建对象，只跟踪括号深度和字符串状态：记录顶层JSON的起止位置、
+    已闭合的数组元素数（如已生成的问题数），顶层对象闭合后即可完整解析。
+    顶层JSON之前的说明文字或```json代码块标记会被跳过。
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.depth = 0
+        self.start: Optional[int] = None
+        self.end: Optional[int] = None
+        self.items = 0  # 数组中已闭合的对象数
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def started(self) -> bool:
+        return self.start is not None
+
+    @property
+    def complete(self) -> bool:
+        return self.end is not None
+
+    def feed(self, text: str) -> None:
+        """追加一段文本"""
+        offset = len(self.buffer)
+        self.buffer += text
+        if self.complete:
+            return
+
+        for index, char in enumerate(text, offset):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if not self.started:
+                if char == "{":
+                    self.start = index
+                    self._stack.append(char)
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._stack.append(char)
+            elif char in "}]":
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                if char == "}" and self._stack and self._stack[-1] == "[":
+                    self.items += 1
+                if not self._stack:
+                    self.end = index + 1
+                    return
+        self.depth = len(self._stack)
+
+    def value(self) -> Optional[Any]:
+        """顶层JSON已闭合时返回解析结果"""
+        if not self.complete:
+            return None
+        try:
+            return json.loads(self.buffer[self.start:self.end])
+        except json.JSONDecodeError:
+            return None
+
+
+class CompletionTokenCounter:
+    """按已生成文本增量估算输出token数，折算比例取自提供商家族的估算器"""
+
+    def __init__(self, family: Optional[str] = None):
+        self.estimator = get_token_estimator(family)
+        self.ascii_chars = 0
+        self.other_chars = 0
+
+    def add(self, text: str) -> None:
+        ascii_chars, other_chars = self.estimator.split_chars(text)
+        self.ascii_chars += ascii_chars
+        self.other_chars += other_chars
+
+    @property
+    def tokens(self) -> int:
+        return self.estimator.tokens_for(self.ascii_chars, self.other_chars)
+
+
+async def iter_sse_events(response: httpx.Response) -> AsyncIterator[Tuple[Optional[str], Dict[str, Any]]]:
+    """逐条解析SSE事件，返回(事件名, 数据)，遇到[DONE]结束"""
+    event = None
+    async for line in response.aiter_lines():
+        if not line:
+            event = None
+            continue
+        if line.startswith("event:"):
+            event = line[6:].strip()
+            continue
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        try:
+            yield event, json.loads(data)
+        except json.JSONDecodeError:
+            logger.debug(f"忽略无法解析的SSE数据: {data[:200]}")
+
+
+class StreamMonitor:
+    """跟踪流式生成进度，并在任务取消或超出预算时中止"""
+
+    # 进度更新的最小token间隔，避免每个chunk都刷新任务状态
+    PROGRESS_STEP_TOKENS = 64
+
+    def __init__(
+        self,
+        token_budget: Optional[int] = None,
+        task_result=None,
+        expected_tokens: Optional[int] = None,
+        family: Optional[str] = None,
+    ):
+        """
+        Args:
+            token_budget: 输出token预算，超出后中止生成
+            task_result: 任务结果对象，用于汇报进度和检测取消
+            expected_tokens: 预计输出token数（通常为模型max_tokens），仅用于估算进度
+            family: 提供商家族，决定输出token的估算比例
+        """
+        self.token_budget = token_budget if token_budget and token_budget > 0 else None
+        self.expected_tokens = self.token_budget or expected_tokens
+        self.task_result = task_result
+        self.parser = IncrementalJSONParser()
+        self.counter = CompletionTokenCounter(family)
+        self.chunks = []
+        self._progress_start = task_result.progress if task_result else 0.0
+        self._progress_end = max(self._progress_start, 0.8)
+        self._reported_tokens = 0
+
+    @property
+    def content(self) -> str:
+        return "".join(self.chunks)
+
+    def _cancelled(self) -> bool:
+        if self.task_result is None:
+            return False
+        from app.services.task import TaskStatus
+        return self.task_result.status == TaskStatus.CANCELLED
+
+    def feed(self, text: str) -> None:
+        """处理一段新生成的文本"""
+        if self._cancelled():
+            raise StreamAbortedError("任务已取消", self.content, self.counter.tokens)
+
+        if text:
+            self.chunks.append(text)
+            self.parser.feed(text)
+            self.counter.add(text)
+
+        tokens = self.counter.tokens
+        if self.token_budget and tokens > self.token_budget:
+            raise StreamAbortedError(
+                f"输出超出token预算({tokens}>{self.token_budget})，已中止生成",
+                self.content,
+                tokens,
+            )
+
+        if self.task_result and tokens - self._reported_tokens >= self.PROGRESS_STEP_TOKENS:
+            self._reported_tokens = tokens
+            self._report(tokens)
+
+    def _report(self, tokens: int) -> None:
+        # 不知道预计输出长度时按 已生成/(已生成+512) 渐近增长
+        ratio = tokens / self.expected_tokens if self.expected_tokens else tokens / (tokens + 512)
+        progress = self._progress_start + (self._progress_end - self._progress_start) * min(ratio, 1.0)
+        message = f"正在生成响应，已生成约 {tokens} tokens"
+        if self.parser.items:
+            message += f"，已解析 {self.parser.items} 项"
+        self.task_result.update_progress(progress, message)
@@ -22,7 +22,8 @@ class TemplateGeneratorService:
         selected_variables: List[str],
         template_name: str = None,
         description: str = None,
-        template_type: str = "standard"
+        template_type: str = "standard",
+        task_result=None
     ) -> Dict[str, Any]:
         """生成AI模板 - 重新设计版本"""
         
@@ -43,7 +44,8 @@ class TemplateGeneratorService:
                 prompt=ai_prompt,
                 system_prompt=self._get_system_prompt(template_type),
                 temperature=0.5,
-                max_tokens=2500
+                max_tokens=2500,
+                task_result=task_result
             )
             
             # 获取生成的模板内容
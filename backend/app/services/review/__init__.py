@@ -3,5 +3,9 @@
 """
 from .service import ReviewService
 from .ai_reviewer import AIReviewer
+from .executor import ReviewExecutor, ReviewQueueFullError, review_executor
+from .review_cache import ReviewCache, review_cache
+from .diff_minimizer import DiffMinimizer, diff_minimizer
+from .template_registry import TemplateRegistry, template_registry
 
-__all__ = ["ReviewService", "AIReviewer"]
+__all__ = ["ReviewService", "AIReviewer", "ReviewExecutor", "ReviewQueueFullError", "review_executor", "ReviewCache", "review_cache", "TemplateRegistry", "template_registry", "DiffMinimizer", "diff_minimizer"]
@@ -25,6 +25,7 @@ class ModelConfig:
     max_tokens: Optional[int] = None
     temperature: float = 0.3
     timeout: int = 300
+    json_mode: bool = False  # 请求提供商以JSON模式输出
 
 
 @dataclass
@@ -82,9 +83,12 @@ class ReviewResult:
     completion_token: int = 0  # 输出token使用量
     model_used: Optional[str] = None
     template_used: Optional[str] = None
+    prompt_layout: Optional[str] = None  # 提示词布局: cache_aware/inline
     review_content: Optional[str] = None  # Markdown格式的审查报告
     error_message: Optional[str] = None  # 错误信息
     request_duration: Optional[float] = None  # 请求耗时（秒）
+    failed_count: int = 0  # 合并结果中审查失败、未计入结果的部分数
+    chunk_count: int = 0  # 分片审查的分片数，0表示未分片
     
     # 向后兼容字段（可选）
     score_details: Optional[Dict[str, Any]] = None  # 兼容旧格式
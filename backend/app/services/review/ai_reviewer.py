@@ -1,7 +1,9 @@
 """
 AI代码审查器 - 重构版本
 """
+from dataclasses import replace
 from typing import Dict, Any, Optional, List
+import asyncio
 import random
 
 from sqlalchemy import select
@@ -11,10 +13,16 @@ from app.services.review.ai_interfaces import (
     AIReviewerInterface, ReviewRequest, ReviewResult, ModelConfig, ModelProvider,
     PromptTemplate, ContextInfo
 )
+from app.libs.ai_models import get_model_definition, get_token_estimator
 from app.services.ai.ai_service import ai_service
 from app.services.review.prompt_renderer import Jinja2PromptRenderer, AIResultParser
 from app.services.review.context_builder import AIContextBuilder
 from app.services.review.template_builder import ReviewTemplateBuilder
+from app.services.review.chunking import build_diff_chunks
+from app.services.review.preflight import ROUTE_CHUNKED, ROUTE_REJECT, PreflightResult, preflight_review
+from app.services.review.template_registry import template_registry
+from app.services.review.result_merger import merge_review_results
+from app.services.review.executor import review_executor
 
 logger = get_logger("ai_reviewer")
 
@@ -28,37 +36,74 @@ class AIReviewer(AIReviewerInterface):
         self.context_builder = AIContextBuilder()
         self.template_builder = ReviewTemplateBuilder()
     
+    SYSTEM_PROMPT = "你是一个专业的代码审查专家，请对提供的代码进行全面审查。"
+    # JSON模式要求提示词中出现json字样，同时约束只输出符合格式定义的JSON对象
+    JSON_MODE_SYSTEM_PROMPT = SYSTEM_PROMPT + "请严格按照输出格式定义只返回一个json对象，不要输出其他内容。"
+
     async def review(self, request: ReviewRequest) -> ReviewResult:
-        """执行AI审查"""
+        """执行AI审查，diff超出模型上下文预算时按分片并发审查后合并结果"""
         try:
             # 1. 获取或使用默认模型配置
             model_config = request.model_config or self.get_default_model_config()
             
             # 2. 获取或使用默认模板
-            template = request.template or await self._get_default_template()
+            template = request.template or await self.get_default_template()
             logger.debug(f"template character: {len(template.content)}")
             
-            # 3. 渲染Prompt
-            prompt = self.prompt_renderer.render_prompt(template, request.context, request.code_diff)
-            logger.debug(f"prompt character: {len(prompt)}")
-            # 4. 生成AI响应
+            # 3. 本地预检：超出上下文时走分片审查，无法审查或超出成本上限时提前拒绝
+            preflight = self.preflight(request.code_diff, model_config, template, request.context)
+            if preflight.route == ROUTE_REJECT:
+                logger.warning(f"审查预检未通过: {preflight.reason}")
+                return self._create_error_result(f"审查预检未通过: {preflight.reason}")
+            if preflight.route == ROUTE_CHUNKED:
+                return await self._review_chunked(request, model_config, template, preflight.diff_budget)
+            
+            return await self._review_diff(request.context, request.code_diff, template, model_config)
+            
+        except Exception as e:
+            logger.error(f"AI审查失败: {str(e)}")
+            return self._create_error_result(str(e))
+
+    async def _review_diff(
+        self,
+        context: ContextInfo,
+        code_diff: str,
+        template: PromptTemplate,
+        model_config: ModelConfig
+    ) -> ReviewResult:
+        """对一段diff执行一次模型调用并解析结果"""
+        try:
+            # 渲染Prompt，缓存友好布局下模板的静态章节单独作为system消息
+            static_prompt = None
+            if settings.AI_PROMPT_CACHE_AWARE:
+                static_prompt, prompt = self.prompt_renderer.render_prompt_parts(template, context, code_diff)
+            else:
+                prompt = self.prompt_renderer.render_prompt(template, context, code_diff)
+            logger.debug(f"prompt character: {len(prompt)}, static prompt character: {len(static_prompt or '')}")
+            # 生成AI响应
             logger.info(f"开始AI审查，使用模型: {model_config.provider.value}/{model_config.model_name}")
-            ai_response = await ai_service.generate_response(
-                prompt=prompt,
-                system_prompt="你是一个专业的代码审查专家，请对提供的代码进行全面审查。",
-                model_id=model_config.model_name,
-                temperature=model_config.temperature,
-                max_tokens=model_config.max_tokens
-            )
+            json_mode = settings.AI_JSON_MODE_ENABLED and ai_service.supports_json_mode(model_config)
+            # 与执行器共用模型的并发上限，分片并发请求也不会超过模型的concurrent_requests
+            async with review_executor.request_slots(model_config.model_name):
+                ai_response = await ai_service.generate_response(
+                    prompt=prompt,
+                    system_prompt=self.JSON_MODE_SYSTEM_PROMPT if json_mode else self.SYSTEM_PROMPT,
+                    static_prompt=static_prompt,
+                    model_id=model_config.model_name,
+                    temperature=model_config.temperature,
+                    max_tokens=model_config.max_tokens,
+                    json_mode=json_mode
+                )
             
-            # 7. 解析结果
+            # 解析结果（JSON模式下响应即为JSON，跳过提取修复）
             try:
                 result = self.result_parser.parse_response(
                     ai_response["content"], 
-                    None  # 输出格式规范由解析器统一管理，不需要从模板传入
+                    None,  # 输出格式规范由解析器统一管理，不需要从模板传入
+                    json_mode=ai_response.get("json_mode", False)
                 )
                 
-                # 8. 添加元数据（无论解析是否成功都保存token信息）
+                # 添加元数据（无论解析是否成功都保存token信息）
                 result.tokens_used = ai_response.get("tokens_used", 0)
                 result.direct_token = ai_response.get("direct_token", 0)
                 result.cache_token = ai_response.get("cache_token", 0)
@@ -66,9 +111,10 @@ class AIReviewer(AIReviewerInterface):
                 result.completion_token = ai_response.get("completion_token", 0)
                 result.model_used = ai_response.get("model", "")
                 result.template_used = template.name
+                result.prompt_layout = "cache_aware" if settings.AI_PROMPT_CACHE_AWARE else "inline"
                 result.request_duration = ai_response.get("request_duration", None)
                 
-                # 9. 验证结果
+                # 验证结果
                 if not self.result_parser.validate_result(result):
                     logger.error("AI响应验证失败")
                     # 验证失败时，创建一个包含token信息的错误结果
@@ -89,6 +135,66 @@ class AIReviewer(AIReviewerInterface):
             if 'ai_response' in locals():
                 ai_response_data = ai_response
             return self._create_error_result(str(e), ai_response_data)
+
+    def preflight(
+        self,
+        code_diff: str,
+        model_config: ModelConfig,
+        template: PromptTemplate,
+        context: ContextInfo
+    ) -> PreflightResult:
+        """发送前估算Prompt的token数和成本，决定直接审查、分片审查或拒绝"""
+        json_mode = settings.AI_JSON_MODE_ENABLED and ai_service.supports_json_mode(model_config)
+        system_prompt = self.JSON_MODE_SYSTEM_PROMPT if json_mode else self.SYSTEM_PROMPT
+        overhead = system_prompt + self.prompt_renderer.render_prompt(template, context, "")
+        
+        result = preflight_review(
+            code_diff,
+            overhead,
+            get_model_definition(model_config.model_name),
+            family=model_config.provider.value
+        )
+        cost = f"{result.estimated_cost:.4f} {result.currency}" if result.estimated_cost is not None else "未知"
+        logger.info(
+            f"审查预检: 模型={model_config.model_name} 路径={result.route} diff≈{result.diff_tokens} "
+            f"模板≈{result.overhead_tokens} 输入≈{result.prompt_tokens} tokens "
+            f"上下文窗口={result.context_window} 请求数={result.estimated_requests} 预计成本={cost}"
+        )
+        return result
+
+    async def _review_chunked(
+        self,
+        request: ReviewRequest,
+        model_config: ModelConfig,
+        template: PromptTemplate,
+        budget: int
+    ) -> ReviewResult:
+        """按文件/hunk切分diff，分片并发审查后合并为一个结果"""
+        estimator = get_token_estimator(model_config.provider.value)
+        chunks = build_diff_chunks(request.code_diff, budget, estimator.count)
+        total = len(chunks)
+        logger.info(f"diff超出上下文预算({budget} tokens)，分为 {total} 个分片审查")
+        
+        semaphore = asyncio.Semaphore(max(1, settings.REVIEW_CHUNK_CONCURRENCY))
+        
+        async def _review_chunk(index: int, chunk: str) -> ReviewResult:
+            note = f"本次为分片审查（第{index}/{total}部分），只针对下方给出的变更给出问题和评分。"
+            instructions = f"{request.context.custom_instructions}\n\n{note}" if request.context.custom_instructions else note
+            chunk_context = replace(request.context, custom_instructions=instructions)
+            async with semaphore:
+                return await self._review_diff(chunk_context, chunk, template, model_config)
+        
+        results = await asyncio.gather(*(
+            _review_chunk(index, chunk) for index, chunk in enumerate(chunks, 1)
+        ))
+        
+        failed = sum(1 for result in results if result.error_message)
+        if failed:
+            logger.warning(f"分片审查完成，{failed}/{total} 个分片失败")
+        
+        merged = merge_review_results(results, [estimator.count(chunk) for chunk in chunks])
+        merged.chunk_count = total
+        return merged
     
     def get_supported_providers(self) -> List[ModelProvider]:
         """获取支持的模型提供商"""
@@ -98,85 +204,92 @@ class AIReviewer(AIReviewerInterface):
         """获取默认模型配置"""
         return ai_service.get_model_config()
     
-    async def _get_default_template(self) -> PromptTemplate:
-        """获取默认模板 - 优先使用ID=1的内置模板"""
+    async def get_default_template(self) -> PromptTemplate:
+        """获取默认模板 - 优先使用ID=1的内置模板，结果缓存在模板注册表中"""
         try:
-            # 尝试从数据库获取ID=1的内置模板
-            from app.core.database import AsyncSessionLocal
-            from app.models.prompt_template import PromptTemplate as DBPromptTemplate
-            
-            async with AsyncSessionLocal() as session:
-                # 优先查找ID=1的内置模板
-                db_template = await session.get(DBPromptTemplate, 1)
-                
-                if db_template and db_template.is_active:
-                    # 转换为AI审查器使用的PromptTemplate格式
-                    return PromptTemplate(
-                        name=db_template.name,
-                        content=db_template.template_content,
-                        variables_schema=db_template.variables_schema or [],  # 现在是变量名称列表
-                        output_format=None,  # 输出格式规范由解析器统一管理
-                        description=db_template.description
-                    )
-                
-                # 如果没有ID=1的模板，查找其他默认模板
-                stmt = select(DBPromptTemplate).where(
-                    DBPromptTemplate.is_default == True,
-                    DBPromptTemplate.is_active == True
-                )
-                result = await session.execute(stmt)
-                db_template = result.scalar_one_or_none()
-                
-                if db_template:
-                    # 转换为AI审查器使用的PromptTemplate格式
-                    return PromptTemplate(
-                        name=db_template.name,
-                        content=db_template.template_content,
-                        variables_schema=db_template.variables_schema or [],  # 现在是变量名称列表
-                        output_format=None,  # 输出格式规范由解析器统一管理
-                        description=db_template.description
-                    )
+            template = await template_registry.get("default", self._load_default_template)
+            if template:
+                return template
         except Exception as e:
             logger.warning(f"从数据库获取默认模板失败: {str(e)}")
         
         # 降级到内置模板
         return self._get_builtin_template()
     
-    async def get_template_by_name(self, template_name: str) -> Optional[PromptTemplate]:
-        """根据名称获取模板"""
-        try:
-            from app.core.database import AsyncSessionLocal
-            from app.models.prompt_template import PromptTemplate as DBPromptTemplate
+    async def _load_default_template(self) -> Optional[PromptTemplate]:
+        """从数据库加载默认模板"""
+        from app.core.database import AsyncSessionLocal
+        from app.models.prompt_template import PromptTemplate as DBPromptTemplate
+        
+        async with AsyncSessionLocal() as session:
+            # 优先查找ID=1的内置模板
+            db_template = await session.get(DBPromptTemplate, 1)
             
-            async with AsyncSessionLocal() as session:
+            if not (db_template and db_template.is_active):
+                # 如果没有ID=1的模板，查找其他默认模板
                 stmt = select(DBPromptTemplate).where(
-                    DBPromptTemplate.name == template_name,
+                    DBPromptTemplate.is_default == True,
                     DBPromptTemplate.is_active == True
                 )
                 result = await session.execute(stmt)
                 db_template = result.scalar_one_or_none()
-                
-                if db_template:
-                    return PromptTemplate(
-                        name=db_template.name,
-                        content=db_template.template_content,
-                        variables_schema=db_template.variables_schema or {},
-                        output_format=db_template.output_format or {},
-                        description=db_template.description
-                    )
+            
+            if db_template:
+                # 转换为AI审查器使用的PromptTemplate格式
+                return PromptTemplate(
+                    name=db_template.name,
+                    content=db_template.template_content,
+                    variables_schema=db_template.variables_schema or [],  # 现在是变量名称列表
+                    output_format=None,  # 输出格式规范由解析器统一管理
+                    description=db_template.description
+                )
+        return None
+    
+    async def get_template_by_name(self, template_name: str) -> Optional[PromptTemplate]:
+        """根据名称获取模板"""
+        try:
+            return await template_registry.get(
+                ("name", template_name),
+                lambda: self._load_template_by_name(template_name),
+            )
         except Exception as e:
             logger.error(f"获取模板失败: {str(e)}")
         
         return None
     
-    def _get_builtin_template(self) -> PromptTemplate:
-        """获取内置模板 - 使用新的模板构建器"""
-        from app.services.review.template_builder import ReviewTemplateBuilder
+    async def _load_template_by_name(self, template_name: str) -> Optional[PromptTemplate]:
+        """从数据库按名称加载模板"""
+        from app.core.database import AsyncSessionLocal
+        from app.models.prompt_template import PromptTemplate as DBPromptTemplate
         
+        async with AsyncSessionLocal() as session:
+            stmt = select(DBPromptTemplate).where(
+                DBPromptTemplate.name == template_name,
+                DBPromptTemplate.is_active == True
+            )
+            result = await session.execute(stmt)
+            db_template = result.scalar_one_or_none()
+            
+            if db_template:
+                return PromptTemplate(
+                    name=db_template.name,
+                    content=db_template.template_content,
+                    variables_schema=db_template.variables_schema or {},
+                    output_format=db_template.output_format or {},
+                    description=db_template.description
+                )
+        return None
+    
+    def _get_builtin_template(self) -> PromptTemplate:
+        """获取内置模板 - 使用新的模板构建器，构建结果缓存在模板注册表中"""
+        return template_registry.get_builtin(self._build_builtin_template)
+    
+    def _build_builtin_template(self) -> PromptTemplate:
+        """构建内置模板"""
         # 定义核心变量列表
         core_variables = ["project_name", "mr_title", "source_branch", "target_branch"]
         
-        # 创建新的模板构建器实例，确保使用最新的模板内容
+        # 构建器会累积章节，每次构建使用新实例
         template_builder = ReviewTemplateBuilder()
         template_content = template_builder.build_standard_template(selected_variables=core_variables)
         used_variables = template_builder.get_template_variables_schema(selected_variables=core_variables)
@@ -0,0 +1,128 @@
+"""
+大diff分片
+
+按文件、hunk把代码差异切分为不超过token预算的分片，供分片审查使用。
+"""
+import re
+from typing import Callable, List, Optional, Tuple
+
+from app.libs.ai_models import get_token_estimator
+
+# 统一diff中hunk的起始行
+_HUNK_START = re.compile(r"(?m)^(?=@@ )")
+# git diff 输出的文件头
+_GIT_FILE_START = re.compile(r"(?m)^diff --git ")
+# ReviewService._build_diff_text 输出的文件头
+_FILE_START = re.compile(r"(?m)^--- a/.*\n\+\+\+ b/")
+
+# 单个分片的最小token预算，避免预算过小时切得过碎
+MIN_CHUNK_TOKENS = 256
+
+
+def estimate_tokens(text: str, family: Optional[str] = None) -> int:
+    """估算token数，family为提供商家族（deepseek/openai/claude），为空时使用通用估算"""
+    return get_token_estimator(family).count(text)
+
+
+def split_diff_by_file(code_diff: str) -> List[str]:
+    """按文件切分diff文本，每段包含完整的文件头"""
+    pattern = _GIT_FILE_START if _GIT_FILE_START.search(code_diff) else _FILE_START
+    starts = [match.start() for match in pattern.finditer(code_diff)]
+    if not starts:
+        return [code_diff] if code_diff.strip() else []
+
+    # 第一个文件头之前的内容（如果有）并入第一个文件
+    starts[0] = 0
+    ends = starts[1:] + [len(code_diff)]
+    return [code_diff[start:end] for start, end in zip(starts, ends)]
+
+
+def _split_hunks(file_diff: str) -> Tuple[str, List[str]]:
+    """拆分为文件头和hunk列表"""
+    parts = _HUNK_START.split(file_diff)
+    return parts[0], [part for part in parts[1:] if part]
+
+
+def _split_lines(text: str, max_tokens: int, estimator: Callable[[str], int]) -> List[str]:
+    """按行切分超出预算的单个hunk"""
+    pieces: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for line in text.splitlines(keepends=True):
+        line_tokens = estimator(line)
+        if current and current_tokens + line_tokens > max_tokens:
+            pieces.append("".join(current))
+            current, current_tokens = [], 0
+        current.append(line)
+        current_tokens += line_tokens
+    if current:
+        pieces.append("".join(current))
+    return pieces
+
+
+def _file_units(file_diff: str, max_tokens: int, estimator: Callable[[str], int]) -> List[str]:
+    """把单个文件拆成不超过预算的单元，拆分后的每个单元都带上文件头"""
+    if estimator(file_diff) <= max_tokens:
+        return [file_diff]
+
+    header, hunks = _split_hunks(file_diff)
+    if not hunks:
+        return _split_lines(file_diff, max_tokens, estimator)
+
+    header_tokens = estimator(header)
+    hunk_budget = max(max_tokens - header_tokens, MIN_CHUNK_TOKENS)
+    units: List[str] = []
+    group: List[str] = []
+    group_tokens = 0
+    for hunk in hunks:
+        hunk_tokens = estimator(hunk)
+        if hunk_tokens > hunk_budget:
+            if group:
+                units.append(header + "".join(group))
+                group, group_tokens = [], 0
+            units.extend(header + piece for piece in _split_lines(hunk, hunk_budget, estimator))
+            continue
+        if group and group_tokens + hunk_tokens > hunk_budget:
+            units.append(header + "".join(group))
+            group, group_tokens = [], 0
+        group.append(hunk)
+        group_tokens += hunk_tokens
+    if group:
+        units.append(header + "".join(group))
+    return units
+
+
+def build_diff_chunks(
+    code_diff: str,
+    max_tokens: int,
+    estimator: Callable[[str], int] = estimate_tokens,
+) -> List[str]:
+    """
+    将diff切分为token数不超过预算的分片
+
+    小文件按顺序合并到同一分片，超出预算的文件按hunk拆分，单个超大hunk再按行拆分。
+
+    Args:
+        code_diff: 完整的diff文本
+        max_tokens: 单个分片的token预算
+        estimator: token估算函数
+
+    Returns:
+        分片列表
+    """
+    max_tokens = max(max_tokens, MIN_CHUNK_TOKENS)
+
+    chunks: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for file_diff in split_diff_by_file(code_diff):
+        for unit in _file_units(file_diff, max_tokens, estimator):
+            unit_tokens = estimator(unit)
+            if current and current_tokens + unit_tokens > max_tokens:
+                chunks.append("".join(current))
+                current, current_tokens = [], 0
+            current.append(unit)
+            current_tokens += unit_tokens
+    if current:
+        chunks.append("".join(current))
+    return chunks
@@ -0,0 +1,430 @@
+"""
+diff精简
+
+在渲染Prompt之前去掉对审查没有价值的内容，降低Prompt长度、费用和模型延迟：
+- 只有空白变化的hunk
+- 内容未变的重命名
+- 原样移动的代码块（同一文件内或跨文件）
+- 漏过文件过滤器的锁文件和生成代码
+- 超出指定行数的上下文
+
+被裁剪的hunk会按原始行号重新生成hunk头，审查意见中的行号仍然准确。
+"""
+import hashlib
+import os
+import re
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.services.review.chunking import estimate_tokens
+
+logger = get_logger("diff_minimizer")
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@(.*)$")
+
+# 锁文件和常见生成文件
+_LOCKFILE_NAMES = {
+    "package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml", "bun.lockb",
+    "poetry.lock", "pipfile.lock", "uv.lock", "pdm.lock", "cargo.lock", "go.sum",
+    "composer.lock", "gemfile.lock", "podfile.lock", "packages.lock.json", "flake.lock",
+}
+_GENERATED_SUFFIXES = (
+    ".min.js", ".min.css", ".map", ".pb.go", "_pb2.py", "_pb2_grpc.py", ".pb.h", ".pb.cc",
+    ".g.dart", ".freezed.dart", ".designer.cs", ".snap",
+)
+# 生成代码的文件头标记，只检查新增内容的前几行
+_GENERATED_MARKER = re.compile(
+    r"(?i)(code generated .* do not edit|@generated|auto-?generated|this file (is|was) (automatically )?generated)"
+)
+_GENERATED_MARKER_LINES = 20
+
+# 缩进有语义的文件，空白比较时保留行首缩进
+_INDENT_SENSITIVE_SUFFIXES = (".py", ".pyi", ".yaml", ".yml", ".haml", ".pug", ".slim", ".coffee")
+_INDENT_SENSITIVE_NAMES = {"makefile", "gnumakefile"}
+
+
+@dataclass
+class MinimizeStats:
+    """单次审查的精简统计"""
+    files: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+    whitespace_hunks: int = 0
+    renames: int = 0
+    moved_blocks: int = 0
+    generated_files: int = 0
+    context_lines: int = 0
+    generated_paths: List[str] = field(default_factory=list)
+
+    def add_file(self, before: str, after: str) -> None:
+        self.files += 1
+        self.bytes_before += len(before.encode("utf-8"))
+        self.bytes_after += len(after.encode("utf-8"))
+        self.tokens_before += estimate_tokens(before)
+        self.tokens_after += estimate_tokens(after)
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "files": self.files,
+            "bytes_before": self.bytes_before,
+            "bytes_after": self.bytes_after,
+            "bytes_saved": self.bytes_saved,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "tokens_saved": self.tokens_saved,
+            "whitespace_hunks": self.whitespace_hunks,
+            "renames": self.renames,
+            "moved_blocks": self.moved_blocks,
+            "generated_files": self.generated_files,
+            "context_lines": self.context_lines,
+        }
+
+
+@dataclass
+class _Line:
+    text: str
+    old_no: int  # 处理该行前的旧文件行号
+    new_no: int  # 处理该行前的新文件行号
+    keep: bool = True
+    moved_note: Optional[str] = None  # 被折叠的移动代码块说明，只记录在块的第一行
+
+
+def is_generated_file(file_path: str, diff: str = "") -> bool:
+    """根据文件名或新增内容的文件头判断是否为锁文件/生成代码"""
+    name = os.path.basename(file_path).lower()
+    if name in _LOCKFILE_NAMES or name.endswith(_GENERATED_SUFFIXES):
+        return True
+    added = [line[1:] for line in diff.splitlines() if line.startswith("+") and not line.startswith("+++")]
+    return any(_GENERATED_MARKER.search(line) for line in added[:_GENERATED_MARKER_LINES])
+
+
+def _indent_sensitive(file_path: str) -> bool:
+    name = os.path.basename(file_path).lower()
+    return name in _INDENT_SENSITIVE_NAMES or name.endswith(_INDENT_SENSITIVE_SUFFIXES)
+
+
+def _normalizer(file_path: str):
+    """返回行内容的空白规范化函数"""
+    if _indent_sensitive(file_path):
+        def normalize(text: str) -> str:
+            indent = text[:len(text) - len(text.lstrip())]
+            return indent + " ".join(text.split())
+    else:
+        def normalize(text: str) -> str:
+            return "".join(text.split())
+    return normalize
+
+
+def _split_hunks(diff: str) -> Tuple[List[str], List[List[str]]]:
+    """拆分为hunk之前的文件头和各个hunk（首行为hunk头）"""
+    preamble: List[str] = []
+    hunks: List[List[str]] = []
+    for line in diff.splitlines():
+        if line.startswith("@@"):
+            hunks.append([line])
+        elif hunks:
+            hunks[-1].append(line)
+        else:
+            preamble.append(line)
+    return preamble, hunks
+
+
+class DiffMinimizeSession:
+    """单次审查的精简过程，跨文件识别移动的代码块并累计统计"""
+
+    def __init__(self, minimizer: "DiffMinimizer"):
+        self.minimizer = minimizer
+        self.stats = MinimizeStats()
+        # 已处理文件中删除/新增的代码块：规范化内容哈希 -> 文件路径
+        self._removed_blocks: Dict[str, str] = {}
+        self._added_blocks: Dict[str, str] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.minimizer.enabled
+
+    def minimize_file(self, file_path: str, diff: str, old_path: Optional[str] = None) -> str:
+        """
+        精简单个文件的diff
+
+        Args:
+            file_path: 文件路径
+            diff: 该文件的diff内容（GitLab格式或git diff格式）
+            old_path: 重命名前的路径，非重命名文件为None
+
+        Returns:
+            精简后的diff，空字符串表示没有可审查的内容
+        """
+        if not self.enabled:
+            return diff
+        diff = diff or ""
+        snapshot = replace(self.stats, generated_paths=list(self.stats.generated_paths))
+        result = self._minimize(file_path, diff, old_path)
+        if diff and len(result) >= len(diff):
+            # 说明行比原diff还长时保留原样
+            self.stats = snapshot
+            result = diff
+        self.stats.add_file(diff, result)
+        return result
+
+    def _minimize(self, file_path: str, diff: str, old_path: Optional[str]) -> str:
+        options = self.minimizer
+        renamed = bool(old_path and old_path != file_path)
+
+        if options.collapse_generated and diff.strip() and is_generated_file(file_path, diff):
+            self.stats.generated_files += 1
+            self.stats.generated_paths.append(file_path)
+            added = sum(1 for line in diff.splitlines() if line.startswith("+") and not line.startswith("+++"))
+            removed = sum(1 for line in diff.splitlines() if line.startswith("-") and not line.startswith("---"))
+            return f"# 锁文件或生成代码，已省略diff（+{added}/-{removed}）\n"
+
+        preamble, hunks = _split_hunks(diff)
+        if renamed and options.collapse_renames and not hunks:
+            self.stats.renames += 1
+            return f"# 重命名自 {old_path}，内容未变\n"
+
+        normalize = _normalizer(file_path)
+        parsed = []
+        for hunk in hunks:
+            lines = self._parse_hunk(hunk)
+            if lines is None:
+                parsed.append((hunk, None))
+                continue
+            if options.drop_whitespace_hunks and self._whitespace_only(lines, normalize):
+                self.stats.whitespace_hunks += 1
+                continue
+            parsed.append((hunk, lines))
+
+        if options.collapse_moved_blocks:
+            self._collapse_moved_blocks(file_path, [lines for _, lines in parsed if lines], normalize)
+
+        output = list(preamble)
+        if renamed and options.collapse_renames:
+            output.append(f"# 重命名自 {old_path}")
+        for hunk, lines in parsed:
+            if lines is None:
+                output.extend(hunk)
+            else:
+                output.extend(self._render_hunk(hunk, lines))
+
+        if hunks and not any(lines is None or any(line.keep for line in lines) for _, lines in parsed):
+            output.append("# 仅有空白或移动的代码，无需审查的实际变更")
+        return "\n".join(output) + "\n" if output else ""
+
+    @staticmethod
+    def _parse_hunk(hunk: List[str]) -> Optional[List[_Line]]:
+        match = _HUNK_HEADER.match(hunk[0])
+        if not match:
+            return None
+        old_no, new_no = int(match.group(1)), int(match.group(3))
+        # 计数为0时起始行号指向前一行
+        if match.group(2) == "0":
+            old_no += 1
+        if match.group(4) == "0":
+            new_no += 1
+        lines = []
+        for text in hunk[1:]:
+            lines.append(_Line(text, old_no, new_no))
+            if text.startswith("-"):
+                old_no += 1
+            elif text.startswith("+"):
+                new_no += 1
+            elif not text.startswith("\\"):
+                old_no += 1
+                new_no += 1
+        return lines
+
+    @staticmethod
+    def _whitespace_only(lines: List[_Line], normalize) -> bool:
+        # 比较hunk的新旧两侧全文（含上下文），行的位置变化（如跨上下文调换顺序）不算空白变化
+        if not any(line.text[:1] in "+-" for line in lines):
+            return False
+        old_side = [normalize(line.text[1:]) for line in lines if line.text[:1] in " -"]
+        new_side = [normalize(line.text[1:]) for line in lines if line.text[:1] in " +"]
+        return [text for text in old_side if text.strip()] == [text for text in new_side if text.strip()]
+
+    def _runs(self, hunks: List[List[_Line]], prefix: str) -> List[List[_Line]]:
+        """连续的删除行或新增行"""
+        runs = []
+        for lines in hunks:
+            current: List[_Line] = []
+            for line in lines:
+                if line.text.startswith(prefix):
+                    current.append(line)
+                elif not line.text.startswith("\\"):
+                    if current:
+                        runs.append(current)
+                    current = []
+            if current:
+                runs.append(current)
+        return [run for run in runs if sum(1 for line in run if line.text[1:].strip()) >= self.minimizer.moved_block_min_lines]
+
+    @staticmethod
+    def _block_key(run: List[_Line], normalize) -> str:
+        content = "\n".join(normalize(line.text[1:]) for line in run if line.text[1:].strip())
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def _collapse(self, run: List[_Line], note: str) -> None:
+        for line in run:
+            line.keep = False
+        run[0].moved_note = note
+        self.stats.moved_blocks += 1
+
+    def _collapse_moved_blocks(self, file_path: str, hunks: List[List[_Line]], normalize) -> None:
+        removed = {self._block_key(run, normalize): run for run in self._runs(hunks, "-")}
+        added = {self._block_key(run, normalize): run for run in self._runs(hunks, "+")}
+
+        for key, run in removed.items():
+            if key in added:
+                # 同一文件内移动：两侧都折叠
+                target = added[key]
+                self._collapse(run, f"# 省略移动的代码块（{len(run)}行，移动到第{target[0].new_no}行，内容未变）")
+                self._collapse(target, f"# 省略移动的代码块（{len(target)}行，移动自第{run[0].old_no}行，内容未变）")
+            elif key in self._added_blocks:
+                self._collapse(run, f"# 省略移动的代码块（{len(run)}行，已移动到 {self._added_blocks[key]}，内容未变）")
+            else:
+                self._removed_blocks.setdefault(key, file_path)
+
+        for key, run in added.items():
+            if key in removed:
+                continue
+            if key in self._removed_blocks:
+                self._collapse(run, f"# 省略移动的代码块（{len(run)}行，移动自 {self._removed_blocks[key]}，内容未变）")
+            else:
+                self._added_blocks.setdefault(key, file_path)
+
+    def _render_hunk(self, hunk: List[str], lines: List[_Line]) -> List[str]:
+        context = self.minimizer.context_lines
+        changed = [i for i, line in enumerate(lines) if line.keep and line.text[:1] in "+-"]
+
+        if not changed:
+            for line in lines:
+                line.keep = False
+        elif context >= 0:
+            # 只保留距离变更行context行以内的上下文
+            near = set()
+            for i in changed:
+                near.update(range(max(i - context, 0), min(i + context + 1, len(lines))))
+            for i, line in enumerate(lines):
+                if line.keep and line.text[:1] not in "+-\\" and i not in near:
+                    line.keep = False
+                    self.stats.context_lines += 1
+        # "\ No newline" 跟随其前一行
+        for i, line in enumerate(lines):
+            if line.text.startswith("\\"):
+                line.keep = i > 0 and lines[i - 1].keep
+
+        if all(line.keep for line in lines):
+            return hunk
+
+        output = []
+        group: List[_Line] = []
+        for line in lines + [None]:
+            if line is not None and line.keep:
+                group.append(line)
+                continue
+            if group:
+                output.extend(self._group_lines(hunk[0], group))
+                group = []
+            if line is not None and line.moved_note:
+                output.append(line.moved_note)
+        return output
+
+    @staticmethod
+    def _group_lines(header: str, group: List[_Line]) -> List[str]:
+        """按原始行号为保留的行重新生成hunk头"""
+        old_count = sum(1 for line in group if line.text[:1] not in "+\\")
+        new_count = sum(1 for line in group if line.text[:1] not in "-\\")
+        old_start = group[0].old_no if old_count else group[0].old_no - 1
+        new_start = group[0].new_no if new_count else group[0].new_no - 1
+        section = _HUNK_HEADER.match(header).group(5)
+        return [f"@@ -{old_start},{old_count} +{new_start},{new_count} @@{section}"] + [line.text for line in group]
+
+
+class DiffMinimizer:
+    """可配置的diff精简器，累计所有审查的节省量"""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        drop_whitespace_hunks: bool = True,
+        collapse_renames: bool = True,
+        collapse_moved_blocks: bool = True,
+        moved_block_min_lines: int = 5,
+        collapse_generated: bool = True,
+        context_lines: int = 3,
+    ):
+        """
+        Args:
+            enabled: 是否启用
+            drop_whitespace_hunks: 去掉只有空白变化的hunk
+            collapse_renames: 内容未变的重命名只保留一行说明
+            collapse_moved_blocks: 折叠原样移动的代码块
+            moved_block_min_lines: 视为移动代码块的最少非空行数
+            collapse_generated: 锁文件和生成代码只保留一行说明
+            context_lines: 变更行前后保留的上下文行数，-1表示不裁剪
+        """
+        self.enabled = enabled
+        self.drop_whitespace_hunks = drop_whitespace_hunks
+        self.collapse_renames = collapse_renames
+        self.collapse_moved_blocks = collapse_moved_blocks
+        self.moved_block_min_lines = max(moved_block_min_lines, 1)
+        self.collapse_generated = collapse_generated
+        self.context_lines = context_lines
+        self._totals = MinimizeStats()
+        self.reviews = 0
+
+    def session(self) -> DiffMinimizeSession:
+        """开始一次审查的精简"""
+        return DiffMinimizeSession(self)
+
+    def finish(self, session: DiffMinimizeSession, label: str = "") -> Dict[str, Any]:
+        """结束一次审查的精简，记录日志并累计统计"""
+        stats = session.stats
+        if not self.enabled or not stats.files:
+            return stats.to_dict()
+
+        self.reviews += 1
+        totals = self._totals
+        for name in ("files", "bytes_before", "bytes_after", "tokens_before", "tokens_after",
+                     "whitespace_hunks", "renames", "moved_blocks", "generated_files", "context_lines"):
+            setattr(totals, name, getattr(totals, name) + getattr(stats, name))
+
+        if stats.bytes_saved > 0:
+            logger.info(
+                f"diff精简{(' ' + label) if label else ''}: 节省 {stats.bytes_saved} 字节"
+                f"（约 {stats.tokens_saved} tokens，{stats.tokens_before} -> {stats.tokens_after}），"
+                f"空白hunk={stats.whitespace_hunks} 重命名={stats.renames} 移动块={stats.moved_blocks} "
+                f"生成文件={stats.generated_files} 上下文行={stats.context_lines}"
+            )
+        if stats.generated_paths:
+            logger.debug(f"省略的生成文件: {stats.generated_paths[:5]}{'...' if len(stats.generated_paths) > 5 else ''}")
+        return stats.to_dict()
+
+    def stats(self) -> Dict[str, Any]:
+        """累计精简统计"""
+        return {"enabled": self.enabled, "reviews": self.reviews, **self._totals.to_dict()}
+
+
+# 全局diff精简器实例
+diff_minimizer = DiffMinimizer(
+    enabled=settings.REVIEW_DIFF_MINIMIZE_ENABLED,
+    drop_whitespace_hunks=settings.REVIEW_DIFF_DROP_WHITESPACE_HUNKS,
+    collapse_renames=settings.REVIEW_DIFF_COLLAPSE_RENAMES,
+    collapse_moved_blocks=settings.REVIEW_DIFF_COLLAPSE_MOVED_BLOCKS,
+    moved_block_min_lines=settings.REVIEW_DIFF_MOVED_BLOCK_MIN_LINES,
+    collapse_generated=settings.REVIEW_DIFF_COLLAPSE_GENERATED,
+    context_lines=settings.REVIEW_DIFF_CONTEXT_LINES,
+)
@@ -0,0 +1,446 @@
+"""
+审查执行器
+
+审查任务持久化在 review_job 表中，按模型排队，每个模型的并发数取自模型能力中的
+concurrent_requests，避免批量触发审查时同时发出大量LLM请求、占用大量数据库连接。
+
+worker 通过 SELECT ... FOR UPDATE SKIP LOCKED 领取任务并持有租约，执行期间定期心跳续约；
+进程重启或崩溃后，租约过期的任务会被重新放回队列。
+"""
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.logging import get_logger
+from app.libs.ai_models import get_model_definition
+from app.models import CodeReview, ReviewJob
+
+logger = get_logger("review_executor")
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+class ReviewQueueFullError(Exception):
+    """审查队列已满"""
+    pass
+
+
+class _ModelLane:
+    """单个模型的调度器：有空闲并发槽位时从数据库领取任务"""
+
+    def __init__(self, model_id: str, concurrency: int):
+        self.model_id = model_id
+        self.concurrency = concurrency
+        self.slots = asyncio.Semaphore(concurrency)
+        self.wakeup = asyncio.Event()
+        self.dispatcher: Optional[asyncio.Task] = None
+        self.running: Set[asyncio.Task] = set()
+        self.processed = 0
+        self.failed = 0
+        self.claimed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "running": len(self.running),
+            "processed": self.processed,
+            "failed": self.failed,
+            "avg_wait_seconds": round(self.total_wait / self.claimed, 3) if self.claimed else 0.0,
+            "max_wait_seconds": round(self.max_wait, 3),
+        }
+
+
+class ReviewExecutor:
+    """按模型限流、基于数据库租约的审查任务执行器"""
+
+    def __init__(
+        self,
+        default_concurrency: int = 2,
+        max_concurrency: int = 0,
+        maxsize: int = 500,
+        lease_seconds: float = 120.0,
+        heartbeat_seconds: float = 30.0,
+        poll_seconds: float = 5.0,
+        max_attempts: int = 3,
+    ):
+        """
+        初始化执行器
+
+        Args:
+            default_concurrency: 模型未声明concurrent_requests时的并发数
+            max_concurrency: 单个模型并发数上限，0表示不限制
+            maxsize: 排队中的任务总数上限
+            lease_seconds: 租约时长，超过该时间未心跳的任务会被重新入队
+            heartbeat_seconds: 心跳续约间隔
+            poll_seconds: 空闲时轮询数据库的间隔（领取其他实例提交的任务）
+            max_attempts: 任务最多领取次数，超过后标记为失败
+        """
+        self.default_concurrency = default_concurrency
+        self.max_concurrency = max_concurrency
+        self.maxsize = maxsize
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handler: Optional[JobHandler] = None
+        self._lanes: Dict[str, _ModelLane] = {}
+        # 每个模型的请求级并发槽位：分片审查的一个任务会发出多个请求，也要受模型并发数限制
+        self._request_slots: Dict[str, asyncio.Semaphore] = {}
+        self._reaper: Optional[asyncio.Task] = None
+        self._started = False
+
+    def set_handler(self, handler: JobHandler) -> None:
+        """注册任务处理函数，参数为任务payload"""
+        self._handler = handler
+
+    def _model_concurrency(self, model_id: str) -> int:
+        """根据模型能力确定并发数"""
+        concurrency = None
+        try:
+            model_def = get_model_definition(model_id)
+            if model_def and model_def.capabilities:
+                concurrency = model_def.capabilities.concurrent_requests
+        except Exception as e:
+            logger.warning(f"获取模型并发能力失败: {model_id}, error: {e}")
+
+        concurrency = concurrency or self.default_concurrency
+        if self.max_concurrency > 0:
+            concurrency = min(concurrency, self.max_concurrency)
+        return max(1, concurrency)
+
+    def request_slots(self, model_id: str) -> asyncio.Semaphore:
+        """
+        获取模型的请求级并发槽位
+
+        任务槽位只限制同时执行的审查数，分片审查的一个任务会并发发出多个模型请求；
+        每次模型调用都需持有该槽位，保证单个模型的并发请求数不超过concurrent_requests。
+        """
+        slots = self._request_slots.get(model_id)
+        if slots is None:
+            slots = asyncio.Semaphore(self._model_concurrency(model_id))
+            self._request_slots[model_id] = slots
+        return slots
+
+    def _get_lane(self, model_id: str) -> _ModelLane:
+        lane = self._lanes.get(model_id)
+        if lane is None:
+            lane = _ModelLane(model_id, self._model_concurrency(model_id))
+            lane.dispatcher = asyncio.create_task(self._dispatch(lane))
+            self._lanes[model_id] = lane
+            logger.info(f"审查队列启动: model={model_id} concurrency={lane.concurrency}")
+        return lane
+
+    # ==================== 入队 ====================
+
+    async def enqueue(self, session: AsyncSession, review_id: int, model_id: str, payload: Dict[str, Any]) -> ReviewJob:
+        """
+        在调用方事务中写入审查任务，提交后调用notify唤醒worker
+
+        Raises:
+            ReviewQueueFullError: 排队任务数超过上限
+        """
+        if self.maxsize > 0:
+            queued = await session.scalar(
+                select(func.count(ReviewJob.id)).where(ReviewJob.status == JOB_QUEUED)
+            )
+            if queued >= self.maxsize:
+                raise ReviewQueueFullError(f"审查队列已满: {queued}")
+
+        job = ReviewJob(
+            review_id=review_id,
+            model_id=model_id,
+            status=JOB_QUEUED,
+            payload=payload,
+            queued_at=datetime.utcnow(),
+        )
+        session.add(job)
+        await session.flush()
+        return job
+
+    def notify(self, model_id: str) -> None:
+        """唤醒指定模型的调度器"""
+        if not self._started:
+            return
+        self._get_lane(model_id).wakeup.set()
+
+    # ==================== 领取与执行 ====================
+
+    async def _claim(self, model_id: str) -> Optional[ReviewJob]:
+        """领取一个排队中的任务，SKIP LOCKED保证多个worker/实例不会领到同一任务"""
+        async with AsyncSessionLocal() as session:
+            job = await session.scalar(
+                select(ReviewJob)
+                .where(ReviewJob.status == JOB_QUEUED, ReviewJob.model_id == model_id)
+                .order_by(ReviewJob.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            if job is None:
+                await session.rollback()
+                return None
+
+            now = datetime.utcnow()
+            job.status = JOB_RUNNING
+            job.attempts += 1
+            job.lease_owner = self.worker_id
+            job.lease_expires_at = now + timedelta(seconds=self.lease_seconds)
+            job.heartbeat_at = now
+            job.started_at = now
+            await session.commit()
+            return job
+
+    async def _dispatch(self, lane: _ModelLane) -> None:
+        """有空闲槽位时领取任务，没有任务时等待唤醒或定时轮询"""
+        while True:
+            await lane.slots.acquire()
+            try:
+                job = await self._claim(lane.model_id)
+            except Exception as e:
+                lane.slots.release()
+                logger.error(f"领取审查任务失败: model={lane.model_id} error: {e}")
+                await asyncio.sleep(self.poll_seconds)
+                continue
+
+            if job is None:
+                lane.slots.release()
+                lane.wakeup.clear()
+                try:
+                    await asyncio.wait_for(lane.wakeup.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            wait = max((job.started_at - job.queued_at).total_seconds(), 0.0)
+            lane.claimed += 1
+            lane.total_wait += wait
+            lane.max_wait = max(lane.max_wait, wait)
+
+            task = asyncio.create_task(self._run(lane, job))
+            lane.running.add(task)
+            task.add_done_callback(lane.running.discard)
+
+    async def _run(self, lane: _ModelLane, job: ReviewJob) -> None:
+        """执行任务，期间定期心跳续约"""
+        name = f"review:{job.review_id}"
+        logger.debug(f"审查任务开始: {name} model={lane.model_id} attempt={job.attempts}")
+        work = asyncio.create_task(self._handler(job.payload))
+        try:
+            while True:
+                done, _ = await asyncio.wait({work}, timeout=self.heartbeat_seconds)
+                if done:
+                    break
+                if not await self._heartbeat(job.id):
+                    # 租约已被回收（可能已由其他worker重新领取），放弃本次执行
+                    logger.warning(f"审查任务租约丢失，停止执行: {name}")
+                    work.cancel()
+                    await asyncio.gather(work, return_exceptions=True)
+                    return
+
+            error = work.exception()
+            if error is None:
+                lane.processed += 1
+                await self._finish(job.id, JOB_COMPLETED)
+                logger.debug(f"审查任务完成: {name} model={lane.model_id}")
+            else:
+                lane.failed += 1
+                await self._finish(job.id, JOB_FAILED, str(error))
+                logger.error(f"审查任务执行失败: {name} model={lane.model_id} error: {error}")
+        except asyncio.CancelledError:
+            work.cancel()
+            await asyncio.gather(work, return_exceptions=True)
+            raise
+        except Exception as e:
+            logger.error(f"审查任务状态更新失败: {name} error: {e}")
+        finally:
+            lane.slots.release()
+
+    async def _heartbeat(self, job_id: int) -> bool:
+        """续约，返回租约是否仍由当前worker持有"""
+        now = datetime.utcnow()
+        try:
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(
+                    update(ReviewJob)
+                    .where(
+                        ReviewJob.id == job_id,
+                        ReviewJob.status == JOB_RUNNING,
+                        ReviewJob.lease_owner == self.worker_id,
+                    )
+                    .values(heartbeat_at=now, lease_expires_at=now + timedelta(seconds=self.lease_seconds))
+                )
+                await session.commit()
+                return result.rowcount > 0
+        except Exception as e:
+            # 数据库短暂不可用时继续执行，等下一次心跳
+            logger.warning(f"审查任务心跳失败: job={job_id} error: {e}")
+            return True
+
+    async def _finish(self, job_id: int, status: str, error: Optional[str] = None) -> None:
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                update(ReviewJob)
+                .where(ReviewJob.id == job_id, ReviewJob.lease_owner == self.worker_id)
+                .values(
+                    status=status,
+                    last_error=error,
+                    lease_owner=None,
+                    lease_expires_at=None,
+                    finished_at=datetime.utcnow(),
+                )
+            )
+            await session.commit()
+
+    # ==================== 租约回收 ====================
+
+    async def requeue_stale_jobs(self, owner: Optional[str] = None) -> Dict[str, int]:
+        """
+        回收租约：将租约已过期（或属于指定owner）的执行中任务重新入队，超过最大次数的标记失败
+
+        Returns:
+            {"requeued": 重新入队数, "failed": 标记失败数}
+        """
+        now = datetime.utcnow()
+        condition = ReviewJob.lease_owner == owner if owner else ReviewJob.lease_expires_at < now
+
+        async with AsyncSessionLocal() as session:
+            jobs = (await session.scalars(
+                select(ReviewJob)
+                .where(ReviewJob.status == JOB_RUNNING, condition)
+                .with_for_update(skip_locked=True)
+            )).all()
+
+            requeued = failed = 0
+            for job in jobs:
+                job.lease_owner = None
+                job.lease_expires_at = None
+                if job.attempts >= self.max_attempts:
+                    job.status = JOB_FAILED
+                    job.finished_at = now
+                    job.last_error = f"超过最大重试次数({self.max_attempts})"
+                    await session.execute(
+                        update(CodeReview)
+                        .where(CodeReview.id == job.review_id, CodeReview.status == "pending")
+                        .values(status="failed", error_message=job.last_error, review_content=f"AI审查失败: {job.last_error}")
+                    )
+                    failed += 1
+                else:
+                    job.status = JOB_QUEUED
+                    requeued += 1
+            await session.commit()
+
+        if requeued or failed:
+            logger.info(f"回收审查任务租约: requeued={requeued} failed={failed}")
+        for job in jobs:
+            if job.status == JOB_QUEUED:
+                self.notify(job.model_id)
+        return {"requeued": requeued, "failed": failed}
+
+    async def _reap(self) -> None:
+        """定期回收过期租约（其他实例异常退出时）"""
+        while True:
+            await asyncio.sleep(self.lease_seconds)
+            try:
+                await self.requeue_stale_jobs()
+            except Exception as e:
+                logger.error(f"回收审查任务租约失败: {e}")
+
+    # ==================== 生命周期 ====================
+
+    async def start(self) -> None:
+        """启动执行器：回收过期租约，为有排队任务的模型启动调度器"""
+        if self._handler is None:
+            raise RuntimeError("未注册审查任务处理函数")
+        if self._started:
+            return
+        self._started = True
+
+        await self.requeue_stale_jobs()
+
+        async with AsyncSessionLocal() as session:
+            model_ids = (await session.scalars(
+                select(ReviewJob.model_id).where(ReviewJob.status == JOB_QUEUED).distinct()
+            )).all()
+        for model_id in model_ids:
+            self.notify(model_id)
+
+        self._reaper = asyncio.create_task(self._reap())
+        logger.info(f"审查执行器启动: worker={self.worker_id} pending_models={len(model_ids)}")
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """停止执行器：不再领取新任务，等待执行中的任务完成，未完成的任务放回队列"""
+        if not self._started:
+            return
+        self._started = False
+
+        lanes = list(self._lanes.values())
+        background: List[asyncio.Task] = [lane.dispatcher for lane in lanes if lane.dispatcher]
+        if self._reaper:
+            background.append(self._reaper)
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+
+        running = [task for lane in lanes for task in lane.running]
+        if running:
+            _, pending = await asyncio.wait(running, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            if pending:
+                await self.requeue_stale_jobs(owner=self.worker_id)
+                logger.warning(f"审查执行器关闭超时，{len(pending)} 个任务已放回队列")
+
+        self._lanes.clear()
+        self._reaper = None
+
+    async def stats(self) -> Dict[str, Any]:
+        """执行器统计信息"""
+        async with AsyncSessionLocal() as session:
+            rows = (await session.execute(
+                select(ReviewJob.model_id, ReviewJob.status, func.count(ReviewJob.id))
+                .where(ReviewJob.status.in_([JOB_QUEUED, JOB_RUNNING]))
+                .group_by(ReviewJob.model_id, ReviewJob.status)
+            )).all()
+
+        models: Dict[str, Dict[str, Any]] = {
+            model_id: lane.stats() for model_id, lane in self._lanes.items()
+        }
+        for model_id, status, count in rows:
+            models.setdefault(model_id, {})[status] = count
+
+        return {
+            "worker_id": self.worker_id,
+            "queued": sum(count for _, status, count in rows if status == JOB_QUEUED),
+            "running": sum(count for _, status, count in rows if status == JOB_RUNNING),
+            "maxsize": self.maxsize,
+            "models": models,
+        }
+
+
+# 全局审查执行器实例
+review_executor = ReviewExecutor(
+    default_concurrency=settings.REVIEW_DEFAULT_CONCURRENCY,
+    max_concurrency=settings.REVIEW_MAX_CONCURRENCY,
+    maxsize=settings.REVIEW_QUEUE_MAXSIZE,
+    lease_seconds=settings.REVIEW_JOB_LEASE_SECONDS,
+    heartbeat_seconds=settings.REVIEW_JOB_HEARTBEAT_SECONDS,
+    poll_seconds=settings.REVIEW_JOB_POLL_SECONDS,
+    max_attempts=settings.REVIEW_JOB_MAX_ATTEMPTS,
+)
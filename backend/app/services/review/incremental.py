@@ -0,0 +1,103 @@
+"""
+增量审查
+
+开发者推送修复后，只把自上次完成审查的提交以来变更的文件（interdiff）交给模型，
+未变更文件沿用上次审查发现的问题。
+"""
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from app.models import CodeReview, ReviewComment
+from app.services.review.ai_interfaces import ReviewResult
+from app.services.review.chunking import split_diff_by_file
+from app.services.review.prompt_renderer import AIResultParser
+from app.services.review.result_merger import LEVEL_ORDER, merge_issues
+
+_GIT_FILE_HEADER = re.compile(r"^diff --git a/(\S+) b/(\S+)")
+_FILE_HEADER = re.compile(r"^--- a/(.*)$", re.MULTILINE)
+
+# 评论类型与问题严重程度的对应关系（评论表只保存了类型）
+_COMMENT_SEVERITY = {
+    "error": "high",
+    "warning": "medium",
+    "suggestion": "low",
+    "info": "low",
+}
+
+
+@dataclass
+class IncrementalPlan:
+    """增量审查计划"""
+    base_review_id: int
+    base_commit_sha: str
+    changed_diff: str  # MR内自上次审查以来变更文件的diff
+    changed_files: List[str]
+    unchanged_files: List[str]
+    carried_result: ReviewResult  # 未变更文件沿用的审查结果
+    carried_weight: int  # 未变更文件diff的token数，合并评分时作为权重
+
+
+def diff_file_path(file_diff: str) -> Optional[str]:
+    """从单个文件的diff文本中解析文件路径"""
+    match = _GIT_FILE_HEADER.match(file_diff)
+    if match:
+        return match.group(2)
+    match = _FILE_HEADER.search(file_diff)
+    return match.group(1).strip() if match else None
+
+
+def diff_files(code_diff: str) -> Dict[str, str]:
+    """按文件路径拆分diff文本"""
+    files: Dict[str, str] = {}
+    for file_diff in split_diff_by_file(code_diff):
+        path = diff_file_path(file_diff)
+        if path:
+            files[path] = file_diff
+    return files
+
+
+def comment_to_issue(comment: ReviewComment) -> dict:
+    """将历史审查评论还原为问题项"""
+    content = comment.content or ""
+    return {
+        "id": f"comment_{comment.id}",
+        "type": comment.comment_type or "info",
+        "severity": _COMMENT_SEVERITY.get(comment.comment_type, "medium"),
+        "category": "代码质量",
+        "title": content.splitlines()[0][:80] if content else "历史问题",
+        "description": content,
+        "file": comment.file_path or "",
+        "line": comment.line_number,
+        "suggestion": "",
+        "carried_from_review": comment.review_id,
+    }
+
+
+def build_carried_result(previous: CodeReview, issues: Iterable[dict], summary: str) -> ReviewResult:
+    """用上次审查的评分和沿用的问题构建审查结果（不产生模型调用）"""
+    issues = merge_issues(issues)
+    severities = [issue["severity"] for issue in issues if issue.get("severity") in LEVEL_ORDER]
+    level = max(severities, key=LEVEL_ORDER.get) if severities else "low"
+
+    data = {
+        "score": previous.score or 0,
+        "level": level,
+        "summary": summary,
+        "categories": [],
+        "issues": issues,
+        "score_details": previous.score_details or {},
+        "improvements": [],
+    }
+    return ReviewResult(
+        score=data["score"],
+        level=level,
+        summary=summary,
+        categories=[],
+        issues=issues,
+        score_details=data["score_details"],
+        strengths=[],
+        improvements=[],
+        model_used=previous.reviewer_type or None,
+        review_content=AIResultParser()._build_markdown_review(data),
+    )
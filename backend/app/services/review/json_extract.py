@@ -0,0 +1,105 @@
+"""
+AI响应JSON提取
+
+单次扫描响应文本：依次尝试 ```json 代码块和顶层 { 位置，用 JSONDecoder.raw_decode
+原地解码，不对原文做正则清洗（避免破坏字符串中的 * 、# 等字符）。
+提供商开启JSON模式时响应本身就是JSON，直接走快速路径。
+
+基准测试见 scripts/bench_json_extract.py（make bench-json）。
+"""
+import json
+import re
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+_decoder = json.JSONDecoder()
+
+# ```json / ``` 代码块起始
+_FENCE_START = re.compile(r"```[ \t]*(?:json|JSON)?[ \t]*\r?\n")
+# 审查结果的特征字段，存在多个候选对象时优先选择包含这些字段的对象
+_EXPECTED_KEYS = ("score", "summary", "issues", "categories")
+# 单次提取最多尝试解码的位置数，防止病态输入导致平方级耗时
+MAX_DECODE_ATTEMPTS = 64
+
+
+def _decode_at(text: str, pos: int) -> Optional[Tuple[Any, int]]:
+    try:
+        return _decoder.raw_decode(text, pos)
+    except json.JSONDecodeError:
+        return None
+
+
+def _candidate_positions(text: str) -> Iterator[int]:
+    """按优先级给出可能的JSON起始位置：先代码块内，再全文的 {"""
+    seen = set()
+    for match in _FENCE_START.finditer(text):
+        pos = text.find("{", match.end())
+        if pos != -1 and pos not in seen:
+            seen.add(pos)
+            yield pos
+    pos = text.find("{")
+    while pos != -1:
+        if pos not in seen:
+            yield pos
+        pos = text.find("{", pos + 1)
+
+
+def _score(obj: Dict[str, Any]) -> int:
+    return sum(1 for key in _EXPECTED_KEYS if key in obj)
+
+
+def extract_json(text: str, json_mode: bool = False) -> Dict[str, Any]:
+    """
+    从AI响应中提取JSON对象
+
+    Args:
+        text: AI响应文本
+        json_mode: 提供商是否以JSON模式返回（响应应为纯JSON，不做扫描修复）
+
+    Returns:
+        解析出的JSON对象
+
+    Raises:
+        ValueError: 找不到有效的JSON对象
+    """
+    if not text:
+        raise ValueError("AI响应为空")
+
+    # 快速路径：JSON模式或以 { 开头的响应
+    stripped = text.strip()
+    if json_mode or stripped.startswith("{"):
+        try:
+            result = json.loads(stripped)
+            if isinstance(result, dict):
+                return result
+        except json.JSONDecodeError as e:
+            # JSON模式下响应本应是纯JSON，解析失败通常是输出被截断，扫描修复没有意义
+            if json_mode:
+                raise ValueError(f"JSON模式响应不是有效的JSON: {e}")
+        if json_mode:
+            raise ValueError("JSON模式响应不是JSON对象")
+
+    best: Optional[Dict[str, Any]] = None
+    skip_until = -1
+    attempts = 0
+    for pos in _candidate_positions(text):
+        # 已解码对象内部的 { 不再尝试
+        if pos < skip_until:
+            continue
+        attempts += 1
+        if attempts > MAX_DECODE_ATTEMPTS:
+            break
+        decoded = _decode_at(text, pos)
+        if decoded is None:
+            continue
+        obj, end = decoded
+        if not isinstance(obj, dict):
+            continue
+        skip_until = end
+        if _score(obj) >= 2:
+            return obj
+        if best is None or _score(obj) > _score(best):
+            best = obj
+
+    if best is not None:
+        return best
+    raise ValueError("无法解析AI响应为有效的JSON格式")
@@ -0,0 +1,112 @@
+"""
+审查请求预检
+
+发送前用本地token估算检查Prompt是否超出模型上下文窗口并预估成本，
+决定直接审查、分片审查还是提前拒绝，而不是等提供商返回上下文超限错误。
+"""
+import math
+from dataclasses import dataclass
+from typing import Optional
+
+from app.core.config import settings
+from app.libs.ai_models import ModelDefinition, get_token_estimator
+
+# 预检结论
+ROUTE_DIRECT = "direct"
+ROUTE_CHUNKED = "chunked"
+ROUTE_REJECT = "reject"
+
+
+@dataclass
+class PreflightResult:
+    """预检结果"""
+    route: str
+    diff_tokens: int
+    overhead_tokens: int  # 系统提示词和模板（不含diff）的token数
+    output_tokens: int  # 为输出预留的token数
+    context_window: Optional[int] = None
+    diff_budget: Optional[int] = None  # 单次请求中diff可用的token数
+    estimated_requests: int = 1
+    estimated_cost: Optional[float] = None
+    currency: Optional[str] = None
+    reason: str = ""
+    family: Optional[str] = None
+
+    @property
+    def prompt_tokens(self) -> int:
+        """预计的输入token总数（分片时每个请求都包含模板开销）"""
+        return self.diff_tokens + self.overhead_tokens * self.estimated_requests
+
+
+def preflight_review(
+    diff: str,
+    overhead_text: str,
+    model_def: Optional[ModelDefinition],
+    family: Optional[str] = None,
+    output_reserve: Optional[int] = None,
+) -> PreflightResult:
+    """
+    预检一次审查请求
+
+    Args:
+        diff: 待审查的diff
+        overhead_text: 不含diff的Prompt（系统提示词 + 渲染后的模板）
+        model_def: 模型定义，缺少能力信息时只估算不限制
+        family: 提供商家族，决定token估算方式
+        output_reserve: 为输出预留的token数，默认取配置
+
+    Returns:
+        预检结果
+    """
+    estimator = get_token_estimator(family)
+    output_tokens = settings.REVIEW_CHUNK_OUTPUT_RESERVE_TOKENS if output_reserve is None else output_reserve
+    result = PreflightResult(
+        route=ROUTE_DIRECT,
+        diff_tokens=estimator.count(diff),
+        # system + user 两条消息的格式开销
+        overhead_tokens=estimator.count(overhead_text) + estimator.tokens_per_message * 2,
+        output_tokens=output_tokens,
+        family=estimator.family,
+    )
+
+    capabilities = model_def.capabilities if model_def else None
+    if capabilities:
+        window = min(capabilities.context_window, capabilities.max_tokens)
+        result.context_window = window
+        available = window - output_tokens - result.overhead_tokens
+        if available <= 0:
+            result.route = ROUTE_REJECT
+            result.reason = (
+                f"模板和系统提示词约 {result.overhead_tokens} tokens，加上输出预留 {output_tokens} tokens "
+                f"已超出模型上下文窗口 {window} tokens"
+            )
+            return result
+
+        if result.diff_tokens > available:
+            if not settings.REVIEW_CHUNK_ENABLED:
+                result.route = ROUTE_REJECT
+                result.reason = (
+                    f"diff约 {result.diff_tokens} tokens，超出模型上下文窗口可用的 {available} tokens，"
+                    f"且未启用分片审查"
+                )
+                return result
+            result.route = ROUTE_CHUNKED
+            result.diff_budget = max(available, settings.REVIEW_CHUNK_MIN_TOKENS)
+            result.estimated_requests = math.ceil(result.diff_tokens / result.diff_budget)
+        else:
+            result.diff_budget = available
+
+    pricing = model_def.pricing if model_def else None
+    if pricing:
+        result.estimated_cost = pricing.calculate_cost(
+            result.prompt_tokens, result.output_tokens * result.estimated_requests
+        )
+        result.currency = pricing.currency
+        max_cost = settings.REVIEW_MAX_ESTIMATED_COST
+        if max_cost > 0 and result.estimated_cost > max_cost:
+            result.route = ROUTE_REJECT
+            result.reason = (
+                f"预计成本 {result.estimated_cost:.4f} {pricing.currency} 超出单次审查上限 {max_cost} "
+                f"（输入约 {result.prompt_tokens} tokens，{result.estimated_requests} 次请求）"
+            )
+    return result
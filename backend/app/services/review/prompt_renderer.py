@@ -1,32 +1,39 @@
 """
 Prompt渲染器和结果解析器实现 - 简化版本
 """
-import json
+import hashlib
 import re
 from typing import Dict, Any, List, Optional, Tuple
-from jinja2 import Environment, Template, StrictUndefined, TemplateError
+from jinja2 import TemplateError
 
+from app.core.cache import LRUCache
 from app.core.logging import get_logger
 from app.services.review.ai_interfaces import (
     PromptRendererInterface, ResultParserInterface, 
     PromptTemplate, ContextInfo, ReviewResult
 )
+from app.services.review.json_extract import extract_json
+from app.services.review_template.template_cache import compiled_templates
 from app.services.review_template.template_variables import TemplateVariables
 
 logger = get_logger("prompt_renderer")
 
+# Jinja变量、控制块和注释的起始标记
+_JINJA_TAG = re.compile(r"\{\{|\{%|\{#")
+# 模板按一级标题划分章节
+_SECTION_START = re.compile(r"(?m)^(?=# )")
+
 
 class Jinja2PromptRenderer(PromptRendererInterface):
     """基于Jinja2的Prompt渲染器 - 简化版本"""
     
     def __init__(self):
-        self.env = Environment(
-            undefined=StrictUndefined,
-            trim_blocks=True,
-            lstrip_blocks=True,
-            autoescape=False
-        )
+        # 编译结果在进程内共享，模板API更新/删除时失效
+        self.compiled_templates = compiled_templates
+        self.env = compiled_templates.env
         self.template_variables = TemplateVariables()
+        # 模板内容哈希 -> (静态部分, 动态部分模板源码)
+        self._split_cache = LRUCache(maxsize=256)
     
     def render_prompt(self, template: PromptTemplate, context: ContextInfo, code_diff: str) -> str:
         """渲染Prompt - 简化版本"""
@@ -35,7 +42,7 @@ class Jinja2PromptRenderer(PromptRendererInterface):
             render_data = self._build_render_data(context, code_diff)
             
             # 使用Jinja2渲染模板
-            jinja_template = self.env.from_string(template.content)
+            jinja_template = self.compiled_templates.get_template(template.content)
             rendered_prompt = jinja_template.render(**render_data)
             
             # 如果有自定义指令，添加到渲染后的prompt中
@@ -54,11 +61,58 @@ class Jinja2PromptRenderer(PromptRendererInterface):
             logger.error(f"模板渲染异常: {str(e)}")
             raise ValueError(f"模板渲染异常: {str(e)}")
     
+    def render_prompt_parts(self, template: PromptTemplate, context: ContextInfo, code_diff: str) -> Tuple[str, str]:
+        """
+        缓存友好的渲染：拆分为静态部分和动态部分
+
+        静态部分（不含模板变量的章节，如输出格式、审查规范）在不同请求间逐字节相同，
+        放在请求最前面可以命中提供商的前缀缓存；动态部分为渲染后的MR数据和自定义指令。
+
+        Returns:
+            (静态部分, 动态部分)
+        """
+        static_part, dynamic_source = self._split_template(template.content)
+        try:
+            rendered = ""
+            if dynamic_source:
+                rendered = self.compiled_templates.get_template(dynamic_source).render(**self._build_render_data(context, code_diff))
+        except TemplateError as e:
+            logger.error(f"模板渲染失败: {str(e)}")
+            raise ValueError(f"模板渲染失败: {str(e)}")
+
+        if context.custom_instructions:
+            rendered += f"\n\n# 自定义审查指令\n\n{context.custom_instructions}\n"
+        return static_part.strip(), rendered.strip()
+
+    def _split_template(self, content: str) -> Tuple[str, str]:
+        """按一级标题把模板拆成静态章节和含变量的章节，各自保持原有顺序"""
+        key = hashlib.sha256(content.encode("utf-8")).hexdigest()
+        cached = self._split_cache.get(key)
+        if cached is not None:
+            return cached
+
+        static_sections, dynamic_sections = [], []
+        for section in _SECTION_START.split(content):
+            if section:
+                (dynamic_sections if _JINJA_TAG.search(section) else static_sections).append(section)
+        split = ("".join(static_sections), "".join(dynamic_sections))
+        try:
+            for section in dynamic_sections:
+                self.env.parse(section)
+        except TemplateError:
+            # 控制块跨越了章节，退回为在第一个变量所在行处切分
+            match = _JINJA_TAG.search(content)
+            cut = content.rfind("\n", 0, match.start()) + 1
+            split = (content[:cut], content[cut:])
+
+        self._split_cache.set(key, split)
+        return split
+
     def validate_template(self, template: PromptTemplate) -> bool:
         """验证模板 - 简化版本，只进行基本语法检查"""
         try:
             # 基本语法验证
-            self.env.from_string(template.content)
+            self.compiled_templates.get_template(template.content)
             return True
         except TemplateError as e:
             logger.warning(f"模板语法验证失败: {str(e)}")
@@ -94,11 +148,11 @@ class Jinja2PromptRenderer(PromptRendererInterface):
 class AIResultParser(ResultParserInterface):
     """AI结果解析器 - 简化版本"""
     
-    def parse_response(self, ai_response: str, expected_format: Dict[str, Any] = None) -> ReviewResult:
-        """解析AI响应 - 简化版本"""
+    def parse_response(self, ai_response: str, expected_format: Dict[str, Any] = None, json_mode: bool = False) -> ReviewResult:
+        """解析AI响应，json_mode表示提供商以JSON模式返回"""
         try:
             # 智能JSON提取
-            json_data = self._extract_json(ai_response)
+            json_data = self._extract_json(ai_response, json_mode=json_mode)
             logger.debug("JSON提取成功")
             
             # 验证和清理数据
@@ -211,35 +265,9 @@ class AIResultParser(ResultParserInterface):
             logger.error(f"结果验证异常: {str(e)}")
             return False
     
-    def _extract_json(self, ai_response: str) -> Dict[str, Any]:
-        """JSON提取"""
-        
-        # 策略1: 尝试直接解析整个响应（最优先）
-        try:
-            ai_response=ai_response.strip().lstrip("```json").rstrip("```").strip()  # 移除可能的代码块标记
-            return json.loads(ai_response)
-        except json.JSONDecodeError:
-            logger.debug("直接解析整个响应失败")
-            raise ValueError("无法解析AI响应为有效的JSON格式")
-
-    
-    def _clean_response_for_json(self, response: str) -> str:
-        """清理响应内容，提取可能的JSON部分"""
-        # 移除Markdown标记
-        cleaned = re.sub(r'^#+\s*', '', response, flags=re.MULTILINE)
-        cleaned = re.sub(r'\*\*(.*?)\*\*', r'\1', cleaned)
-        cleaned = re.sub(r'\*(.*?)\*', r'\1', cleaned)
-        
-        # 查找可能的JSON开始和结束
-        start_match = re.search(r'\{', cleaned)
-        end_match = re.search(r'\}(?=\s*$)', cleaned)
-        
-        if start_match and end_match:
-            start_pos = start_match.start()
-            end_pos = end_match.end()
-            return cleaned[start_pos:end_pos]
-        
-        return cleaned
+    def _extract_json(self, ai_response: str, json_mode: bool = False) -> Dict[str, Any]:
+        """JSON提取：单次扫描代码块和顶层对象，不修改原文"""
+        return extract_json(ai_response, json_mode=json_mode)
     
     def _build_markdown_review(self, validated_data: Dict[str, Any]) -> str:
         """构建Markdown格式的审查报告"""
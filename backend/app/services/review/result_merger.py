@@ -0,0 +1,180 @@
+"""
+审查结果合并
+
+把多个审查结果（分片审查、缓存命中、沿用的历史问题等）合并为一个ReviewResult。
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from app.services.review.ai_interfaces import ReviewResult
+from app.services.review.prompt_renderer import AIResultParser
+
+LEVEL_ORDER = {"low": 0, "medium": 1, "high": 2, "critical": 3}
+
+
+def _max_level(levels: Iterable[Optional[str]], default: str = "medium") -> str:
+    """取最严重的级别"""
+    valid = [level for level in levels if level in LEVEL_ORDER]
+    return max(valid, key=LEVEL_ORDER.get) if valid else default
+
+
+def merge_issues(*issue_lists: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """合并问题列表：按(文件, 行号, 标题)去重，并重新编号"""
+    merged: List[Dict[str, Any]] = []
+    seen = set()
+    for issues in issue_lists:
+        for issue in issues or []:
+            key = (issue.get("file", ""), issue.get("line"), issue.get("title", ""))
+            if key in seen:
+                continue
+            seen.add(key)
+            merged.append(dict(issue, id=f"issue_{len(merged) + 1}"))
+    return merged
+
+
+def _merge_categories(results: Sequence[ReviewResult], weights: Sequence[float]) -> List[Dict[str, Any]]:
+    """同名分类按权重平均评分，级别取最严重，说明去重拼接"""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for result, weight in zip(results, weights):
+        for category in result.categories or []:
+            name = category.get("name", "")
+            item = merged.setdefault(name, {"weighted": 0.0, "weight": 0.0, "levels": [], "descriptions": []})
+            item["weighted"] += category.get("score", 0) * weight
+            item["weight"] += weight
+            item["levels"].append(category.get("level"))
+            description = category.get("description")
+            if description and description not in item["descriptions"]:
+                item["descriptions"].append(description)
+
+    return [
+        {
+            "name": name,
+            "score": round(item["weighted"] / item["weight"]) if item["weight"] else 0,
+            "level": _max_level(item["levels"]),
+            "description": "；".join(item["descriptions"]) or "未提供描述",
+        }
+        for name, item in merged.items()
+    ]
+
+
+def _merge_score_details(results: Sequence[ReviewResult], weights: Sequence[float]) -> Dict[str, Any]:
+    """旧格式评分详情按维度加权平均"""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for result, weight in zip(results, weights):
+        for dimension, detail in (result.score_details or {}).items():
+            if not isinstance(detail, dict):
+                continue
+            item = merged.setdefault(dimension, {"weighted": 0.0, "weight": 0.0, "reasons": []})
+            item["weighted"] += detail.get("score", 0) * weight
+            item["weight"] += weight
+            reason = detail.get("reason")
+            if reason and reason not in item["reasons"]:
+                item["reasons"].append(reason)
+
+    return {
+        dimension: {
+            "score": round(item["weighted"] / item["weight"]) if item["weight"] else 0,
+            "reason": "；".join(item["reasons"]),
+        }
+        for dimension, item in merged.items()
+    }
+
+
+def _unique(values: Iterable[Any]) -> List[Any]:
+    seen: List[Any] = []
+    for value in values:
+        if value not in seen:
+            seen.append(value)
+    return seen
+
+
+def merge_review_results(
+    results: Sequence[ReviewResult],
+    weights: Optional[Sequence[float]] = None,
+) -> ReviewResult:
+    """
+    合并多个审查结果
+
+    评分与分类评分按权重（通常为各部分diff的token数）加权平均，级别取最严重，
+    问题列表去重合并；token用量累加，请求耗时取最大值（各部分并发执行）。
+    失败的部分不参与评分，其数量记入failed_count；全部失败时返回错误结果。
+
+    Args:
+        results: 待合并的审查结果
+        weights: 各结果的权重，默认等权
+
+    Returns:
+        合并后的审查结果
+    """
+    if not results:
+        raise ValueError("没有可合并的审查结果")
+    if len(results) == 1:
+        return results[0]
+
+    weights = list(weights) if weights is not None else [1.0] * len(results)
+    succeeded = [(result, weight) for result, weight in zip(results, weights) if not result.error_message]
+    # 已合并过的结果中失败的部分也要累计
+    failed_count = len(results) - len(succeeded) + sum(result.failed_count for result, _ in succeeded)
+
+    usage = {
+        "tokens_used": sum(result.tokens_used or 0 for result in results),
+        "direct_token": sum(result.direct_token or 0 for result in results),
+        "cache_token": sum(result.cache_token or 0 for result in results),
+        "prompt_token": sum(result.prompt_token or 0 for result in results),
+        "completion_token": sum(result.completion_token or 0 for result in results),
+        "model_used": next((result.model_used for result in results if result.model_used), None),
+        "template_used": next((result.template_used for result in results if result.template_used), None),
+        "prompt_layout": next((result.prompt_layout for result in results if result.prompt_layout), None),
+        "request_duration": max((result.request_duration or 0 for result in results), default=None) or None,
+    }
+
+    if not succeeded:
+        first = results[0]
+        error_message = f"{len(results)} 个部分全部审查失败: {first.error_message}"
+        return ReviewResult(
+            score=0,
+            level="critical",
+            summary=f"AI审查失败: {error_message}",
+            categories=[],
+            issues=[],
+            error_message=error_message,
+            review_content=f"AI审查失败: {error_message}",
+            score_details=first.score_details,
+            strengths=[],
+            improvements=[],
+            failed_count=len(results),
+            **usage,
+        )
+
+    ok_results = [result for result, _ in succeeded]
+    ok_weights = [max(weight, 1) for _, weight in succeeded]
+    total_weight = sum(ok_weights)
+
+    summaries = _unique(result.summary for result in ok_results if result.summary)
+    summary = summaries[0] if len(summaries) == 1 else "\n".join(f"- {text}" for text in summaries)
+    if len(results) > len(succeeded):
+        summary += f"\n（{len(results) - len(succeeded)} 个部分审查失败，结果中未包含这些部分）"
+
+    merged_data = {
+        "score": round(sum(result.score * weight for result, weight in zip(ok_results, ok_weights)) / total_weight),
+        "level": _max_level(result.level for result in ok_results),
+        "summary": summary,
+        "categories": _merge_categories(ok_results, ok_weights),
+        "issues": merge_issues(*(result.issues for result in ok_results)),
+        "score_details": _merge_score_details(ok_results, ok_weights),
+        "strengths": _unique(item for result in ok_results for item in (result.strengths or [])),
+        "improvements": _unique(item for result in ok_results for item in (result.improvements or [])),
+    }
+
+    return ReviewResult(
+        score=merged_data["score"],
+        level=merged_data["level"],
+        summary=merged_data["summary"],
+        categories=merged_data["categories"],
+        issues=merged_data["issues"],
+        score_details=merged_data["score_details"],
+        strengths=merged_data["strengths"],
+        improvements=merged_data["improvements"],
+        review_content=AIResultParser()._build_markdown_review(merged_data),
+        failed_count=failed_count,
+        **usage,
+    )
@@ -0,0 +1,127 @@
+"""
+文件级审查结果缓存
+
+同一份文件diff会在cherry-pick、变基后的MR、强制刷新重试中反复出现。
+按（规范化diff哈希, 模板版本, 模型, 审查指令哈希）缓存解析出的单文件问题，命中时不再调用模型。
+"""
+import hashlib
+import re
+from typing import Any, Dict, List, Optional
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.services.review.ai_interfaces import PromptTemplate
+
+# hunk头中的行号随上下文偏移，不参与哈希
+_HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+\d+(?:,\d+)? @@")
+# git diff 中随提交变化的元信息行
+_VOLATILE_LINE = re.compile(r"^(?:index [0-9a-f]+\.\.[0-9a-f]+|diff --git )")
+
+
+def normalize_file_diff(file_diff: str) -> str:
+    """规范化单文件diff：去掉hunk行号、index行和行尾空白"""
+    lines = []
+    for line in file_diff.splitlines():
+        if _VOLATILE_LINE.match(line):
+            continue
+        lines.append(_HUNK_HEADER.sub("@@", line).rstrip())
+    return "\n".join(lines).strip()
+
+
+def template_key(template: PromptTemplate) -> str:
+    """模板标识：名称 + 内容哈希（内容变化即视为新版本）"""
+    digest = hashlib.sha256(template.content.encode("utf-8")).hexdigest()[:16]
+    return f"{template.name}:{digest}"
+
+
+def issue_matches_file(issue: Dict[str, Any], file_path: str) -> bool:
+    """判断问题是否属于指定文件（兼容模型输出的a/、b/前缀和相对路径）"""
+    issue_file = (issue.get("file") or "").strip()
+    if not issue_file:
+        return False
+    for prefix in ("a/", "b/"):
+        if issue_file.startswith(prefix) and not file_path.startswith(prefix):
+            issue_file = issue_file[len(prefix):]
+    return (
+        issue_file == file_path
+        or file_path.endswith("/" + issue_file)
+        or issue_file.endswith("/" + file_path)
+    )
+
+
+class ReviewCache:
+    """文件级审查结果缓存"""
+
+    def __init__(self, maxsize: int = 5000, ttl: Optional[float] = None, enabled: bool = True):
+        """
+        初始化缓存
+
+        Args:
+            maxsize: 最多缓存的文件条目数
+            ttl: 条目过期时间（秒）
+            enabled: 是否启用
+        """
+        self.enabled = enabled and maxsize > 0
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    @staticmethod
+    def _key(file_diff: str, template_id: str, model_id: str, instructions: str) -> tuple:
+        digest = hashlib.sha256(normalize_file_diff(file_diff).encode("utf-8")).hexdigest()
+        # 自定义指令（含增量审查等附加说明）会改变模型的关注点，不同指令下的结果不能互相复用
+        instructions_digest = hashlib.sha256(instructions.encode("utf-8")).hexdigest()[:16]
+        return (digest, template_id, model_id, instructions_digest)
+
+    def get(
+        self,
+        file_diff: str,
+        template_id: str,
+        model_id: str,
+        instructions: str = "",
+    ) -> Optional[Dict[str, Any]]:
+        """
+        获取缓存的单文件审查结果
+
+        Returns:
+            {"score": 覆盖该文件的那次审查的评分, "issues": 该文件的问题列表}，未命中返回None
+        """
+        if not self.enabled:
+            return None
+        return self._cache.get(self._key(file_diff, template_id, model_id, instructions))
+
+    def set(
+        self,
+        file_diff: str,
+        template_id: str,
+        model_id: str,
+        score: int,
+        issues: List[Dict[str, Any]],
+        instructions: str = "",
+    ) -> None:
+        """
+        写入单文件审查结果
+
+        模型只给出整次审查的评分，没有单文件评分。score记录覆盖该文件的那次审查的评分，
+        使用方按该文件diff的token数加权，即假设评分均匀分布在那次审查的diff上；
+        整体的评分详情无法拆分到文件，不写入缓存。
+        """
+        if not self.enabled:
+            return
+        self._cache.set(self._key(file_diff, template_id, model_id, instructions), {
+            "score": score,
+            "issues": issues,
+        })
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        return {"enabled": self.enabled, **self._cache.stats()}
+
+
+# 全局审查缓存实例
+review_cache = ReviewCache(
+    maxsize=settings.REVIEW_CACHE_MAXSIZE,
+    ttl=settings.REVIEW_CACHE_TTL_SECONDS or None,
+    enabled=settings.REVIEW_CACHE_ENABLED,
+)
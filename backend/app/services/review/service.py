@@ -1,19 +1,30 @@
 """
 ReviewService - 使用新的AI审查器架构
 """
-from typing import Dict, List, Optional, Any
+from typing import Dict, Optional, Any, AsyncIterator
 from sqlalchemy import select, delete
 from sqlalchemy.ext.asyncio import AsyncSession
+import io
 import re
 
 from app.core.config import settings
-from app.models import MergeRequest, CodeReview, ReviewComment, Project, AIModel, TokenUsage
+from app.core.gitlab import get_gitlab_client
+from app.models import MergeRequest, CodeReview, ReviewComment, Project, AIModel, TokenUsage, TokenUsagePrompt
 from app.libs.ai_models import get_model_definition
-from app.libs.gitlabx import GitLabClient
+from app.libs.gitlabx.exceptions import GitLabNotFoundError
+from app.libs.gitlabx.models import FileChangeInfo
 from app.libs.gitx import GitError
 from app.services.git import GitService
+from app.services.sync import SyncService
 from app.services.review.ai_reviewer import AIReviewer
-from app.services.review.ai_interfaces import ReviewRequest, ContextInfo
+from app.services.review.ai_interfaces import ReviewRequest, ReviewResult, ContextInfo
+from app.services.review.prompt_renderer import AIResultParser
+from app.services.review.executor import ReviewQueueFullError, review_executor
+from app.services.review.chunking import estimate_tokens
+from app.services.review.incremental import IncrementalPlan, build_carried_result, comment_to_issue, diff_files
+from app.services.review.result_merger import LEVEL_ORDER, merge_issues, merge_review_results
+from app.services.review.review_cache import issue_matches_file, review_cache, template_key
+from app.services.review.diff_minimizer import diff_minimizer
 from app.libs.file_filter import get_file_filter
 from app.core.logging import get_logger
 
@@ -33,10 +44,7 @@ class ReviewService:
     def gitlab_client(self):
         """延迟初始化GitLab客户端"""
         if self._gitlab_client is None:
-            self._gitlab_client = GitLabClient(
-                url=settings.GITLAB_URL,
-                token=settings.GITLAB_TOKEN
-            )
+            self._gitlab_client = get_gitlab_client()
         return self._gitlab_client
     
     @property
@@ -77,6 +85,9 @@ class ReviewService:
             if not project:
                 raise ValueError(f"Project not found: {merge_request.project_id}")
 
+            # webhook只写入了载荷字段，统计过期时在审查前按需刷新
+            await SyncService().ensure_merge_request_stats(session, project, merge_request)
+
             # 使用MR表中的最新commit sha，而不是从GitLab API获取
             if not merge_request.last_commit_sha:
                 raise ValueError("MR没有最新的commit sha信息，请先同步MR数据")
@@ -131,18 +142,34 @@ class ReviewService:
             session.add(review)
             await session.flush()
 
-            # 先提交pending状态到数据库
-            await session.commit()
+            # 审查任务与pending记录在同一事务中持久化，由执行器按模型限制并发执行
+            model_id = self.ai_reviewer.get_default_model_config().model_name
+            await review_executor.enqueue(session, review.id, model_id, {
+                "review_id": review.id,
+                "project_id": project.id,
+                "merge_request_id": merge_request.id,
+                "commit_sha": commit_sha,
+                "review_type": review_type,
+                "template_name": template_name,
+                "template_id": template_id,
+                "custom_instructions": custom_instructions,
+                # 强制刷新时完整重新审查，否则尽量基于上次审查做增量审查
+                "incremental": not force_refresh,
+                "repo_path": self._repo_path,
+            })
 
-            # 异步执行AI审查
-            import asyncio
-            asyncio.create_task(self._async_review_process(
-                review.id, project.id, merge_request.id, commit_sha, review_type, template_name, template_id, custom_instructions
-            ))
+            await session.commit()
+            review_executor.notify(model_id)
 
-            logger.info(f"AI review started for MR {merge_request.id} (type: {review_type}, commit: {commit_sha})")
+            logger.info(f"AI review queued for MR {merge_request.id} (type: {review_type}, commit: {commit_sha}, model: {model_id})")
             return review
 
+        except ReviewQueueFullError:
+            # 队列已满属于限流，回滚后不留下失败的审查记录，由调用方提示稍后重试
+            await session.rollback()
+            logger.warning(f"审查队列已满，拒绝MR {merge_request.id} 的审查请求")
+            raise
+
         except Exception as e:
             await session.rollback()
 
@@ -202,7 +229,8 @@ class ReviewService:
             review_type: str = "standard",
             template_name: Optional[str] = None,
             template_id: Optional[int] = None,
-            custom_instructions: str = ""
+            custom_instructions: str = "",
+            incremental: bool = True
     ):
         """异步执行AI审查过程"""
         from app.core.database import AsyncSessionLocal
@@ -247,15 +275,18 @@ class ReviewService:
                     # 将自定义指令添加到context中，供模板渲染器使用
                     context.custom_instructions = custom_instructions
 
-                # 创建审查请求
-                review_request = ReviewRequest(
-                    code_diff=code_diff,
-                    context=context,
-                    template=template
-                )
+                # 有已完成的历史审查时，只审查自上次审查以来变更的文件
+                plan = None
+                if incremental and review_type == "standard" and settings.REVIEW_INCREMENTAL_ENABLED:
+                    plan = await self._prepare_incremental_review(
+                        new_session, project, merge_request, commit_sha, code_diff
+                    )
 
-                # 执行AI审查
-                review_result = await self.ai_reviewer.review(review_request)
+                if plan:
+                    review_result = await self._incremental_review(plan, context, template)
+                else:
+                    # 执行AI审查（命中文件级缓存的文件不再调用模型）
+                    review_result = await self._review_with_cache(code_diff, context, template)
 
                 # 验证审查结果
                 if not review_result:
@@ -297,6 +328,226 @@ class ReviewService:
                 logger.error(f"Async code review failed: {str(e)}")
                 logger.debug(f"Traceback: {traceback.format_exc()}")
 
+    async def _prepare_incremental_review(
+            self,
+            session: AsyncSession,
+            project: Project,
+            merge_request: MergeRequest,
+            commit_sha: str,
+            code_diff: str
+    ) -> Optional[IncrementalPlan]:
+        """
+        基于最近一次已完成的审查构建增量审查计划
+
+        通过GitLab compare获取上次审查的提交到当前提交之间的变更（interdiff），
+        MR中在interdiff里出现的文件重新审查，其余文件沿用上次审查的问题。
+        无历史审查、比较失败或结果不完整时返回None，走完整审查。
+        """
+        previous = await session.scalar(
+            select(CodeReview).where(
+                CodeReview.merge_request_id == merge_request.id,
+                CodeReview.status == "completed",
+                CodeReview.commit_sha != commit_sha
+            ).order_by(CodeReview.id.desc()).limit(1)
+        )
+        if not previous:
+            return None
+
+        try:
+            compare = await self.gitlab_client.compare_commits(
+                project.gitlab_id, previous.commit_sha, commit_sha
+            )
+        except Exception as e:
+            # 强制推送后旧提交可能已不存在
+            logger.info(f"增量比较失败，完整审查 MR {merge_request.id}: {str(e)}")
+            return None
+
+        if compare["compare_timeout"]:
+            logger.info(f"增量比较超时，完整审查 MR {merge_request.id}")
+            return None
+
+        mr_files = diff_files(code_diff)
+        if not mr_files:
+            return None
+        touched = {path for change in compare["diffs"] for path in (change.new_path, change.old_path) if path}
+        changed_files = [path for path in mr_files if path in touched]
+        unchanged_files = [path for path in mr_files if path not in touched]
+
+        # interdiff限定在MR当前包含的文件内（变基引入的目标分支变更不在MR diff中）
+        changed_set = set(changed_files)
+
+        async def _changed_iter():
+            for change in compare["diffs"]:
+                if (change.new_path or change.old_path) in changed_set:
+                    yield change
+
+        changed_diff = await self._build_diff_text(_changed_iter(), project) if changed_files else ""
+
+        comments = (await session.scalars(
+            select(ReviewComment).where(
+                ReviewComment.review_id == previous.id,
+                ReviewComment.file_path.in_(unchanged_files)
+            )
+        )).all() if unchanged_files else []
+
+        base = previous.commit_sha[:8]
+        if changed_diff.strip():
+            summary = f"沿用提交 {base} 的审查结果（{len(unchanged_files)} 个未变更文件）"
+        else:
+            summary = f"自提交 {base} 的审查以来MR中的文件没有变化，沿用上次审查结果"
+        carried_result = build_carried_result(
+            previous, [comment_to_issue(comment) for comment in comments], summary
+        )
+
+        logger.info(
+            f"增量审查 MR {merge_request.id}: base={base} changed={len(changed_files)} "
+            f"unchanged={len(unchanged_files)} carried_issues={len(carried_result.issues)}"
+        )
+        return IncrementalPlan(
+            base_review_id=previous.id,
+            base_commit_sha=previous.commit_sha,
+            changed_diff=changed_diff,
+            changed_files=changed_files,
+            unchanged_files=unchanged_files,
+            carried_result=carried_result,
+            carried_weight=sum(estimate_tokens(mr_files[path]) for path in unchanged_files),
+        )
+
+    async def _incremental_review(
+            self,
+            plan: IncrementalPlan,
+            context: ContextInfo,
+            template: Optional[Any]
+    ) -> Any:
+        """只审查变更文件，再与沿用的结果合并"""
+        if not plan.changed_diff.strip():
+            return plan.carried_result
+
+        note = (
+            f"本次为增量审查：下方仅包含自提交 {plan.base_commit_sha[:8]} 以来变更的 "
+            f"{len(plan.changed_files)} 个文件，其余文件已在上次审查中覆盖。"
+        )
+        context.custom_instructions = f"{context.custom_instructions}\n\n{note}" if context.custom_instructions else note
+
+        review_result = await self._review_with_cache(plan.changed_diff, context, template)
+        if review_result.error_message or not plan.unchanged_files:
+            return review_result
+
+        return merge_review_results(
+            [review_result, plan.carried_result],
+            [estimate_tokens(plan.changed_diff), plan.carried_weight]
+        )
+
+    async def _review_with_cache(
+            self,
+            code_diff: str,
+            context: ContextInfo,
+            template: Optional[Any]
+    ) -> ReviewResult:
+        """
+        带文件级缓存的AI审查
+
+        按文件拆分diff，命中缓存（规范化diff哈希 + 模板版本 + 模型 + 审查指令）的文件直接复用
+        上次解析出的问题，只把未命中的文件交给模型，最后按token数加权合并结果。
+        """
+        files = diff_files(code_diff) if review_cache.enabled else {}
+        if not files:
+            return await self.ai_reviewer.review(ReviewRequest(code_diff=code_diff, context=context, template=template))
+
+        template = template or await self.ai_reviewer.get_default_template()
+        template_id = template_key(template)
+        model_id = self.ai_reviewer.get_default_model_config().model_name
+        instructions = context.custom_instructions or ""
+
+        cached: Dict[str, Dict[str, Any]] = {}
+        missed: Dict[str, str] = {}
+        for path, file_diff in files.items():
+            entry = review_cache.get(file_diff, template_id, model_id, instructions)
+            if entry is None:
+                missed[path] = file_diff
+            else:
+                cached[path] = entry
+
+        if not cached:
+            review_result = await self.ai_reviewer.review(ReviewRequest(code_diff=code_diff, context=context, template=template))
+            self._store_review_cache(review_result, files, template_id, model_id, instructions)
+            return review_result
+
+        logger.info(f"审查缓存命中 {len(cached)}/{len(files)} 个文件，跳过这些文件的模型调用")
+        cached_result = self._build_cached_result(cached, files, model_id, template.name)
+        if not missed:
+            return cached_result
+
+        missed_diff = "".join(missed.values())
+        review_result = await self.ai_reviewer.review(ReviewRequest(code_diff=missed_diff, context=context, template=template))
+        if review_result.error_message:
+            return review_result
+        self._store_review_cache(review_result, missed, template_id, model_id, instructions)
+
+        return merge_review_results(
+            [review_result, cached_result],
+            [estimate_tokens(missed_diff), sum(estimate_tokens(files[path]) for path in cached)]
+        )
+
+    @staticmethod
+    def _store_review_cache(
+            review_result: ReviewResult,
+            files: Dict[str, str],
+            template_id: str,
+            model_id: str,
+            instructions: str = ""
+    ) -> None:
+        """把审查结果按文件写入缓存，失败、部分失败（如有分片失败）、分片审查或未给出评分的结果不缓存"""
+        # 失败分片中的文件没有被审查，按文件过滤问题会把它们当作没有问题缓存
+        if review_result.error_message or review_result.failed_count or not review_result.score:
+            return
+        # 分片审查的Prompt带有分片说明，评分也只针对所在分片，与缓存键对应的完整审查不一致
+        if review_result.chunk_count:
+            return
+        for path, file_diff in files.items():
+            issues = [issue for issue in review_result.issues or [] if issue_matches_file(issue, path)]
+            review_cache.set(file_diff, template_id, model_id, review_result.score, issues, instructions)
+
+    @staticmethod
+    def _build_cached_result(
+            cached: Dict[str, Dict[str, Any]],
+            files: Dict[str, str],
+            model_id: str,
+            template_name: str
+    ) -> ReviewResult:
+        """用缓存的单文件结果构建审查结果（不产生模型调用）"""
+        weights = {path: max(estimate_tokens(files[path]), 1) for path in cached}
+        total_weight = sum(weights.values())
+        score = round(sum(entry["score"] * weights[path] for path, entry in cached.items()) / total_weight)
+        issues = merge_issues(*(entry["issues"] for entry in cached.values()))
+        severities = [issue["severity"] for issue in issues if issue.get("severity") in LEVEL_ORDER]
+        level = max(severities, key=LEVEL_ORDER.get) if severities else "low"
+        # 缓存只保存单文件数据，整体评分详情无法从文件重建
+        score_details: Dict[str, Any] = {}
+
+        data = {
+            "score": score,
+            "level": level,
+            "summary": f"{len(cached)} 个文件的diff与已审查内容相同，沿用缓存的审查结果",
+            "categories": [],
+            "issues": issues,
+            "score_details": score_details,
+            "improvements": [],
+        }
+        return ReviewResult(
+            score=score,
+            level=level,
+            summary=data["summary"],
+            categories=[],
+            issues=issues,
+            score_details=score_details,
+            strengths=[],
+            improvements=[],
+            model_used=model_id,
+            template_used=template_name,
+            review_content=AIResultParser()._build_markdown_review(data),
+        )
+
     async def _build_ai_context(
             self,
             session: AsyncSession,
@@ -341,15 +592,14 @@ class ReviewService:
                 except GitError as e:
                     logger.warning(f"GitX获取差异失败，降级到GitLab API: {str(e)}")
 
-            # 降级到GitLab API
-            changes = self.gitlab_client.get_merge_request_changes(
-                project.gitlab_id, merge_request.gitlab_id
-            )
+            # 降级到GitLab API，按页流式拉取文件diff
+            changes = self._iter_merge_request_diffs(project, merge_request)
+            code_diff = await self._build_diff_text(changes, project)
 
-            if not changes:
+            if not code_diff:
                 raise ValueError("无法获取合并请求的代码变更")
 
-            return self._build_diff_text(changes, project)
+            return code_diff
 
         except Exception as e:
             raise ValueError(f"获取代码差异失败: {str(e)}")
@@ -802,6 +1052,7 @@ class ReviewService:
             logger.debug(f"被过滤的文件: {ignored_files[:5]}{'...' if len(ignored_files) > 5 else ''}")
         
         diff_parts = []
+        minimize = diff_minimizer.session()
 
         for file_change in diff_info.files:
             try:
@@ -832,7 +1083,7 @@ class ReviewService:
                                 diff_info.commit_sha,
                                 diff_info.base_sha
                             )
-                            diff_parts.append(file_diff)
+                            diff_parts.append(minimize.minimize_file(file_path, file_diff))
                         except Exception:
                             diff_parts.append(f"@@ 修改文件: {file_path} (+{file_change.additions}/-{file_change.deletions})")
                     else:
@@ -844,53 +1095,89 @@ class ReviewService:
                 logger.error(f"Error processing file change {file_change.file_path}: {str(e)}")
                 continue
 
+        diff_minimizer.finish(minimize, f"commit {diff_info.commit_sha[:8]}")
         return "\n".join(diff_parts)
 
-    def _build_diff_text(self, changes: List[Any], project: Project) -> str:
-        """构建代码差异文本"""
+    async def _iter_merge_request_diffs(
+            self,
+            project: Project,
+            merge_request: MergeRequest
+    ) -> AsyncIterator[FileChangeInfo]:
+        """流式获取MR的文件diff，GitLab不支持分页diffs接口时退化为changes接口"""
+        yielded = False
+        try:
+            async for change in self.gitlab_client.iter_merge_request_diffs(
+                project.gitlab_id, merge_request.gitlab_id
+            ):
+                yielded = True
+                yield change
+            return
+        except GitLabNotFoundError:
+            if yielded:
+                raise
+            logger.debug(f"diffs接口不可用，退化为changes接口: MR {merge_request.id}")
+
+        for change in await self.gitlab_client.get_merge_request_changes(
+            project.gitlab_id, merge_request.gitlab_id
+        ):
+            yield change
+
+    async def _build_diff_text(self, changes: AsyncIterator[FileChangeInfo], project: Project) -> str:
+        """逐个文件消费diff流，过滤后写入同一个缓冲区构建代码差异文本"""
         # 获取文件过滤器
         file_filter = self._get_file_filter_for_project(project)
-        
-        # 获取所有文件路径
-        all_file_paths = []
-        for change in changes:
-            file_path = change.new_path or change.old_path or "unknown"
-            all_file_paths.append(file_path)
-        
-        # 过滤文件
-        filtered_files = file_filter.filter_file_list(all_file_paths)
-        ignored_files = file_filter.get_ignored_files(all_file_paths)
-        
-        # 记录过滤信息
-        if ignored_files:
-            logger.info(f"过滤了 {len(ignored_files)} 个文件，保留 {len(filtered_files)} 个文件进行审查")
-            logger.debug(f"被过滤的文件: {ignored_files[:5]}{'...' if len(ignored_files) > 5 else ''}")
-        
-        diff_parts = []
 
-        for change in changes:
+        buffer = io.StringIO()
+        minimize = diff_minimizer.session()
+        kept_count = 0
+        ignored_files = []
+        truncated_files = []
+
+        async for change in changes:
             try:
                 file_path = change.new_path or change.old_path or "unknown"
-                
+
                 # 跳过被过滤的文件
-                if file_path not in filtered_files:
+                if file_filter.should_ignore_file(file_path):
+                    ignored_files.append(file_path)
                     continue
-                
-                diff_parts.append(f"--- a/{file_path}")
-                diff_parts.append(f"+++ b/{file_path}")
 
-                # 确保diff不为空
-                if hasattr(change, 'diff') and change.diff:
-                    diff_parts.append(change.diff)
+                kept_count += 1
+                buffer.write(f"--- a/{file_path}\n")
+                buffer.write(f"+++ b/{file_path}\n")
+
+                if change.is_truncated:
+                    # GitLab省略了该文件的diff内容，明确告知审查模型而不是当作空变更
+                    truncated_files.append(file_path)
+                    reason = "too_large" if change.too_large else "collapsed"
+                    buffer.write(f"# Diff omitted by GitLab ({reason}): file changed but content is not available\n")
                 else:
-                    diff_parts.append("# No diff content available")
+                    file_diff = change.diff
+                    if change.diff or change.renamed_file:
+                        file_diff = minimize.minimize_file(
+                            file_path, change.diff, change.old_path if change.renamed_file else None
+                        )
+                    if file_diff:
+                        buffer.write(file_diff)
+                        if not file_diff.endswith("\n"):
+                            buffer.write("\n")
+                    else:
+                        buffer.write("# No diff content available\n")
 
-                diff_parts.append("")  # 空行分隔
+                buffer.write("\n")  # 空行分隔
             except Exception as e:
                 logger.error(f"Error processing change: {str(e)}")
                 continue
 
-        return "\n".join(diff_parts)
+        # 记录过滤信息
+        if ignored_files:
+            logger.info(f"过滤了 {len(ignored_files)} 个文件，保留 {kept_count} 个文件进行审查")
+            logger.debug(f"被过滤的文件: {ignored_files[:5]}{'...' if len(ignored_files) > 5 else ''}")
+        if truncated_files:
+            logger.warning(f"{len(truncated_files)} 个文件的diff被GitLab省略: {truncated_files[:5]}{'...' if len(truncated_files) > 5 else ''}")
+        diff_minimizer.finish(minimize, f"project {project.id}")
+
+        return buffer.getvalue()
 
     def _get_file_filter_for_project(self, project: Project):
         """
@@ -1010,6 +1297,15 @@ class ReviewService:
             )
             
             session.add(token_usage)
+
+            # 记录使用的模板和提示词布局，用于按模板统计缓存命中率
+            if review_result.template_used:
+                await session.flush()
+                session.add(TokenUsagePrompt(
+                    token_usage_id=token_usage.id,
+                    template_name=review_result.template_used[:100],
+                    prompt_layout=review_result.prompt_layout or "inline"
+                ))
             logger.info(f"创建Token使用记录: 模型={ai_model.provider}/{ai_model.model_name}, "
                        f"总token={token_usage.total_tokens}, 成本=¥{cost or 0:.4f}")
             
@@ -1266,7 +1562,7 @@ class ReviewService:
 """
 
         try:
-            self.gitlab_client.create_merge_request_note(
+            await self.gitlab_client.create_merge_request_note(
                 project.gitlab_id,
                 merge_request.gitlab_id,
                 comment_body
@@ -1274,4 +1570,14 @@ class ReviewService:
         except Exception as e:
             logger.error(f"Failed to create GitLab comment: {str(e)}")
             import traceback
-            logger.debug(f"Traceback: {traceback.format_exc()}")
\ No newline at end of file
+            logger.debug(f"Traceback: {traceback.format_exc()}")
+
+
+async def run_review_job(payload: Dict[str, Any]) -> None:
+    """执行器回调：按任务参数执行一次AI审查"""
+    params = dict(payload)
+    service = ReviewService(repo_path=params.pop("repo_path", None))
+    await service._async_review_process(**params)
+
+
+review_executor.set_handler(run_review_job)
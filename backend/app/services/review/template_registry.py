@@ -0,0 +1,66 @@
+"""
+审查模板注册表
+
+进程内缓存默认模板、按名称查找的模板和内置模板，审查热路径上不再查询数据库或重建模板。
+模板API写入后调用 invalidate() 失效；多进程部署时其他进程的修改依赖过期时间生效。
+"""
+from typing import Awaitable, Callable, Hashable, Optional
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.services.review.ai_interfaces import PromptTemplate
+
+_MISSING = object()
+
+
+class TemplateRegistry:
+    """审查模板的进程内缓存"""
+
+    def __init__(self, ttl: Optional[float] = None, maxsize: int = 128):
+        """
+        Args:
+            ttl: 缓存过期时间（秒），None表示只在失效时刷新
+            maxsize: 最多缓存的模板数
+        """
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+        # 失效代数：加载期间发生失效时丢弃加载结果，避免缓存旧模板
+        self._generation = 0
+
+    async def get(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Optional[PromptTemplate]]],
+    ) -> Optional[PromptTemplate]:
+        """
+        获取模板，未缓存时调用loader加载
+
+        loader返回None（模板不存在）也会缓存；loader抛出的异常不缓存，直接向上抛出。
+        """
+        cached = self._cache.get(key, _MISSING)
+        if cached is not _MISSING:
+            return cached
+
+        generation = self._generation
+        template = await loader()
+        if generation == self._generation:
+            self._cache.set(key, template)
+        return template
+
+    def get_builtin(self, builder: Callable[[], PromptTemplate]) -> PromptTemplate:
+        """获取内置模板，只在首次或失效后构建"""
+        template = self._cache.get("builtin", _MISSING)
+        if template is _MISSING:
+            template = builder()
+            self._cache.set("builtin", template)
+        return template
+
+    def invalidate(self) -> None:
+        """模板创建、修改、删除或切换默认后清空缓存"""
+        self._generation += 1
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+template_registry = TemplateRegistry(ttl=settings.REVIEW_TEMPLATE_CACHE_TTL_SECONDS or None)
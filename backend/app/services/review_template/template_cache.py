@@ -0,0 +1,67 @@
+"""
+编译后的Jinja模板缓存
+
+模板源码按内容哈希缓存编译结果和AST中提取的未声明变量，
+避免每次审查或模板渲染都重新词法分析和编译。
+"""
+import hashlib
+from typing import Any, Dict, List, Tuple
+
+from jinja2 import Environment, StrictUndefined, Template, meta
+
+from app.core.cache import LRUCache
+
+
+def create_template_environment() -> Environment:
+    """创建审查模板使用的Jinja环境"""
+    return Environment(
+        undefined=StrictUndefined,
+        trim_blocks=True,
+        lstrip_blocks=True,
+        autoescape=False
+    )
+
+
+class CompiledTemplateCache:
+    """按模板内容哈希缓存编译结果的LRU缓存"""
+
+    def __init__(self, env: Environment, maxsize: int = 256):
+        self.env = env
+        self._cache = LRUCache(maxsize=maxsize)
+
+    @staticmethod
+    def _key(source: str) -> str:
+        return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+    def _load(self, source: str) -> Tuple[Template, List[str]]:
+        key = self._key(source)
+        entry = self._cache.get(key)
+        if entry is None:
+            # 只解析一次：AST同时用于提取变量和编译
+            ast = self.env.parse(source)
+            variables = sorted(meta.find_undeclared_variables(ast))
+            entry = (self.env.from_string(ast), variables)
+            self._cache.set(key, entry)
+        return entry
+
+    def get_template(self, source: str) -> Template:
+        """获取编译后的模板，语法错误时抛出TemplateError"""
+        return self._load(source)[0]
+
+    def get_variables(self, source: str) -> List[str]:
+        """获取模板中引用的未声明变量"""
+        return list(self._load(source)[1])
+
+    def invalidate(self, source: str) -> None:
+        """模板更新或删除时移除旧内容的编译结果"""
+        if source:
+            self._cache.invalidate(self._key(source))
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+compiled_templates = CompiledTemplateCache(create_template_environment())
@@ -3,11 +3,12 @@
 """
 from typing import Dict, Any, List, Optional
 
-from jinja2 import Environment, Template, StrictUndefined, TemplateError
+from jinja2 import TemplateError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from app.models.prompt_template import PromptTemplate
+from app.services.review_template.template_cache import compiled_templates
 from app.services.review_template.template_variables import TemplateVariables
 from app.core.logging import logger
 from app.services.review.template_builder import ReviewTemplateBuilder
@@ -22,12 +23,9 @@ class TemplateService:
     """模板服务"""
     
     def __init__(self):
-        self.env = Environment(
-            undefined=StrictUndefined,
-            trim_blocks=True,
-            lstrip_blocks=True,
-            autoescape=False
-        )
+        # 编译后的模板按内容缓存，与审查渲染器共享
+        self.compiled_templates = compiled_templates
+        self.env = compiled_templates.env
         
         # 使用新的变量定义
         self.template_variables = TemplateVariables()
@@ -52,7 +50,7 @@ class TemplateService:
     def render_template(self, template_content: str, render_data: Dict[str, Any]) -> str:
         """渲染模板"""
         try:
-            template = self.env.from_string(template_content)
+            template = self.compiled_templates.get_template(template_content)
             return template.render(**render_data)
         except TemplateError as e:
             logger.error(f"模板渲染失败: {str(e)}")
@@ -64,15 +62,15 @@ class TemplateService:
 
         
     def _extract_template_variables(self, template_content: str) -> List[str]:
-        """提取模板中使用的变量"""
+        """提取模板中使用的变量（基于Jinja AST，结果随编译结果缓存）"""
         try:
-            template = self.env.from_string(template_content)
-            # 这里简化处理，实际可以通过解析AST来获取变量
-            import re
-            variables = re.findall(r'\{\{\s*(\w+)\s*\}\}', template_content)
-            return list(set(variables))
+            return self.compiled_templates.get_variables(template_content)
         except Exception:
             return []
+
+    def invalidate_template(self, template_content: Optional[str]) -> None:
+        """模板内容变更或删除后移除其编译缓存"""
+        self.compiled_templates.invalidate(template_content)
             
 
 
@@ -228,6 +226,7 @@ class TemplateService:
             template = await self.get_template_by_id(session, template_id)
             if not template:
                 return None
+            old_content = template.template_content
             
             # 更新字段
             for key, value in kwargs.items():
@@ -236,6 +235,8 @@ class TemplateService:
             
             await session.flush()
             await session.refresh(template)
+            if template.template_content != old_content:
+                self.invalidate_template(old_content)
             
             return template
         except Exception as e:
@@ -253,6 +254,7 @@ class TemplateService:
             # 软删除：设置为非激活状态
             template.is_active = False
             await session.flush()
+            self.invalidate_template(template.template_content)
             
             return True
         except Exception as e:
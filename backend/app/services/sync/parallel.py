@@ -0,0 +1,103 @@
+"""
+并发同步辅助工具
+
+提供有界并发执行和分页并发拉取，供SyncService在项目间、页之间并行同步使用。
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Iterable, List, Tuple, TypeVar
+
+from app.libs.gitlabx.models import PaginationInfo
+from app.core.logging import get_logger
+
+logger = get_logger("sync_parallel")
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+PageFetcher = Callable[[int], Awaitable[Tuple[List[T], PaginationInfo]]]
+
+
+class PartialFetchError(Exception):
+    """部分分页拉取失败，items为已成功拉取的数据"""
+
+    def __init__(self, items: List[Any], failed_pages: List[int]):
+        super().__init__(f"failed pages: {failed_pages}")
+        self.items = items
+        self.failed_pages = failed_pages
+
+
+async def run_bounded(
+    items: Iterable[T],
+    worker: Callable[[T], Awaitable[R]],
+    limit: int,
+) -> List[Any]:
+    """
+    以最多limit个并发执行worker
+
+    Args:
+        items: 待处理对象
+        worker: 处理协程
+        limit: 最大并发数
+
+    Returns:
+        与items顺序一致的结果列表，失败项为对应的异常对象
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def _run(item: T) -> R:
+        async with semaphore:
+            return await worker(item)
+
+    return await asyncio.gather(*(_run(item) for item in items), return_exceptions=True)
+
+
+async def fetch_all_pages(fetch_page: PageFetcher, concurrency: int) -> List[T]:
+    """
+    并发拉取所有分页数据
+
+    先请求第一页获取总页数，再以有界并发拉取剩余页；
+    GitLab未返回总页数时（如结果超过10000条）退化为顺序翻页。
+
+    Args:
+        fetch_page: 按页码拉取数据的协程函数
+        concurrency: 单个列表的最大并发页数
+
+    Returns:
+        按页码顺序合并后的数据
+
+    Raises:
+        PartialFetchError: 有分页拉取失败，调用方不能把结果当作完整列表
+    """
+    items, pagination = await fetch_page(1)
+    if not items or not pagination.has_next:
+        return list(items)
+
+    results = list(items)
+
+    if pagination.total_pages:
+        pages = range(2, pagination.total_pages + 1)
+        page_results = await run_bounded(pages, fetch_page, concurrency)
+        failed_pages = []
+        for page, page_result in zip(pages, page_results):
+            if isinstance(page_result, Exception):
+                logger.error(f"action: fetch_page page: {page} error: {page_result}")
+                failed_pages.append(page)
+                continue
+            results.extend(page_result[0])
+        if failed_pages:
+            raise PartialFetchError(results, failed_pages)
+        return results
+
+    page = 2
+    while True:
+        try:
+            items, pagination = await fetch_page(page)
+        except Exception as e:
+            logger.error(f"action: fetch_page page: {page} error: {e}")
+            raise PartialFetchError(results, [page]) from e
+        results.extend(items)
+        if not items or not pagination.has_next:
+            break
+        page += 1
+
+    return results
@@ -1,16 +1,19 @@
 """
 GitLab数据同步服务
 """
-from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional
-from sqlalchemy import select, and_
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Callable, Awaitable, Tuple
+from sqlalchemy import select, and_, func, delete
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.exc import IntegrityError
 
-from app.models import Project, MergeRequest, CodeReview
-from app.libs.gitlabx import GitLabClient, GitLabError
-from app.libs.gitlabx.models import ProjectInfo, MergeRequestInfo
+from app.models import Project, MergeRequest, CodeReview, ProjectSyncState, MergeRequestSyncState
+from app.libs.gitlabx import GitLabError, request_priority, PRIORITY_BULK
+from app.libs.gitlabx.models import ProjectInfo, MergeRequestInfo, CommitInfo
 from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.gitlab import get_gitlab_client
+from app.services.sync.parallel import PartialFetchError, run_bounded, fetch_all_pages
+from app.services.sync.upsert import upsert_projects, upsert_merge_requests
 from app.core.logging import get_logger, log_performance, LogContext
 
 logger = get_logger("sync_service")
@@ -19,6 +22,9 @@ logger = get_logger("sync_service")
 class SyncService:
     """GitLab数据同步服务 - 重构版本"""
     
+    # 每批写入的MR数量（与GitLab单页数量一致）
+    MR_BATCH_SIZE = 100
+    
     def __init__(self):
         self._gitlab_client = None
     
@@ -26,25 +32,34 @@ class SyncService:
     def gitlab_client(self):
         """延迟初始化GitLab客户端"""
         if self._gitlab_client is None:
-            self._gitlab_client = GitLabClient(
-                url=settings.GITLAB_URL,
-                token=settings.GITLAB_TOKEN
-            )
+            self._gitlab_client = get_gitlab_client()
         return self._gitlab_client
     
     @log_performance("sync_all_data")
     async def sync_all_data(self, session: AsyncSession) -> Dict[str, Any]:
         """同步所有数据 - 统一入口，支持智能策略选择"""
         try:
-            # 检查是否需要全量同步
-            sync_strategy = await self._determine_sync_strategy(session)
-            
-            if sync_strategy["type"] == "full":
-                logger.info("type: sync strategy: full")
-                return await self._full_sync(session)
-            else:
-                logger.info("type: sync strategy: incremental")
-                return await self._incremental_sync(session, sync_strategy)
+            # 批量同步使用低优先级GitLab额度，避免挤占审查等交互式请求
+            with request_priority(PRIORITY_BULK):
+                # 检查是否需要全量同步
+                sync_strategy = await self._determine_sync_strategy(session)
+                
+                if sync_strategy["type"] == "full":
+                    logger.info("type: sync strategy: full")
+                    result = await self._full_sync(session)
+                else:
+                    logger.info("type: sync strategy: incremental")
+                    result = await self._incremental_sync(session, sync_strategy)
+            
+            # 记录GitLab条件请求缓存命中情况
+            cache_stats = self.gitlab_client.cache_stats()
+            result["http_cache"] = cache_stats
+            logger.info(f"type: sync http_cache: hit_rate={cache_stats['hit_rate']} hits={cache_stats['hits']} misses={cache_stats['misses']} size={cache_stats['size']}")
+            rate_limit_stats = self.gitlab_client.rate_limit_stats()
+            if rate_limit_stats:
+                result["rate_limit"] = rate_limit_stats
+                logger.info(f"type: sync rate_limit: throttled={rate_limit_stats['throttled_count']} wait_seconds={rate_limit_stats['wait_seconds']} remaining={rate_limit_stats['remaining']}")
+            return result
                 
         except Exception as e:
             await session.rollback()
@@ -70,7 +85,7 @@ class SyncService:
             
             while True:
                 try:
-                    projects, pagination = self.gitlab_client.get_projects(page=page, per_page=per_page)
+                    projects, pagination = await self.gitlab_client.get_projects(page=page, per_page=per_page)
                     
                     if not projects:
                         logger.debug(f"No projects found on page {page}")
@@ -78,18 +93,9 @@ class SyncService:
                     
                     logger.info(f"Found {len(projects)} projects on page {page}")
                     
-                    for project_info in projects:
-                        try:
-                            result = await self._sync_project(session, project_info)
-                            if result == "created":
-                                projects_synced += 1
-                                logger.info(f"type: project action: created name: {project_info.name}")
-                            elif result == "updated":
-                                projects_updated += 1
-                                logger.info(f"type: project action: updated name: {project_info.name}")
-                        except Exception as e:
-                            logger.error(f"type: project action: sync name: {project_info.name} error: {e}")
-                            continue
+                    page_result = await self._sync_project_page(session, projects)
+                    projects_synced += page_result["created"]
+                    projects_updated += page_result["updated"]
                     
                     if not pagination.has_next:
                         logger.debug(f"Reached last page")
@@ -126,18 +132,15 @@ class SyncService:
         mrs_updated = 0
         
         try:
-            # 获取所有项目
-            result = await session.execute(select(Project))
-            projects = result.scalars().all()
+            # 获取所有项目，按项目并发同步
+            result = await session.execute(select(Project.id))
+            project_ids = [row[0] for row in result.fetchall()]
             
-            for project in projects:
-                try:
-                    project_result = await self._sync_project_merge_requests(session, project)
-                    mrs_synced += project_result["synced"]
-                    mrs_updated += project_result["updated"]
-                except Exception as e:
-                    logger.error(f"project: {project.name} action: sync_mrs error: {e}")
-                    continue
+            sync_result = await self._sync_projects_in_parallel(
+                project_ids, self._sync_project_merge_requests
+            )
+            mrs_synced = sync_result["synced"]
+            mrs_updated = sync_result["updated"]
             
             total = mrs_synced + mrs_updated
             logger.info(f"type: mrs state: sync_completed synced: {mrs_synced} updated: {mrs_updated} total: {total}")
@@ -225,11 +228,7 @@ class SyncService:
     async def sync_single_merge_request(self, session: AsyncSession, project: Project, mr: MergeRequest) -> Dict[str, Any]:
         """同步单个合并请求的最新数据"""
         try:
-            # 重新查询MR对象以确保获取最新数据
-            result = await session.execute(
-                select(MergeRequest).where(MergeRequest.id == mr.id)
-            )
-            current_mr = result.scalar_one_or_none()
+            current_mr = await self._refresh_merge_request(session, project, mr)
             
             if not current_mr:
                 return {
@@ -238,31 +237,6 @@ class SyncService:
                     "details": {}
                 }
             
-            # 获取MR的最新信息
-            mr_info = self.gitlab_client.get_merge_request(project.gitlab_id, current_mr.gitlab_id)
-            
-            # 获取详细的变更统计信息
-            changes_stats = self.gitlab_client.get_merge_request_changes_stats(project.gitlab_id, current_mr.gitlab_id)
-            
-            # 获取提交列表来计算准确的提交数量
-            commits = self.gitlab_client.get_merge_request_commits(project.gitlab_id, current_mr.gitlab_id)
-            commits_count = len(commits) if commits else 0
-            
-            # 更新MR信息
-            current_mr.title = mr_info.title
-            current_mr.description = mr_info.description or ""
-            current_mr.author = mr_info.author.username
-            current_mr.state = mr_info.state
-            current_mr.mr_updated_at = mr_info.updated_at
-            current_mr.commits_count = commits_count
-            current_mr.changes_count = mr_info.changes_count or 0
-            current_mr.additions_count = changes_stats.get('additions', 0)
-            current_mr.deletions_count = changes_stats.get('deletions', 0)
-            
-            # 如果有提交，更新last_commit_sha
-            if commits:
-                current_mr.last_commit_sha = commits[0].id
-            
             await session.commit()
             
             return {
@@ -291,36 +265,102 @@ class SyncService:
                 "details": {}
             }
 
-    async def _sync_project(self, session: AsyncSession, project_info: ProjectInfo) -> str:
-        """同步单个项目"""
-        # 查找现有项目
+    async def _refresh_merge_request(self, session: AsyncSession, project: Project, mr: MergeRequest) -> Optional[MergeRequest]:
+        """从GitLab刷新MR信息和变更统计，只修改会话中的对象，不提交"""
+        # 重新查询MR对象以确保获取最新数据
         result = await session.execute(
-            select(Project).where(Project.gitlab_id == project_info.id)
+            select(MergeRequest).where(MergeRequest.id == mr.id)
         )
-        project = result.scalar_one_or_none()
+        current_mr = result.scalar_one_or_none()
+        if not current_mr:
+            return None
+        
+        # 获取MR的最新信息
+        mr_info = await self.gitlab_client.get_merge_request(project.gitlab_id, current_mr.gitlab_id)
+        
+        # 获取详细的变更统计信息
+        changes_stats = await self.gitlab_client.get_merge_request_changes_stats(project.gitlab_id, current_mr.gitlab_id)
+        
+        # 获取提交列表来计算准确的提交数量
+        commits = await self.gitlab_client.get_merge_request_commits(project.gitlab_id, current_mr.gitlab_id)
+        commits_count = len(commits) if commits else 0
         
-        if not project:
-            # 创建新项目
-            project = Project(
-                gitlab_id=project_info.id,
-                name=project_info.name,
-                namespace=project_info.namespace.name,
-                web_url=project_info.web_url,
-                default_branch=project_info.default_branch,
-                created_at=datetime.utcnow(),
-                updated_at=datetime.utcnow()
+        # 更新MR信息
+        current_mr.title = mr_info.title
+        current_mr.description = mr_info.description or ""
+        current_mr.author = mr_info.author.username
+        current_mr.state = mr_info.state
+        current_mr.mr_updated_at = mr_info.updated_at
+        current_mr.commits_count = commits_count
+        if mr_info.changes_count is not None:
+            current_mr.changes_count = mr_info.changes_count
+        current_mr.additions_count = changes_stats.get('additions', 0)
+        current_mr.deletions_count = changes_stats.get('deletions', 0)
+        
+        # 如果有提交，更新last_commit_sha
+        if commits:
+            current_mr.last_commit_sha = commits[0].id
+        
+        # 记录统计对应的SHA，标记统计已是最新
+        mr_sync_state = await self._get_mr_sync_state(session, current_mr.id)
+        mr_sync_state.stats_commit_sha = current_mr.last_commit_sha
+        mr_sync_state.stats_synced_at = datetime.now(timezone.utc)
+        
+        await session.flush()
+        return current_mr
+
+    async def ensure_merge_request_stats(self, session: AsyncSession, project: Project, mr: MergeRequest) -> bool:
+        """
+        按需刷新合并请求的变更统计
+        
+        webhook只写入事件载荷中的字段，并将统计标记为过期；
+        审查或界面需要统计时再调用本方法，统计过期才访问GitLab。
+        
+        Returns:
+            是否执行了刷新
+        """
+        result = await session.execute(
+            select(MergeRequestSyncState.stats_commit_sha, MergeRequestSyncState.stats_synced_at).where(
+                MergeRequestSyncState.merge_request_id == mr.id
             )
-            session.add(project)
-            await session.flush()
-            return "created"
-        else:
-            # 更新项目信息
-            project.name = project_info.name
-            project.namespace = project_info.namespace.name
-            project.web_url = project_info.web_url
-            project.default_branch = project_info.default_branch
-            project.updated_at = datetime.utcnow()
-            return "updated"
+        )
+        row = result.first()
+        # 没有状态记录说明统计由批量同步写入，视为最新
+        if row is None or (row.stats_synced_at is not None and row.stats_commit_sha == mr.last_commit_sha):
+            return False
+        
+        logger.info(f"project: {project.name} action: refresh_stale_stats mr: {mr.gitlab_id}")
+        # 在调用方的会话中使用保存点刷新，失败只回滚本次刷新，不提交也不结束调用方的事务
+        try:
+            async with session.begin_nested():
+                await self._refresh_merge_request(session, project, mr)
+        except Exception as e:
+            logger.warning(f"project: {project.name} action: refresh_stale_stats mr: {mr.gitlab_id} error: {e}")
+        return True
+
+    async def _sync_project_page(self, session: AsyncSession, projects: List[ProjectInfo]) -> Dict[str, int]:
+        """批量写入一页项目"""
+        rows = {
+            project_info.id: {
+                "gitlab_id": project_info.id,
+                "name": project_info.name,
+                "namespace": project_info.namespace.name,
+                "web_url": project_info.web_url,
+                "default_branch": project_info.default_branch,
+            }
+            for project_info in projects
+        }
+        
+        # 每页使用保存点：写入失败只回滚本页，会话不会停留在失败的事务中（PostgreSQL）
+        try:
+            async with session.begin_nested():
+                result = await upsert_projects(session, list(rows.values()))
+        except Exception as e:
+            logger.error(f"type: projects action: upsert count: {len(rows)} error: {e}")
+            return {"created": 0, "updated": 0}
+        
+        logger.debug(f"type: projects action: upsert created: {result['created']} updated: {result['updated']}")
+        return result
     
     async def _sync_project_merge_requests(self, session: AsyncSession, project: Project) -> Dict[str, int]:
         """同步单个项目的合并请求"""
@@ -329,151 +369,256 @@ class SyncService:
         
         # 获取所有状态的合并请求
         states = ["opened", "closed", "merged"]
+        saved_mrs: List[MergeRequestInfo] = []
+        complete = True
         
         for state in states:
-            page = 1
-            per_page = 100
-            
-            while True:
-                try:
-                    merge_requests, pagination = self.gitlab_client.get_merge_requests(
-                        project_id=project.gitlab_id,
-                        state=state,
-                        page=page,
-                        per_page=per_page
-                    )
-                    
-                    if not merge_requests:
-                        logger.debug(f"No {state} MRs found for project {project.name}")
-                        break
-                    
-                    logger.info(f"Found {len(merge_requests)} {state} MRs for project {project.name} (page {page})")
-                    
-                    for mr_info in merge_requests:
-                        try:
-                            result = await self._sync_merge_request(session, mr_info, project)
-                            if result == "created":
-                                mrs_synced += 1
-                                logger.info(f"type: mr action: created title: {mr_info.title}")
-                            elif result == "updated":
-                                mrs_updated += 1
-                                logger.info(f"type: mr action: updated title: {mr_info.title}")
-                        except Exception as e:
-                            logger.error(f"type: mr action: sync title: {mr_info.title} error: {e}")
-                            continue
-                    
-                    if not pagination.has_next:
-                        logger.debug(f"Reached last page for {state} MRs")
-                        break
-                    
-                    page += 1
-                    
-                except Exception as e:
-                    logger.error(f"project: {project.name} state: {state} action: sync_mrs error: {e}")
-                    # 继续处理下一个状态，而不是完全停止
-                    break
+            try:
+                merge_requests, listed = await self._fetch_project_merge_requests_checked(project, state=state)
+                complete = complete and listed
+                
+                if not merge_requests:
+                    logger.debug(f"No {state} MRs found for project {project.name}")
+                    continue
+                
+                logger.info(f"Found {len(merge_requests)} {state} MRs for project {project.name}")
+                
+                batch_result = await self._sync_merge_request_batch(session, project, merge_requests)
+                mrs_synced += batch_result["synced"]
+                mrs_updated += batch_result["updated"]
+                saved_mrs.extend(batch_result["saved"])
+                complete = complete and batch_result["complete"]
+                
+            except Exception as e:
+                logger.error(f"project: {project.name} state: {state} action: sync_mrs error: {e}")
+                # 继续处理下一个状态，而不是完全停止
+                complete = False
+                continue
+        
+        # 记录水位线，后续增量同步只拉取更新过的MR；有列表或写入失败时不推进，下次重新拉取
+        sync_state = await self._get_sync_state(session, project.id)
+        self._advance_watermark(sync_state, saved_mrs, sync_state.mr_updated_watermark, complete)
         
         return {
             "synced": mrs_synced,
             "updated": mrs_updated
         }
     
-    async def _sync_merge_request(self, session: AsyncSession, mr_info: MergeRequestInfo, project: Project) -> str:
-        """同步单个合并请求"""
-        gitlab_id = mr_info.iid
-        
-        # 查找现有合并请求
-        result = await session.execute(
-            select(MergeRequest).where(
-                MergeRequest.gitlab_id == gitlab_id,
-                MergeRequest.project_id == project.id
-            )
-        )
-        mr = result.scalar_one_or_none()
+    async def _sync_projects_in_parallel(
+        self,
+        project_ids: List[int],
+        sync_one: Callable[[AsyncSession, Project], Awaitable[Dict[str, int]]]
+    ) -> Dict[str, int]:
+        """按项目并发同步，每个项目使用独立会话并单独提交"""
+        async def _sync(project_id: int) -> Dict[str, int]:
+            async with AsyncSessionLocal() as project_session:
+                project = await project_session.get(Project, project_id)
+                if not project:
+                    return {"synced": 0, "updated": 0}
+                try:
+                    project_result = await sync_one(project_session, project)
+                    await project_session.commit()
+                    return project_result
+                except Exception as e:
+                    await project_session.rollback()
+                    logger.error(f"project: {project.name} action: sync_mrs error: {e}")
+                    return {"synced": 0, "updated": 0}
         
-        # 如果列表API已经提供了commits_count，优先使用
-        commits_count = mr_info.commits_count or 0
+        results = await run_bounded(project_ids, _sync, settings.SYNC_MAX_CONCURRENCY)
         
-        # 获取详细的变更统计信息
-        changes_stats = self.gitlab_client.get_merge_request_changes_stats(project.gitlab_id, gitlab_id)
+        mrs_synced = 0
+        mrs_updated = 0
+        for project_id, project_result in zip(project_ids, results):
+            if isinstance(project_result, Exception):
+                logger.error(f"project_id: {project_id} action: sync_mrs error: {project_result}")
+                continue
+            mrs_synced += project_result["synced"]
+            mrs_updated += project_result["updated"]
         
-        # 获取提交信息
-        commits = self.gitlab_client.get_merge_request_commits(project.gitlab_id, gitlab_id)
-        commits_count = len(commits) if commits else 0
+        return {"synced": mrs_synced, "updated": mrs_updated}
+    
+    async def _fetch_project_merge_requests(self, project: Project, **filters) -> List[MergeRequestInfo]:
+        """并发拉取项目某一过滤条件下的所有MR分页"""
+        async def _fetch_page(page: int):
+            return await self.gitlab_client.get_merge_requests(
+                project_id=project.gitlab_id,
+                page=page,
+                per_page=100,
+                **filters
+            )
         
-        # 获取最新提交的SHA
-        last_commit_sha = commits[0].id if commits else None
+        return await fetch_all_pages(_fetch_page, settings.SYNC_PROJECT_CONCURRENCY)
+    
+    async def _fetch_project_merge_requests_checked(self, project: Project, **filters) -> Tuple[List[MergeRequestInfo], bool]:
+        """拉取MR列表，返回(MR列表, 是否完整)；部分分页失败时仍返回已拉取的MR"""
+        try:
+            return await self._fetch_project_merge_requests(project, **filters), True
+        except PartialFetchError as e:
+            logger.warning(f"project: {project.name} action: fetch_mrs partial failed_pages: {e.failed_pages}")
+            return e.items, False
+    
+    async def _fetch_mr_details(self, project: Project, mr_iid: int) -> Tuple[Optional[Dict[str, int]], List[CommitInfo]]:
+        """获取MR的变更统计和提交列表（统计模式为none时不统计行数）"""
+        changes_stats = None
+        if settings.SYNC_DIFF_STATS_MODE != "none":
+            changes_stats = await self.gitlab_client.get_merge_request_changes_stats(project.gitlab_id, mr_iid)
+        commits = await self.gitlab_client.get_merge_request_commits(project.gitlab_id, mr_iid)
+        return changes_stats, commits
+    
+    async def _sync_merge_request_batch(
+        self,
+        session: AsyncSession,
+        project: Project,
+        merge_requests: List[MergeRequestInfo]
+    ) -> Dict[str, Any]:
+        """
+        按页批量同步合并请求：跳过未变化的MR，并发拉取详情，一条语句写入
+        
+        Returns:
+            synced/updated为新增和更新数；saved为已在库中保持最新的MR（含未变化的MR），
+            complete表示没有详情拉取或写入失败，调用方据此决定是否推进水位线
+        """
+        mrs_synced = 0
+        mrs_updated = 0
+        saved: List[MergeRequestInfo] = []
+        complete = True
         
-        if not mr:
-            # 创建新合并请求
-            try:
-                logger.debug(f"project: {project.name} action: creating_mr gitlab_id: {gitlab_id} title: {mr_info.title}")
-                mr = MergeRequest(
-                    gitlab_id=gitlab_id,
-                    project_id=project.id,
-                    title=mr_info.title,
-                    description=mr_info.description or "",
-                    author=mr_info.author.username,
-                    source_branch=mr_info.source_branch,
-                    target_branch=mr_info.target_branch,
-                    state=mr_info.state,
-                    mr_created_at=mr_info.created_at,
-                    mr_updated_at=mr_info.updated_at,
-                    commits_count=commits_count,
-                    changes_count=mr_info.changes_count or 0,
-                    additions_count=changes_stats.get('additions', 0),
-                    deletions_count=changes_stats.get('deletions', 0),
-                    last_commit_sha=last_commit_sha,
-                )
-                session.add(mr)
-                await session.flush()
-                logger.debug(f"project: {project.name} action: created_mr gitlab_id: {gitlab_id} db_id: {mr.id}")
-                return "created"
-            except IntegrityError as e:
-                # 如果发生唯一约束冲突，回滚当前事务并重新查询
-                await session.rollback()
-                logger.warning(f"project: {project.name} action: integrity_error gitlab_id: {gitlab_id} error: {e}")
-                
-                # 重新查询，可能是并发创建导致的
-                result = await session.execute(
-                    select(MergeRequest).where(
-                        MergeRequest.gitlab_id == gitlab_id,
-                        MergeRequest.project_id == project.id
-                    )
+        for start in range(0, len(merge_requests), self.MR_BATCH_SIZE):
+            batch = {mr_info.iid: mr_info for mr_info in merge_requests[start:start + self.MR_BATCH_SIZE]}
+            
+            result = await session.execute(
+                select(
+                    MergeRequest.id,
+                    MergeRequest.gitlab_id,
+                    MergeRequest.mr_updated_at,
+                    MergeRequest.last_commit_sha,
+                    MergeRequestSyncState.id.label("sync_state_id"),
+                    MergeRequestSyncState.stats_commit_sha,
+                    MergeRequestSyncState.stats_synced_at,
+                ).outerjoin(
+                    MergeRequestSyncState, MergeRequestSyncState.merge_request_id == MergeRequest.id
+                ).where(
+                    MergeRequest.project_id == project.id,
+                    MergeRequest.gitlab_id.in_(list(batch))
                 )
-                existing_mr = result.scalar_one_or_none()
-                
-                if existing_mr:
-                    # 如果找到了，说明是并发创建，更新现有记录
-                    logger.debug(f"project: {project.name} action: found_existing_mr gitlab_id: {gitlab_id} db_id: {existing_mr.id}")
-                    existing_mr.title = mr_info.title
-                    existing_mr.description = mr_info.description or ""
-                    existing_mr.author = mr_info.author.username
-                    existing_mr.state = mr_info.state
-                    existing_mr.mr_updated_at = mr_info.updated_at
-                    existing_mr.commits_count = commits_count
-                    existing_mr.changes_count = mr_info.changes_count or 0
-                    existing_mr.last_commit_sha = last_commit_sha
-                    await session.flush()
-                    return "updated"
+            )
+            existing = {row.gitlab_id: row for row in result.fetchall()}
+            changed_mrs = []
+            for mr_info in batch.values():
+                if self._is_mr_changed(existing.get(mr_info.iid), mr_info):
+                    changed_mrs.append(mr_info)
                 else:
-                    # 如果还是找不到，重新抛出异常
-                    logger.error(f"project: {project.name} action: integrity_error_no_existing gitlab_id: {gitlab_id} error: {e}")
-                    raise e
-        else:
-            # 更新合并请求信息
-            mr.title = mr_info.title
-            mr.description = mr_info.description or ""
-            mr.author = mr_info.author.username
-            mr.state = mr_info.state
-            mr.mr_updated_at = mr_info.updated_at
-            mr.changes_count = mr_info.changes_count or 0
-            mr.commits_count = commits_count
-            mr.additions_count = changes_stats.get('additions', 0)
-            mr.deletions_count = changes_stats.get('deletions', 0)
-            mr.last_commit_sha = last_commit_sha
+                    saved.append(mr_info)
+            
+            if len(changed_mrs) < len(batch):
+                logger.debug(f"project: {project.name} action: skip_unchanged count: {len(batch) - len(changed_mrs)}")
+            if not changed_mrs:
+                continue
+            
+            details = await run_bounded(
+                changed_mrs,
+                lambda mr_info: self._fetch_mr_details(project, mr_info.iid),
+                settings.SYNC_PROJECT_CONCURRENCY
+            )
+            
+            rows = []
+            fetched_mrs = []
+            stats_refreshed = []
+            for mr_info, detail in zip(changed_mrs, details):
+                if isinstance(detail, Exception):
+                    logger.error(f"project: {project.name} action: fetch_mr_details title: {mr_info.title} error: {detail}")
+                    complete = False
+                    continue
+                rows.append(self._build_merge_request_row(project, mr_info, *detail))
+                fetched_mrs.append(mr_info)
+                row = existing.get(mr_info.iid)
+                if row is not None and row.sync_state_id is not None:
+                    stats_refreshed.append(row.id)
+            
+            # 每批使用保存点：写入或删除失败时整批回滚，不影响后续批次和项目提交
+            try:
+                async with session.begin_nested():
+                    upsert_result = await upsert_merge_requests(
+                        session, rows, existing_keys={(project.id, gitlab_id) for gitlab_id in existing}
+                    )
+                    # 详情已随批量同步刷新（统计模式为none时不再需要统计），删除过期标记，没有状态记录即视为最新
+                    if stats_refreshed:
+                        await session.execute(
+                            delete(MergeRequestSyncState).where(MergeRequestSyncState.merge_request_id.in_(stats_refreshed))
+                        )
+            except Exception as e:
+                logger.error(f"project: {project.name} action: upsert_mrs count: {len(rows)} error: {e}")
+                complete = False
+                continue
             
-            return "updated"
+            mrs_synced += upsert_result["created"]
+            mrs_updated += upsert_result["updated"]
+            saved.extend(fetched_mrs)
+        
+        return {"synced": mrs_synced, "updated": mrs_updated, "saved": saved, "complete": complete}
+    
+    def _is_mr_changed(self, mr: Optional[Any], mr_info: MergeRequestInfo) -> bool:
+        """列表数据中的更新时间和SHA与库中一致、且统计未过期时，认为MR没有变化"""
+        if mr is None or mr.mr_updated_at is None:
+            return True
+        
+        # webhook已写入载荷字段但统计过期，需要重新拉取详情
+        if self._stats_stale(mr):
+            return True
+        
+        # MySQL DATETIME默认不保留毫秒，按秒比较
+        stored_updated_at = self._as_utc(mr.mr_updated_at).replace(microsecond=0)
+        if stored_updated_at != self._as_utc(mr_info.updated_at).replace(microsecond=0):
+            return True
+        
+        return bool(mr_info.sha) and mr_info.sha != mr.last_commit_sha
+    
+    @staticmethod
+    def _stats_stale(row: Any) -> bool:
+        """存在状态记录且其SHA与MR最新SHA不一致（或从未拉取）时，统计已过期"""
+        if getattr(row, "sync_state_id", None) is None:
+            return False
+        return row.stats_synced_at is None or row.stats_commit_sha != row.last_commit_sha
+    
+    def _build_merge_request_row(
+        self,
+        project: Project,
+        mr_info: MergeRequestInfo,
+        changes_stats: Optional[Dict[str, int]],
+        commits: List[CommitInfo]
+    ) -> Dict[str, Any]:
+        """构建合并请求写入数据"""
+        now = datetime.utcnow()
+        row = {
+            "project_id": project.id,
+            "gitlab_id": mr_info.iid,
+            "title": mr_info.title,
+            "description": mr_info.description or "",
+            "author": mr_info.author.username,
+            "source_branch": mr_info.source_branch,
+            "target_branch": mr_info.target_branch,
+            "state": mr_info.state,
+            "mr_created_at": mr_info.created_at,
+            "mr_updated_at": mr_info.updated_at,
+            "commits_count": len(commits) if commits else 0,
+            # 最新提交的SHA
+            "last_commit_sha": mr_info.sha or (commits[0].id if commits else None),
+            "created_at": now,
+            "updated_at": now,
+        }
+        
+        # 列表接口不返回changes_count，以diff统计的文件数为准；都没有时不写入该列，避免把已有值覆盖为0
+        changes_count = changes_stats.get('files') if changes_stats is not None else None
+        if changes_count is None:
+            changes_count = mr_info.changes_count
+        if changes_count is not None:
+            row["changes_count"] = changes_count
+        
+        if changes_stats is not None:
+            row["additions_count"] = changes_stats.get('additions', 0)
+            row["deletions_count"] = changes_stats.get('deletions', 0)
+        
+        return row
 
     # ==================== 智能同步策略 ====================
 
@@ -491,22 +636,11 @@ class SyncService:
                     "reason": "数据库中没有项目，需要全量同步"
                 }
             
-            # 检查是否有新增项目
-            new_projects = await self._check_for_new_projects(session)
-            
-            if new_projects:
-                logger.info(f"type: sync reason: new_projects_found count: {len(new_projects)} strategy: full")
-                return {
-                    "type": "full",
-                    "reason": f"发现 {len(new_projects)} 个新增项目，需要全量同步",
-                    "new_projects": [p.name for p in new_projects]
-                }
-            
-            # 执行增量同步
-            logger.info("执行增量同步：处理新增MR，同步所有open的MR")
+            # 执行增量同步（新增项目没有水位线，会在增量同步中自动全量同步）
+            logger.info("执行增量同步：按项目水位线同步更新过的MR")
             return {
                 "type": "incremental",
-                "reason": "进行增量同步：处理新增MR，同步所有open的MR"
+                "reason": "进行增量同步：按项目水位线同步更新过的MR"
             }
             
         except Exception as e:
@@ -521,6 +655,8 @@ class SyncService:
         """全量同步"""
         # 同步项目
         projects_result = await self.sync_projects(session)
+        # 先提交项目，各项目的MR同步使用独立会话
+        await session.commit()
         
         # 同步合并请求
         merge_requests_result = await self.sync_merge_requests(session)
@@ -540,6 +676,8 @@ class SyncService:
         """增量同步"""
         # 增量同步项目
         projects_result = await self._sync_projects_incremental(session)
+        # 先提交项目，各项目的MR同步使用独立会话
+        await session.commit()
         
         # 增量同步合并请求
         merge_requests_result = await self._sync_merge_requests_incremental(session, strategy)
@@ -560,10 +698,6 @@ class SyncService:
         try:
             logger.info("type: projects state: incremental start")
             
-            # 获取数据库中现有的GitLab项目ID
-            result = await session.execute(select(Project.gitlab_id))
-            existing_gitlab_ids = {row[0] for row in result.fetchall()}
-            
             projects_synced = 0
             projects_updated = 0
             
@@ -573,28 +707,14 @@ class SyncService:
             
             while True:
                 try:
-                    projects, pagination = self.gitlab_client.get_projects(page=page, per_page=per_page)
+                    projects, pagination = await self.gitlab_client.get_projects(page=page, per_page=per_page)
                     
                     if not projects:
                         break
                     
-                    for project_info in projects:
-                        try:
-                            if project_info.id in existing_gitlab_ids:
-                                # 更新现有项目
-                                result = await self._sync_project(session, project_info)
-                                if result == "updated":
-                                    projects_updated += 1
-                                    logger.debug(f"type: project action: updated name: {project_info.name} gitlab_id: {project_info.id}")
-                            else:
-                                # 新增项目
-                                result = await self._sync_project(session, project_info)
-                                if result == "created":
-                                    projects_synced += 1
-                                    logger.info(f"type: project action: created name: {project_info.name} gitlab_id: {project_info.id}")
-                        except Exception as e:
-                            logger.error(f"type: project action: sync name: {project_info.name} gitlab_id: {project_info.id} error: {e}")
-                            continue
+                    page_result = await self._sync_project_page(session, projects)
+                    projects_synced += page_result["created"]
+                    projects_updated += page_result["updated"]
                     
                     if not pagination.has_next:
                         break
@@ -628,18 +748,18 @@ class SyncService:
         mrs_updated = 0
         
         try:
-            # 获取所有项目
-            result = await session.execute(select(Project))
-            projects = result.scalars().all()
-            
-            for project in projects:
-                try:
-                    project_result = await self._sync_project_merge_requests_incremental(session, project, strategy)
-                    mrs_synced += project_result["synced"]
-                    mrs_updated += project_result["updated"]
-                except Exception as e:
-                    logger.error(f"project: {project.name} action: sync_mrs error: {e}")
-                    continue
+            # 获取所有项目，按项目并发同步
+            result = await session.execute(select(Project.id))
+            project_ids = [row[0] for row in result.fetchall()]
+            
+            sync_result = await self._sync_projects_in_parallel(
+                project_ids,
+                lambda project_session, project: self._sync_project_merge_requests_incremental(
+                    project_session, project, strategy
+                )
+            )
+            mrs_synced = sync_result["synced"]
+            mrs_updated = sync_result["updated"]
             
             total = mrs_synced + mrs_updated
             return {
@@ -657,36 +777,35 @@ class SyncService:
             }
 
     async def _sync_project_merge_requests_incremental(self, session: AsyncSession, project: Project, strategy: Dict[str, Any]) -> Dict[str, int]:
-        """增量同步单个项目的合并请求 - 按照需求文档实现"""
-        mrs_synced = 0
-        mrs_updated = 0
-        
+        """增量同步单个项目的合并请求 - 基于水位线只拉取更新过的MR"""
         try:
-            logger.info(f"project: {project.name} state: incremental start")
-            
-            # 1. 获取数据库中该项目的所有MR记录
-            existing_mrs = await self._get_existing_mrs_for_project(session, project.id)
-            existing_gitlab_ids = {mr.gitlab_id for mr in existing_mrs}
-            
-            # 2. 对所有open状态的MR进行同步
-            logger.debug(f"project: {project.name} state: opened sync_start")
-            open_result = await self._sync_mrs_by_state(session, project, "opened", existing_gitlab_ids)
-            mrs_synced += open_result["synced"]
-            mrs_updated += open_result["updated"]
+            sync_state = await self._get_sync_state(session, project.id)
+            watermark = sync_state.mr_updated_watermark or await self._get_max_mr_updated_at(session, project.id)
+            
+            if watermark is None:
+                # 项目没有任何MR记录，执行该项目的全量同步
+                logger.info(f"project: {project.name} state: incremental watermark: none action: full_sync")
+                return await self._sync_project_merge_requests(session, project)
+            
+            watermark = self._as_utc(watermark)
+            logger.info(f"project: {project.name} state: incremental start watermark: {watermark.isoformat()}")
+            
+            merge_requests, listed = await self._fetch_project_merge_requests_checked(
+                project,
+                state="all",
+                order_by="updated_at",
+                sort="desc",
+                updated_after=watermark
+            )
             
-            # 3. 对于ID最大的100条中缺失的gitlab id的MR进行同步
-            logger.debug(f"project: {project.name} state: missing_in_top_100 sync_start")
-            missing_result = await self._sync_missing_mrs_in_top_100(session, project, existing_gitlab_ids)
-            mrs_synced += missing_result["synced"]
-            mrs_updated += missing_result["updated"]
+            batch_result = await self._sync_merge_request_batch(session, project, merge_requests)
+            mrs_synced = batch_result["synced"]
+            mrs_updated = batch_result["updated"]
             
-            # 4. 对gitlab中大于已记录gitlab id 的MR进行同步
-            logger.debug(f"project: {project.name} state: greater_than_latest sync_start")
-            new_result = await self._sync_new_mrs_greater_than_existing(session, project, existing_gitlab_ids)
-            mrs_synced += new_result["synced"]
-            mrs_updated += new_result["updated"]
+            # 列表不完整或有MR未写入时保持水位线，下次重新拉取这些MR
+            self._advance_watermark(sync_state, batch_result["saved"], watermark, listed and batch_result["complete"])
             
-            logger.info(f"project: {project.name} state: incremental synced: {mrs_synced} updated: {mrs_updated}")
+            logger.info(f"project: {project.name} state: incremental fetched: {len(merge_requests)} synced: {mrs_synced} updated: {mrs_updated}")
             
             return {
                 "synced": mrs_synced,
@@ -702,247 +821,69 @@ class SyncService:
 
     # ==================== 增量同步辅助方法 ====================
 
-    async def _get_existing_mrs_for_project(self, session: AsyncSession, project_id: int) -> List[MergeRequest]:
-        """获取项目中已存在的MR记录"""
+    @staticmethod
+    def _as_utc(value: datetime) -> datetime:
+        """数据库读出的无时区时间按UTC处理"""
+        if value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc)
+
+    async def _get_sync_state(self, session: AsyncSession, project_id: int) -> ProjectSyncState:
+        """获取项目同步状态，不存在则创建"""
         result = await session.execute(
-            select(MergeRequest).where(MergeRequest.project_id == project_id)
+            select(ProjectSyncState).where(ProjectSyncState.project_id == project_id)
         )
-        return result.scalars().all()
-
-    async def _sync_mrs_by_state(self, session: AsyncSession, project: Project, state: str, existing_gitlab_ids: set) -> Dict[str, int]:
-        """同步指定状态的MR"""
-        mrs_synced = 0
-        mrs_updated = 0
-        synced_mr_ids = []
-        updated_mr_ids = []
-        
-        page = 1
-        per_page = 100
+        sync_state = result.scalar_one_or_none()
         
-        # 重新获取并同步MR
-        page = 1
-        while True:
-            try:
-                merge_requests, pagination = self.gitlab_client.get_merge_requests(
-                    project_id=project.gitlab_id,
-                    state=state,
-                    page=page,
-                    per_page=per_page
-                )
-                
-                if not merge_requests:
-                    break
-                
-                for mr_info in merge_requests:
-                    try:
-                        result = await self._sync_merge_request(session, mr_info, project)
-                        if result == "created":
-                            mrs_synced += 1
-                            synced_mr_ids.append(mr_info.iid)
-                            logger.debug(f"project: {project.name} action: create_mr title: {mr_info.title} gitlab_id: {mr_info.iid}")
-                        elif result == "updated":
-                            mrs_updated += 1
-                            updated_mr_ids.append(mr_info.iid)
-                            logger.debug(f"project: {project.name} action: update_mr title: {mr_info.title} gitlab_id: {mr_info.iid}")
-                    except Exception as e:
-                        logger.error(f"project: {project.name} action: sync_mr title: {mr_info.title} error: {e}")
-                        continue
-                
-                if not pagination.has_next:
-                    break
-                
-                page += 1
-                
-            except Exception as e:
-                logger.error(f"project: {project.name} state: {state} action: get_mrs_sync error: {e}")
-                break
-        
-        # 记录详细的同步结果
-        synced_ids_str = str(synced_mr_ids[:10]) if synced_mr_ids else "[]"
-        updated_ids_str = str(updated_mr_ids[:10]) if updated_mr_ids else "[]"
-        logger.info(f"project: {project.name} state: {state} synced: {mrs_synced} updated: {mrs_updated} synced_ids: {synced_ids_str} updated_ids: {updated_ids_str}")
+        if not sync_state:
+            sync_state = ProjectSyncState(project_id=project_id)
+            session.add(sync_state)
         
-        return {"synced": mrs_synced, "updated": mrs_updated}
+        return sync_state
 
-    async def _sync_missing_mrs_in_top_100(self, session: AsyncSession, project: Project, existing_gitlab_ids: set) -> Dict[str, int]:
-        """同步ID最大的100条中缺失的gitlab id的MR"""
-        mrs_synced = 0
-        mrs_updated = 0
-        synced_mr_ids = []
-        updated_mr_ids = []
-        
-        try:
-            # 获取GitLab中最近的100个MR（按创建时间排序）
-            merge_requests, _ = self.gitlab_client.get_merge_requests(
-                project_id=project.gitlab_id,
-                state="all",  # 获取所有状态
-                page=1,
-                per_page=100,
-                order_by="created_at",  # GitLab API支持的值
-                sort="desc"  # 按创建时间降序排列
-            )
-            
-            if not merge_requests:
-                return {"synced": 0, "updated": 0}
-            
-            # 按ID排序，获取ID最大的MR
-            sorted_mrs = sorted(merge_requests, key=lambda x: x.iid, reverse=True)
-            
-            # 找出缺失的MR
-            missing_mrs = []
-            for mr_info in sorted_mrs:
-                if mr_info.iid not in existing_gitlab_ids:
-                    missing_mrs.append(mr_info)
-            
-            logger.debug(f"project: {project.name} state: missing_in_top_100 count: {len(missing_mrs)}")
-            
-            # 同步缺失的MR
-            for mr_info in missing_mrs:
-                try:
-                    result = await self._sync_merge_request(session, mr_info, project)
-                    if result == "created":
-                        mrs_synced += 1
-                        synced_mr_ids.append(mr_info.iid)
-                        logger.debug(f"project: {project.name} action: create_missing_mr title: {mr_info.title} gitlab_id: {mr_info.iid}")
-                    elif result == "updated":
-                        mrs_updated += 1
-                        updated_mr_ids.append(mr_info.iid)
-                        logger.debug(f"project: {project.name} action: update_missing_mr title: {mr_info.title} gitlab_id: {mr_info.iid}")
-                except Exception as e:
-                    logger.error(f"project: {project.name} action: sync_missing_mr title: {mr_info.title} error: {e}")
-                    continue
-            
-        except Exception as e:
-            logger.error(f"project: {project.name} state: missing_mrs error: {e}")
+    async def _get_mr_sync_state(self, session: AsyncSession, merge_request_id: int) -> MergeRequestSyncState:
+        """获取合并请求同步状态，不存在则创建"""
+        result = await session.execute(
+            select(MergeRequestSyncState).where(MergeRequestSyncState.merge_request_id == merge_request_id)
+        )
+        mr_sync_state = result.scalar_one_or_none()
         
-        # 记录详细的同步结果
-        synced_ids_str = str(synced_mr_ids[:10]) if synced_mr_ids else "[]"
-        updated_ids_str = str(updated_mr_ids[:10]) if updated_mr_ids else "[]"
-        logger.info(f"project: {project.name} state: missing synced: {mrs_synced} updated: {mrs_updated} synced_ids: {synced_ids_str} updated_ids: {updated_ids_str}")
+        if not mr_sync_state:
+            mr_sync_state = MergeRequestSyncState(merge_request_id=merge_request_id)
+            session.add(mr_sync_state)
         
-        return {"synced": mrs_synced, "updated": mrs_updated}
+        return mr_sync_state
 
-    async def _sync_new_mrs_greater_than_existing(self, session: AsyncSession, project: Project, existing_gitlab_ids: set) -> Dict[str, int]:
-        """同步大于已记录gitlab id的MR - 优化版本"""
-        mrs_synced = 0
-        mrs_updated = 0
-        synced_mr_ids = []
-        updated_mr_ids = []
-        
-        if not existing_gitlab_ids:
-            logger.info(f"project: {project.name} state: no_existing_mrs action: skip")
-            return {"synced": 0, "updated": 0}
-        
-        try:
-            # 获取最大的gitlab_id，标准化为latest MR ID
-            latest_mr_id = max(existing_gitlab_ids)
-            logger.debug(f"project: {project.name} latest_mr_id: {latest_mr_id}")
-            
-            # 使用更高效的方法：按创建时间获取最近的MR，然后检查ID
-            page = 1
-            per_page = 100
-            found_new_mrs = False
-            
-            while True:
-                try:
-                    merge_requests, pagination = self.gitlab_client.get_merge_requests(
-                        project_id=project.gitlab_id,
-                        state="all",
-                        page=page,
-                        per_page=per_page,
-                        order_by="created_at",  # GitLab API支持的值
-                        sort="desc"
-                    )
-                    
-                    if not merge_requests:
-                        break
-                    
-                    # 检查当前页是否有大于latest_mr_id的MR
-                    new_mrs_in_page = []
-                    for mr_info in merge_requests:
-                        if mr_info.iid > latest_mr_id:
-                            new_mrs_in_page.append(mr_info)
-                            found_new_mrs = True
-                    
-                    # 同步新MR
-                    for mr_info in new_mrs_in_page:
-                        try:
-                            result = await self._sync_merge_request(session, mr_info, project)
-                            if result == "created":
-                                mrs_synced += 1
-                                synced_mr_ids.append(mr_info.iid)
-                                logger.debug(f"project: {project.name} action: create_new_mr title: {mr_info.title} gitlab_id: {mr_info.iid}")
-                            elif result == "updated":
-                                mrs_updated += 1
-                                updated_mr_ids.append(mr_info.iid)
-                                logger.debug(f"project: {project.name} action: update_new_mr title: {mr_info.title} gitlab_id: {mr_info.iid}")
-                        except Exception as e:
-                            logger.error(f"project: {project.name} action: sync_new_mr title: {mr_info.title} error: {e}")
-                            continue
-                    
-                    # 如果当前页没有新MR，且已经找到过新MR，说明已经遍历完所有新MR
-                    if not new_mrs_in_page and found_new_mrs:
-                        break
-                    
-                    if not pagination.has_next:
-                        break
-                    
-                    page += 1
-                    
-                except Exception as e:
-                    logger.error(f"project: {project.name} action: get_mr_list error: {e}")
-                    break
-            
-        except Exception as e:
-            logger.error(f"project: {project.name} state: new_mrs error: {e}")
-        
-        # 记录详细的同步结果
-        synced_ids_str = str(synced_mr_ids[:10]) if synced_mr_ids else "[]"
-        updated_ids_str = str(updated_mr_ids[:10]) if updated_mr_ids else "[]"
-        logger.info(f"project: {project.name} state: new synced: {mrs_synced} updated: {mrs_updated} synced_ids: {synced_ids_str} updated_ids: {updated_ids_str}")
-        
-        return {"synced": mrs_synced, "updated": mrs_updated}
+    async def _get_max_mr_updated_at(self, session: AsyncSession, project_id: int) -> Optional[datetime]:
+        """获取项目已记录MR的最大更新时间（用于初始化水位线）"""
+        result = await session.execute(
+            select(func.max(MergeRequest.mr_updated_at)).where(MergeRequest.project_id == project_id)
+        )
+        return result.scalar_one_or_none()
 
-    async def _check_for_new_projects(self, session: AsyncSession) -> List[ProjectInfo]:
-        """检查是否有新增项目"""
-        try:
-            # 获取数据库中现有的GitLab项目ID
-            result = await session.execute(select(Project.gitlab_id))
-            existing_gitlab_ids = {row[0] for row in result.fetchall()}
-            
-            # 获取GitLab中的所有项目
-            page = 1
-            per_page = 100
-            new_projects = []
-            
-            while True:
-                try:
-                    projects, pagination = self.gitlab_client.get_projects(page=page, per_page=per_page)
-                    
-                    if not projects:
-                        break
-                    
-                    for project_info in projects:
-                        if project_info.id not in existing_gitlab_ids:
-                            new_projects.append(project_info)
-                    
-                    if not pagination.has_next:
-                        break
-                    
-                    page += 1
-                    
-                except Exception as e:
-                    logger.error(f"type: projects action: check_new error: {e}")
-                    break
-            
-            if new_projects:
-                logger.info(f"type: projects action: found_new count: {len(new_projects)}")
-            
-            return new_projects
-            
-        except Exception as e:
-            logger.error(f"type: projects action: check_new error: {e}")
-            return []
+    def _advance_watermark(
+        self,
+        sync_state: ProjectSyncState,
+        merge_requests: List[MergeRequestInfo],
+        current: Optional[datetime] = None,
+        complete: bool = True
+    ) -> None:
+        """
+        根据本次已写入的MR推进水位线
+        
+        complete为False（有分页、详情或写入失败）时不推进，否则失败的MR更新时间早于新水位线，
+        之后的增量同步再也不会拉取到它们。
+        """
+        if not complete:
+            logger.warning(f"project_id: {sync_state.project_id} action: keep_watermark reason: incomplete_sync")
+            return
+        candidates = [self._as_utc(mr_info.updated_at) for mr_info in merge_requests]
+        if current is not None:
+            candidates.append(self._as_utc(current))
+        
+        if candidates:
+            sync_state.mr_updated_watermark = max(candidates)
+        sync_state.last_synced_at = datetime.now(timezone.utc)
 
     # ==================== 其他功能方法 ====================
 
@@ -1048,7 +989,8 @@ class SyncService:
             logger.info(f"project: {project.name} state: single_sync start")
             
             # 执行增量同步
-            sync_result = await self._sync_project_merge_requests_incremental(session, project, {})
+            with request_priority(PRIORITY_BULK):
+                sync_result = await self._sync_project_merge_requests_incremental(session, project, {})
             
             logger.info(f"project: {project.name} state: single_sync completed synced: {sync_result['synced']} updated: {sync_result['updated']}")
             
@@ -0,0 +1,102 @@
+"""
+批量写入（Upsert）工具
+
+按数据库方言生成单条 INSERT ... ON DUPLICATE KEY UPDATE（MySQL）
+或 INSERT ... ON CONFLICT DO UPDATE（PostgreSQL）语句，一次写入整页数据。
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import select, func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+
+from app.models import Project, MergeRequest
+
+
+def _build_upsert(session: AsyncSession, model: Any, rows: List[Dict[str, Any]], conflict_columns: Sequence[str], update_columns: Iterable[str]):
+    """构建方言相关的upsert语句"""
+    dialect = session.get_bind().dialect.name
+    update_columns = [column for column in update_columns if column != "updated_at"]
+
+    if dialect == "mysql":
+        stmt = mysql_insert(model).values(rows)
+        values = {column: stmt.inserted[column] for column in update_columns}
+        values["updated_at"] = func.now()
+        return stmt.on_duplicate_key_update(values)
+    elif dialect == "postgresql":
+        stmt = postgresql_insert(model).values(rows)
+        values = {column: stmt.excluded[column] for column in update_columns}
+        values["updated_at"] = func.now()
+        return stmt.on_conflict_do_update(index_elements=list(conflict_columns), set_=values)
+    else:
+        raise ValueError(f"Unsupported database dialect for upsert: {dialect}. Supported: mysql, postgresql")
+
+
+async def upsert_projects(session: AsyncSession, rows: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    批量写入项目
+
+    Args:
+        session: 数据库会话
+        rows: 项目数据，需包含gitlab_id
+
+    Returns:
+        {"created": 新增数, "updated": 更新数}
+    """
+    if not rows:
+        return {"created": 0, "updated": 0}
+
+    gitlab_ids = [row["gitlab_id"] for row in rows]
+    result = await session.execute(select(Project.gitlab_id).where(Project.gitlab_id.in_(gitlab_ids)))
+    existing_ids = {row[0] for row in result.fetchall()}
+
+    update_columns = [column for column in rows[0] if column != "gitlab_id"]
+    await session.execute(_build_upsert(session, Project, rows, ["gitlab_id"], update_columns))
+
+    updated = len(existing_ids)
+    return {"created": len(rows) - updated, "updated": updated}
+
+
+async def upsert_merge_requests(
+    session: AsyncSession,
+    rows: List[Dict[str, Any]],
+    existing_keys: Optional[set] = None,
+) -> Dict[str, int]:
+    """
+    批量写入合并请求
+
+    Args:
+        session: 数据库会话
+        rows: 合并请求数据，需包含project_id和gitlab_id
+        existing_keys: 已存在的(project_id, gitlab_id)集合，未提供时查询数据库
+
+    Returns:
+        {"created": 新增数, "updated": 更新数}
+    """
+    if not rows:
+        return {"created": 0, "updated": 0}
+
+    keys = {(row["project_id"], row["gitlab_id"]) for row in rows}
+    if existing_keys is None:
+        result = await session.execute(
+            select(MergeRequest.project_id, MergeRequest.gitlab_id).where(
+                tuple_(MergeRequest.project_id, MergeRequest.gitlab_id).in_(keys)
+            )
+        )
+        existing_keys = {(row[0], row[1]) for row in result.fetchall()}
+
+    # 创建时间相关字段只在插入时写入
+    immutable_columns = {"project_id", "gitlab_id", "mr_created_at", "created_at"}
+    # 可选列（如统计）缺失的行不能更新这些列，按列集合分组，每组一条语句
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for row in rows:
+        groups.setdefault(tuple(row), []).append(row)
+    for columns, group in groups.items():
+        update_columns = [column for column in columns if column not in immutable_columns]
+        await session.execute(
+            _build_upsert(session, MergeRequest, group, ["project_id", "gitlab_id"], update_columns)
+        )
+
+    updated = len(keys & existing_keys)
+    return {"created": len(keys) - updated, "updated": updated}
@@ -30,7 +30,8 @@ async def ai_template_generation_handler(task_result: TaskResult, **kwargs):
             prompt=kwargs.get("prompt"),
             selected_variables=kwargs.get("selected_variables"),
             template_name=kwargs.get("template_name"),
-            description=kwargs.get("description")
+            description=kwargs.get("description"),
+            task_result=task_result
         )
         
         task_result.update_progress(0.8, "正在处理生成结果...")
@@ -98,7 +99,8 @@ async def ai_prompt_optimization_handler(task_result: TaskResult, **kwargs):
         result = await prompt_optimizer.optimize_prompt(
             original_prompt=kwargs.get("original_prompt"),
             context=kwargs.get("context", ""),
-            optimization_goals=kwargs.get("optimization_goals")
+            optimization_goals=kwargs.get("optimization_goals"),
+            task_result=task_result
         )
         
         task_result.update_progress(0.8, "正在处理优化结果...")
@@ -161,8 +161,7 @@ task_manager = TaskManager()
 # AI模板生成任务处理器
 async def ai_template_generation_handler(task_result: TaskResult, **kwargs):
     """AI模板生成任务处理器"""
-    from .template_generator import TemplateGeneratorService
-    from .service import ai_service
+    from app.services.ai import TemplateGeneratorService, ai_service
     
     try:
         # 更新进度
@@ -179,7 +178,8 @@ async def ai_template_generation_handler(task_result: TaskResult, **kwargs):
             prompt=kwargs.get("prompt"),
             selected_variables=kwargs.get("selected_variables"),
             template_name=kwargs.get("template_name"),
-            description=kwargs.get("description")
+            description=kwargs.get("description"),
+            task_result=task_result
         )
         
         task_result.update_progress(0.8, "正在处理生成结果...")
@@ -0,0 +1,18 @@
+"""
+Webhook服务模块
+"""
+from app.core.config import settings
+from .queue import WebhookQueue, WebhookQueueFullError
+
+# 全局Webhook队列实例
+webhook_queue = WebhookQueue(
+    coalesce_seconds=settings.WEBHOOK_COALESCE_SECONDS,
+    workers=settings.WEBHOOK_WORKERS,
+    maxsize=settings.WEBHOOK_QUEUE_MAXSIZE,
+)
+
+__all__ = [
+    "WebhookQueue",
+    "WebhookQueueFullError",
+    "webhook_queue",
+]
@@ -0,0 +1,189 @@
+"""
+Webhook事件队列
+
+Webhook请求只负责入队并立即返回，事件由后台worker异步处理。
+同一个MR（或同一分支的推送）在合并窗口内的多次事件只处理最后一次。
+同一个键不会并发处理：处理期间到达的事件在当前处理完成后再作为后续任务处理。
+"""
+import asyncio
+import itertools
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from app.core.logging import get_logger
+
+logger = get_logger("webhook_queue")
+
+EventProcessor = Callable[[str, Dict[str, Any]], Awaitable[Any]]
+
+
+class WebhookQueueFullError(Exception):
+    """Webhook队列已满"""
+    pass
+
+
+class WebhookQueue:
+    """带按键合并的Webhook事件队列"""
+
+    def __init__(self, coalesce_seconds: float = 2.0, workers: int = 2, maxsize: int = 1000):
+        """
+        初始化队列
+
+        Args:
+            coalesce_seconds: 合并窗口（秒），窗口内同一键的事件只保留最后一个
+            workers: 后台worker数量
+            maxsize: 最多待处理事件数
+        """
+        self.coalesce_seconds = coalesce_seconds
+        self.workers = workers
+        self.maxsize = maxsize
+
+        self._processor: Optional[EventProcessor] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._pending: Dict[Hashable, Tuple[str, Dict[str, Any], float]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        # 正在处理的键，以及处理期间又被派发、需要在完成后重新入队的键
+        self._running: Set[Hashable] = set()
+        self._followups: Set[Hashable] = set()
+        self._worker_tasks: List[asyncio.Task] = []
+        self._sequence = itertools.count()
+
+        self.received = 0
+        self.coalesced = 0
+        self.processed = 0
+        self.failed = 0
+        self.deferred = 0
+
+    def set_processor(self, processor: EventProcessor) -> None:
+        """注册事件处理函数"""
+        self._processor = processor
+
+    @staticmethod
+    def _event_key(event_type: str, data: Dict[str, Any]) -> Optional[Hashable]:
+        """计算事件合并键，None表示不合并"""
+        project_id = (data.get("project") or {}).get("id")
+        if event_type == "Merge Request Hook":
+            mr_iid = (data.get("object_attributes") or {}).get("iid")
+            if project_id and mr_iid:
+                return ("merge_request", project_id, mr_iid)
+        elif event_type == "Push Hook":
+            if project_id:
+                return ("push", project_id, data.get("ref"))
+        return None
+
+    def enqueue(self, event_type: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        事件入队
+
+        Returns:
+            入队结果 {"queued": True, "coalesced": 是否与已有事件合并}
+
+        Raises:
+            WebhookQueueFullError: 待处理事件数超过上限
+        """
+        if self._queue is None:
+            raise RuntimeError("Webhook队列未启动")
+
+        self.received += 1
+        key = self._event_key(event_type, data)
+        if key is None:
+            key = ("event", next(self._sequence))
+
+        if key in self._pending:
+            # 合并窗口内的重复事件，以最新的事件数据为准
+            _, _, enqueued_at = self._pending[key]
+            self._pending[key] = (event_type, data, enqueued_at)
+            self.coalesced += 1
+            logger.debug(f"Webhook事件合并: {key}")
+            return {"queued": True, "coalesced": True}
+
+        if len(self._pending) >= self.maxsize:
+            raise WebhookQueueFullError(f"Webhook队列已满: {len(self._pending)}")
+
+        self._pending[key] = (event_type, data, time.monotonic())
+        loop = asyncio.get_running_loop()
+        self._timers[key] = loop.call_later(self.coalesce_seconds, self._dispatch, key)
+        return {"queued": True, "coalesced": False}
+
+    def _dispatch(self, key: Hashable) -> None:
+        """合并窗口结束，交给worker处理"""
+        self._timers.pop(key, None)
+        self._queue.put_nowait(key)
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            key = await self._queue.get()
+            try:
+                if key in self._running:
+                    # 同一键正在处理，事件留在待处理表中继续合并，处理完成后再重新入队
+                    self._followups.add(key)
+                    self.deferred += 1
+                    logger.debug(f"Webhook事件延后处理: {key}")
+                    continue
+
+                item = self._pending.pop(key, None)
+                if item is None:
+                    continue
+
+                event_type, data, enqueued_at = item
+                self._running.add(key)
+                try:
+                    await self._processor(event_type, data)
+                    self.processed += 1
+                    logger.info(f"Webhook事件处理完成: {event_type} key: {key} wait: {time.monotonic() - enqueued_at:.2f}s")
+                except Exception as e:
+                    self.failed += 1
+                    logger.error(f"Webhook事件处理失败: {event_type} key: {key} error: {e}")
+                finally:
+                    self._running.discard(key)
+                    if key in self._followups:
+                        self._followups.discard(key)
+                        # 在task_done之前重新入队，stop()等待队列清空时不会遗漏后续任务
+                        self._queue.put_nowait(key)
+            finally:
+                self._queue.task_done()
+
+    async def start(self) -> None:
+        """启动后台worker"""
+        if self._processor is None:
+            raise RuntimeError("未注册Webhook事件处理函数")
+        if self._worker_tasks:
+            return
+
+        self._queue = asyncio.Queue()
+        self._worker_tasks = [
+            asyncio.create_task(self._worker(i)) for i in range(max(1, self.workers))
+        ]
+        logger.info(f"Webhook队列启动: workers={len(self._worker_tasks)} coalesce={self.coalesce_seconds}s")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """停止队列：立即派发合并窗口内的事件，等待处理完成后关闭worker"""
+        if not self._worker_tasks:
+            return
+
+        for key, timer in list(self._timers.items()):
+            timer.cancel()
+            self._dispatch(key)
+
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Webhook队列关闭超时，丢弃 {len(self._pending)} 个未处理事件")
+
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._queue = None
+
+    def stats(self) -> Dict[str, Any]:
+        """队列统计信息"""
+        return {
+            "pending": len(self._pending),
+            "running": len(self._running),
+            "received": self.received,
+            "coalesced": self.coalesced,
+            "processed": self.processed,
+            "failed": self.failed,
+            "deferred": self.deferred,
+        }
@@ -0,0 +1,110 @@
+"""
+AI响应JSON提取基准测试
+
+对比单次扫描提取与旧的正则清洗提取的耗时和结果，可传入保存下来的真实响应文件:
+    make bench-json FILES="response1.txt response2.txt"
+"""
+import json
+import re
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from app.services.review.json_extract import extract_json
+
+
+def legacy_extract(text: str) -> Dict[str, Any]:
+    """旧的提取方式（整体解析失败后做正则清洗再截取首尾括号），仅用于基准对比"""
+    try:
+        return json.loads(text.strip().lstrip("```json").rstrip("```").strip())
+    except json.JSONDecodeError:
+        pass
+    cleaned = re.sub(r'^#+\s*', '', text, flags=re.MULTILINE)
+    cleaned = re.sub(r'\*\*(.*?)\*\*', r'\1', cleaned)
+    cleaned = re.sub(r'\*(.*?)\*', r'\1', cleaned)
+    start = re.search(r'\{', cleaned)
+    end = re.search(r'\}(?=\s*$)', cleaned)
+    if start and end:
+        cleaned = cleaned[start.start():end.end()]
+    return json.loads(cleaned)
+
+
+def sample_responses(issue_count: int = 400) -> Dict[str, str]:
+    """按真实审查响应的结构生成大尺寸样本"""
+    issues = [
+        {
+            "id": f"issue_{i}",
+            "type": "warning",
+            "severity": "medium",
+            "category": "代码质量",
+            "title": f"第{i}处 **命名** 问题",
+            "description": "变量 `*ptr` 未做空值检查，# 可能导致崩溃。" * 3,
+            "file": f"src/module_{i % 20}.py",
+            "line": i,
+            "suggestion": "**当前代码**:\n```python\nvalue = data['x'] * 2\n```\n\n**建议修改为**:\n```python\nvalue = data.get('x', 0) * 2\n```",
+        }
+        for i in range(issue_count)
+    ]
+    payload = json.dumps({
+        "score": 82,
+        "level": "medium",
+        "summary": "整体质量良好，存在若干 *边界* 处理问题。",
+        "categories": [{"name": "代码质量", "score": 80, "level": "medium", "description": "命名 **不规范**"}],
+        "issues": issues,
+    }, ensure_ascii=False, indent=2)
+    return {
+        "json_mode": payload,
+        "fenced": f"```json\n{payload}\n```",
+        "prose_wrapped": f"# 审查结果\n\n以下是 **审查结论**：\n\n```json\n{payload}\n```\n\n如有疑问请联系。",
+        "inline_prose": f"审查完成，结果如下 {payload} 以上。",
+    }
+
+
+def benchmark(responses: Optional[Dict[str, str]] = None, repeat: int = 20) -> List[Dict[str, Any]]:
+    """
+    对比新旧提取方式的耗时和正确性
+
+    Args:
+        responses: 名称 -> 响应文本，默认使用生成的大尺寸样本
+        repeat: 每个样本重复次数
+
+    Returns:
+        每个样本的统计结果
+    """
+    responses = responses or sample_responses()
+    rows = []
+    for name, text in responses.items():
+        row: Dict[str, Any] = {"name": name, "size_kb": round(len(text.encode("utf-8")) / 1024, 1)}
+        expected = None
+        for label, func in (("new", extract_json), ("legacy", legacy_extract)):
+            started = time.perf_counter()
+            try:
+                for _ in range(repeat):
+                    result = func(text)
+                elapsed = (time.perf_counter() - started) / repeat
+                row[f"{label}_ms"] = round(elapsed * 1000, 3)
+                if label == "new":
+                    expected = result
+                else:
+                    row["legacy_matches"] = result == expected
+            except (ValueError, json.JSONDecodeError) as e:
+                row[f"{label}_ms"] = None
+                row[f"{label}_error"] = str(e)[:80]
+        rows.append(row)
+    return rows
+
+
+def main(files: List[str]) -> None:
+    """运行基准测试并打印结果，files为空时使用生成的样本"""
+    samples = None
+    if files:
+        samples = {}
+        for path in files:
+            with open(path, encoding="utf-8") as f:
+                samples[path] = f.read()
+    for row in benchmark(samples):
+        print(row)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,142 @@
+"""
+大diff分片测试
+"""
+import asyncio
+
+from app.libs.ai_models import get_token_estimator
+from app.services.review.ai_interfaces import (
+    ContextInfo, ModelConfig, ModelProvider, PromptTemplate, ReviewRequest, ReviewResult
+)
+from app.services.review import ai_reviewer as ai_reviewer_module
+from app.services.review.ai_reviewer import AIReviewer
+from app.services.review.chunking import MIN_CHUNK_TOKENS, build_diff_chunks, split_diff_by_file
+from app.services.review.executor import ReviewExecutor
+
+
+def _word_count(text: str) -> int:
+    return len(text.split())
+
+
+def _file_diff(name: str, hunks: int, lines_per_hunk: int = 5) -> str:
+    parts = [f"diff --git a/{name} b/{name}\n--- a/{name}\n+++ b/{name}\n"]
+    for hunk in range(hunks):
+        start = hunk * 100 + 1
+        parts.append(f"@@ -{start},{lines_per_hunk} +{start},{lines_per_hunk} @@\n")
+        parts.extend(f"+{name} hunk {hunk} line {line}\n" for line in range(lines_per_hunk))
+    return "".join(parts)
+
+
+def test_split_diff_by_file_keeps_headers():
+    diff = _file_diff("a.py", 1) + _file_diff("b.py", 2)
+    files = split_diff_by_file(diff)
+    assert len(files) == 2
+    assert files[1].startswith("diff --git a/b.py b/b.py")
+    assert "".join(files) == diff
+
+
+def test_split_build_diff_text_format():
+    diff = "--- a/a.py\n+++ b/a.py\n@@ -1 +1 @@\n+x\n--- a/b.py\n+++ b/b.py\n@@ -1 +1 @@\n+y\n"
+    assert split_diff_by_file(diff) == ["--- a/a.py\n+++ b/a.py\n@@ -1 +1 @@\n+x\n", "--- a/b.py\n+++ b/b.py\n@@ -1 +1 @@\n+y\n"]
+
+
+def test_small_diff_is_single_chunk():
+    diff = _file_diff("a.py", 1) + _file_diff("b.py", 1)
+    assert build_diff_chunks(diff, 10_000, _word_count) == [diff]
+
+
+def test_files_are_packed_within_budget():
+    files = [_file_diff(f"f{i}.py", 3, 20) for i in range(6)]
+    diff = "".join(files)
+    budget = _word_count(files[0]) * 2 + 10
+    chunks = build_diff_chunks(diff, max(budget, MIN_CHUNK_TOKENS), _word_count)
+    assert len(chunks) > 1
+    assert "".join(chunks) == diff
+    assert all(_word_count(chunk) <= max(budget, MIN_CHUNK_TOKENS) for chunk in chunks)
+
+
+def test_oversized_file_is_split_by_hunk_with_header():
+    diff = _file_diff("big.py", 8, 30)
+    chunks = build_diff_chunks(diff, MIN_CHUNK_TOKENS, _word_count)
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk.startswith("diff --git a/big.py b/big.py\n--- a/big.py\n+++ b/big.py\n")
+        assert "\n@@ " in chunk
+
+
+def test_oversized_hunk_is_split_by_line():
+    diff = _file_diff("huge.py", 1, 400)
+    chunks = build_diff_chunks(diff, MIN_CHUNK_TOKENS, _word_count)
+    assert len(chunks) > 1
+    assert all(_word_count(chunk) <= MIN_CHUNK_TOKENS + 10 for chunk in chunks)
+    body = "".join(line for chunk in chunks for line in chunk.splitlines(keepends=True) if line.startswith("+huge"))
+    assert body.count("\n") == 400
+
+
+def test_budget_has_minimum():
+    diff = _file_diff("a.py", 2)
+    assert build_diff_chunks(diff, 1, _word_count) == [diff]
+
+
+def test_chunked_review_reports_failed_chunks(monkeypatch):
+    reviewer = AIReviewer()
+    seen_instructions = []
+
+    async def review_diff(context, code_diff, template, model_config):
+        seen_instructions.append(context.custom_instructions)
+        failed = "f1.py" in code_diff
+        return ReviewResult(
+            score=80,
+            level="low",
+            summary="ok",
+            categories=[],
+            issues=[],
+            error_message="timeout" if failed else None,
+        )
+
+    monkeypatch.setattr(reviewer, "_review_diff", review_diff)
+    diff = "".join(_file_diff(f"f{i}.py", 3, 20) for i in range(3))
+    request = ReviewRequest(
+        code_diff=diff,
+        context=ContextInfo(project_name="demo", mr_title="MR", source_branch="f", target_branch="main", custom_instructions="关注安全"),
+    )
+    model_config = ModelConfig(provider=ModelProvider.OPENAI, model_name="gpt-4o", api_key="test")
+    template = PromptTemplate(name="tpl", content="{{ code_diff }}", variables_schema=[], output_format=None)
+
+    result = asyncio.run(reviewer._review_chunked(request, model_config, template, MIN_CHUNK_TOKENS))
+
+    chunks = build_diff_chunks(diff, MIN_CHUNK_TOKENS, get_token_estimator("openai").count)
+    assert result.chunk_count == len(chunks) > 1
+    assert result.failed_count == sum(1 for chunk in chunks if "f1.py" in chunk)
+    assert result.error_message is None
+    assert all(instructions.startswith("关注安全\n\n本次为分片审查") for instructions in seen_instructions)
+
+
+def test_chunk_requests_respect_model_concurrency(monkeypatch):
+    executor = ReviewExecutor(default_concurrency=2)
+    monkeypatch.setattr(ai_reviewer_module, "review_executor", executor)
+    monkeypatch.setattr(ai_reviewer_module.settings, "REVIEW_CHUNK_CONCURRENCY", 8)
+    active = 0
+    max_active = 0
+
+    async def generate_response(**kwargs):
+        nonlocal active, max_active
+        active += 1
+        max_active = max(max_active, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        raise RuntimeError("stop after request")
+
+    monkeypatch.setattr(ai_reviewer_module.ai_service, "generate_response", generate_response)
+    reviewer = AIReviewer()
+    diff = "".join(_file_diff(f"f{i}.py", 3, 20) for i in range(4))
+    request = ReviewRequest(
+        code_diff=diff,
+        context=ContextInfo(project_name="demo", mr_title="MR", source_branch="f", target_branch="main"),
+    )
+    model_config = ModelConfig(provider=ModelProvider.OPENAI, model_name="unknown-model", api_key="test")
+    template = PromptTemplate(name="tpl", content="{{ code_diff }}", variables_schema=[], output_format=None)
+
+    result = asyncio.run(reviewer._review_chunked(request, model_config, template, MIN_CHUNK_TOKENS))
+
+    assert result.chunk_count > 2
+    assert max_active == 2
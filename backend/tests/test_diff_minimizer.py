@@ -0,0 +1,106 @@
+"""
+diff精简测试
+"""
+from app.services.review.diff_minimizer import DiffMinimizer, is_generated_file
+
+CONTEXT = [f" line{i}" for i in range(10, 20)]
+MOVED_BLOCK = [f"    call_{i}()" for i in range(6)]
+
+
+def _session(**options):
+    return DiffMinimizer(**options).session()
+
+
+def _diff(*lines: str) -> str:
+    return "\n".join(lines) + "\n"
+
+
+def test_whitespace_only_hunk_is_dropped():
+    session = _session()
+    diff = _diff(
+        "@@ -1,2 +1,2 @@", "-a  =  1", "+a = 1", " b",
+        "@@ -20,2 +20,2 @@", "-x = 1", "+x = 2", " y",
+    )
+    result = session.minimize_file("app.js", diff)
+    assert "a = 1" not in result
+    assert result == _diff("@@ -20,2 +20,2 @@", "-x = 1", "+x = 2", " y")
+    assert session.stats.whitespace_hunks == 1
+
+
+def test_lines_reordered_across_context_are_not_whitespace_only():
+    session = _session()
+    diff = _diff("@@ -1,2 +1,2 @@", "-a()", " keep", "+a()")
+    assert session.minimize_file("app.js", diff) == diff
+    assert session.stats.whitespace_hunks == 0
+
+
+def test_indentation_change_is_kept_for_indent_sensitive_files():
+    session = _session()
+    diff = _diff("@@ -1,2 +1,2 @@", " if ok:", "-run()", "+    run()")
+    assert session.minimize_file("app.py", diff) == diff
+    assert session.stats.whitespace_hunks == 0
+
+
+def test_trimmed_context_regenerates_hunk_header_with_original_line_numbers():
+    session = _session(context_lines=1)
+    diff = _diff("@@ -10,10 +10,10 @@ def f():", *CONTEXT[:5], "-old = 1", "+new = 1", *CONTEXT[6:])
+    result = session.minimize_file("app.js", diff)
+    # 变更在第15行，保留前后各1行上下文：旧/新文件都从第14行开始，共3行
+    assert result == _diff("@@ -14,3 +14,3 @@ def f():", " line14", "-old = 1", "+new = 1", " line16")
+    assert session.stats.context_lines == 7
+
+
+def test_unlimited_context_keeps_hunk():
+    session = _session(context_lines=-1)
+    diff = _diff("@@ -10,10 +10,10 @@", *CONTEXT[:5], "-old = 1", "+new = 1", *CONTEXT[6:])
+    assert session.minimize_file("app.js", diff) == diff
+
+
+def test_block_moved_within_file_is_collapsed():
+    session = _session()
+    diff = _diff(
+        "@@ -1,8 +1,2 @@", *("-" + line for line in MOVED_BLOCK), " keep1", " keep2",
+        "@@ -30,2 +24,8 @@", " tail1", *("+" + line for line in MOVED_BLOCK), " tail2",
+    )
+    result = session.minimize_file("app.py", diff)
+    assert "call_0" not in result
+    assert "移动到第25行" in result
+    assert "移动自第1行" in result
+    assert session.stats.moved_blocks == 2
+
+
+def test_block_moved_across_files_is_collapsed():
+    session = _session()
+    removed = _diff("@@ -1,7 +1,1 @@", *("-" + line for line in MOVED_BLOCK), " keep")
+    added = _diff("@@ -1,1 +1,7 @@", " keep", *("+" + line for line in MOVED_BLOCK))
+    session.minimize_file("old.py", removed)
+    result = session.minimize_file("new.py", added)
+    assert "call_0" not in result
+    assert "移动自 old.py" in result
+
+
+def test_short_blocks_are_not_treated_as_moved():
+    session = _session(moved_block_min_lines=5)
+    diff = _diff("@@ -1,3 +1,3 @@", "-a()", "-b()", " keep", "+a()", "+b()")
+    assert session.minimize_file("app.js", diff) == diff
+
+
+def test_generated_files_and_pure_renames_are_collapsed():
+    session = _session()
+    lock = session.minimize_file("web/package-lock.json", _diff("@@ -1,1 +1,1 @@", '-"a": 1', '+"a": 2'))
+    assert lock.startswith("# 锁文件或生成代码") and "+1/-1" in lock
+    assert session.minimize_file("new.py", "", old_path="old.py") == "# 重命名自 old.py，内容未变\n"
+    assert is_generated_file("api_pb2.py", _diff("+# Generated by the protocol buffer compiler.  DO NOT EDIT!"))
+
+
+def test_result_is_never_longer_than_input():
+    session = _session()
+    diff = _diff("@@ -1 +1 @@", "-a", "+a ")
+    assert len(session.minimize_file("app.js", diff)) <= len(diff)
+    assert session.stats.bytes_after <= session.stats.bytes_before
+
+
+def test_disabled_minimizer_returns_diff_unchanged():
+    session = _session(enabled=False)
+    diff = _diff("@@ -1,2 +1,2 @@", "-a  =  1", "+a = 1", " b")
+    assert session.minimize_file("app.js", diff) == diff
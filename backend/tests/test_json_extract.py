@@ -0,0 +1,59 @@
+"""
+AI响应JSON提取测试
+"""
+import json
+
+import pytest
+
+from app.services.review.json_extract import MAX_DECODE_ATTEMPTS, extract_json
+
+PAYLOAD = {
+    "score": 82,
+    "summary": "整体良好，存在 *边界* 问题",
+    "issues": [{"id": "issue_1", "title": "**命名** 问题", "suggestion": "# 注释\n```python\nx = 1\n```"}],
+}
+TEXT = json.dumps(PAYLOAD, ensure_ascii=False, indent=2)
+
+
+def test_plain_json():
+    assert extract_json(TEXT) == PAYLOAD
+
+
+def test_fenced_json_with_surrounding_prose():
+    response = f"# 审查结果\n\n以下是 **结论**：\n\n```json\n{TEXT}\n```\n\n如有疑问请联系。"
+    assert extract_json(response) == PAYLOAD
+
+
+def test_inline_json_keeps_markdown_inside_strings():
+    result = extract_json(f"审查完成，结果如下 {TEXT} 以上。")
+    assert result["issues"][0]["title"] == "**命名** 问题"
+    assert result["summary"] == PAYLOAD["summary"]
+
+
+def test_prefers_object_with_review_fields():
+    response = f'示例格式 {{"file": "a.py"}}，实际结果：{TEXT}'
+    assert extract_json(response) == PAYLOAD
+
+
+def test_falls_back_to_best_partial_object():
+    assert extract_json('说明 {"score": 60} 结束') == {"score": 60}
+
+
+def test_json_mode_rejects_invalid_json():
+    with pytest.raises(ValueError):
+        extract_json(f"```json\n{TEXT}\n```", json_mode=True)
+    with pytest.raises(ValueError):
+        extract_json("[1, 2]", json_mode=True)
+
+
+def test_empty_and_unparseable_responses():
+    with pytest.raises(ValueError):
+        extract_json("")
+    with pytest.raises(ValueError):
+        extract_json("没有JSON {broken")
+
+
+def test_decode_attempts_are_bounded():
+    response = "{" * (MAX_DECODE_ATTEMPTS * 10) + TEXT
+    with pytest.raises(ValueError):
+        extract_json(response)
@@ -0,0 +1,83 @@
+"""
+审查请求预检测试
+"""
+import pytest
+
+from app.core.config import settings
+from app.libs.ai_models import ModelCapabilities, ModelDefinition, ModelPricing, get_token_estimator
+from app.services.review.preflight import ROUTE_CHUNKED, ROUTE_DIRECT, ROUTE_REJECT, preflight_review
+
+FAMILY = "claude"
+OVERHEAD = "你是一个专业的代码审查专家。" + "模板说明 " * 50
+
+
+def _model(context_window: int = 8000, pricing: ModelPricing = None) -> ModelDefinition:
+    return ModelDefinition(
+        id="test-model",
+        provider=FAMILY,
+        base_url="https://api.example.com",
+        name="test-model",
+        display_name="Test Model",
+        capabilities=ModelCapabilities(max_tokens=context_window, context_window=context_window),
+        pricing=pricing,
+    )
+
+
+def _diff(lines: int) -> str:
+    return "".join(f"+value_{i} = compute_something({i})\n" for i in range(lines))
+
+
+@pytest.fixture(autouse=True)
+def _chunk_settings(monkeypatch):
+    monkeypatch.setattr(settings, "REVIEW_CHUNK_ENABLED", True)
+    monkeypatch.setattr(settings, "REVIEW_CHUNK_MIN_TOKENS", 256)
+    monkeypatch.setattr(settings, "REVIEW_MAX_ESTIMATED_COST", 0)
+
+
+def test_small_diff_goes_direct_with_remaining_budget():
+    estimator = get_token_estimator(FAMILY)
+    result = preflight_review(_diff(10), OVERHEAD, _model(), family=FAMILY, output_reserve=1000)
+    assert result.route == ROUTE_DIRECT
+    assert result.overhead_tokens == estimator.count(OVERHEAD) + estimator.tokens_per_message * 2
+    assert result.diff_budget == 8000 - 1000 - result.overhead_tokens
+    assert result.estimated_requests == 1
+
+
+def test_large_diff_is_chunked_with_request_estimate():
+    result = preflight_review(_diff(2000), OVERHEAD, _model(), family=FAMILY, output_reserve=1000)
+    assert result.route == ROUTE_CHUNKED
+    assert result.estimated_requests == -(-result.diff_tokens // result.diff_budget)
+    assert result.prompt_tokens == result.diff_tokens + result.overhead_tokens * result.estimated_requests
+
+
+def test_large_diff_is_rejected_when_chunking_disabled(monkeypatch):
+    monkeypatch.setattr(settings, "REVIEW_CHUNK_ENABLED", False)
+    result = preflight_review(_diff(2000), OVERHEAD, _model(), family=FAMILY, output_reserve=1000)
+    assert result.route == ROUTE_REJECT
+    assert "未启用分片审查" in result.reason
+
+
+def test_overhead_exceeding_window_is_rejected():
+    result = preflight_review(_diff(1), OVERHEAD, _model(context_window=1200), family=FAMILY, output_reserve=1100)
+    assert result.route == ROUTE_REJECT
+    assert result.diff_budget is None
+
+
+def test_unknown_model_is_only_estimated():
+    result = preflight_review(_diff(5000), OVERHEAD, None, family=FAMILY)
+    assert result.route == ROUTE_DIRECT
+    assert result.context_window is None
+    assert result.estimated_cost is None
+
+
+def test_cost_is_estimated_and_capped(monkeypatch):
+    pricing = ModelPricing(input_cost_per_1m=1000.0, output_cost_per_1m=2000.0)
+    result = preflight_review(_diff(10), OVERHEAD, _model(pricing=pricing), family=FAMILY, output_reserve=1000)
+    expected = pricing.calculate_cost(result.prompt_tokens, 1000)
+    assert result.estimated_cost == pytest.approx(expected)
+    assert result.currency == "CNY"
+
+    monkeypatch.setattr(settings, "REVIEW_MAX_ESTIMATED_COST", expected / 2)
+    capped = preflight_review(_diff(10), OVERHEAD, _model(pricing=pricing), family=FAMILY, output_reserve=1000)
+    assert capped.route == ROUTE_REJECT
+    assert "超出单次审查上限" in capped.reason
@@ -0,0 +1,86 @@
+"""
+审查结果合并测试
+"""
+import pytest
+
+from app.services.review.ai_interfaces import ReviewResult
+from app.services.review.result_merger import merge_issues, merge_review_results
+
+
+def _result(score=80, level="low", issues=None, error=None, **kwargs) -> ReviewResult:
+    return ReviewResult(
+        score=score,
+        level=level,
+        summary=f"score {score}",
+        categories=[],
+        issues=issues or [],
+        error_message=error,
+        **kwargs,
+    )
+
+
+def _issue(file, line, title="问题", severity="medium"):
+    return {"file": file, "line": line, "title": title, "severity": severity}
+
+
+def test_merge_requires_results():
+    with pytest.raises(ValueError):
+        merge_review_results([])
+
+
+def test_single_result_is_returned_unchanged():
+    result = _result()
+    assert merge_review_results([result]) is result
+
+
+def test_score_is_weighted_and_level_is_most_severe():
+    merged = merge_review_results(
+        [_result(score=90, level="low"), _result(score=60, level="high")],
+        [300, 100],
+    )
+    assert merged.score == 82
+    assert merged.level == "high"
+    assert merged.failed_count == 0
+
+
+def test_usage_is_summed_and_duration_is_max():
+    merged = merge_review_results([
+        _result(tokens_used=100, prompt_token=80, request_duration=1.5),
+        _result(tokens_used=50, prompt_token=40, request_duration=3.0),
+    ])
+    assert merged.tokens_used == 150
+    assert merged.prompt_token == 120
+    assert merged.request_duration == 3.0
+
+
+def test_issues_are_deduplicated_and_renumbered():
+    issues = merge_issues(
+        [_issue("a.py", 1), _issue("b.py", 2)],
+        [_issue("a.py", 1), _issue("c.py", 3)],
+    )
+    assert [issue["file"] for issue in issues] == ["a.py", "b.py", "c.py"]
+    assert [issue["id"] for issue in issues] == ["issue_1", "issue_2", "issue_3"]
+
+
+def test_partial_failure_is_excluded_and_counted():
+    merged = merge_review_results(
+        [_result(score=90), _result(error="timeout"), _result(score=70)],
+        [100, 100, 100],
+    )
+    assert merged.error_message is None
+    assert merged.score == 80
+    assert merged.failed_count == 1
+    assert "1 个部分审查失败" in merged.summary
+
+
+def test_all_failed_returns_error_result():
+    merged = merge_review_results([_result(error="timeout"), _result(error="rate limited")])
+    assert merged.error_message
+    assert merged.score == 0
+    assert merged.failed_count == 2
+
+
+def test_failed_count_accumulates_across_nested_merges():
+    chunked = merge_review_results([_result(score=90), _result(error="timeout")])
+    merged = merge_review_results([chunked, _result(score=70)])
+    assert merged.failed_count == 1
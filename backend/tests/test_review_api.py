@@ -0,0 +1,55 @@
+"""
+审查API测试
+"""
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import reviews
+from app.core.database import get_session
+from app.core.security import get_current_user
+from app.services.review import ReviewQueueFullError
+from app.services.review.service import ReviewService
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+    app.include_router(reviews.router, prefix="/api/reviews")
+    app.dependency_overrides[get_current_user] = lambda: {"username": "tester"}
+    return TestClient(app)
+
+
+def test_ai_http_stats_is_exposed(monkeypatch):
+    stats = {"openai": {"requests": 3, "connections_opened": 1, "reuse_ratio": 0.67}}
+    monkeypatch.setattr(reviews.ai_service, "get_http_stats", lambda: stats)
+    response = _client().get("/api/reviews/ai-http/stats")
+    assert response.status_code == 200
+    assert response.json() == stats
+
+
+def test_trigger_review_returns_503_when_queue_is_full(monkeypatch):
+    class _Session:
+        async def get(self, model, ident):
+            return SimpleNamespace(id=ident)
+
+        async def scalar(self, statement):
+            return None
+
+    async def override_session():
+        yield _Session()
+
+    async def review_merge_request(self, session, mr, **kwargs):
+        raise ReviewQueueFullError("审查队列已满: 500")
+
+    monkeypatch.setattr(ReviewService, "__init__", lambda self: None)
+    monkeypatch.setattr(ReviewService, "review_merge_request", review_merge_request)
+    client = _client()
+    client.app.dependency_overrides[get_session] = override_session
+
+    response = client.post("/api/reviews/merge-requests/1/trigger")
+    assert response.status_code == 503
+    assert response.json()["detail"] == "审查队列已满: 500"
+
+    response = client.post("/api/reviews/merge-requests/1/review-with-template", params={"template_name": "default"})
+    assert response.status_code == 503
@@ -0,0 +1,92 @@
+"""
+文件级审查缓存测试
+"""
+from app.services.review.ai_interfaces import ReviewResult
+from app.services.review import service as review_service_module
+from app.services.review.review_cache import ReviewCache, issue_matches_file, normalize_file_diff
+from app.services.review.service import ReviewService
+
+FILE_DIFF = (
+    "diff --git a/app.py b/app.py\n"
+    "index 1111111..2222222 100644\n"
+    "--- a/app.py\n"
+    "+++ b/app.py\n"
+    "@@ -10,3 +10,4 @@ def main():\n"
+    " a = 1\n"
+    "+b = 2\n"
+)
+
+
+def test_normalize_ignores_line_numbers_and_index():
+    shifted = FILE_DIFF.replace("@@ -10,3 +10,4 @@", "@@ -42,3 +42,4 @@").replace("1111111..2222222", "abcdef0..1234567")
+    assert normalize_file_diff(shifted) == normalize_file_diff(FILE_DIFF)
+    assert normalize_file_diff(FILE_DIFF.replace("b = 2", "b = 3")) != normalize_file_diff(FILE_DIFF)
+
+
+def test_issue_matches_file_with_prefixes():
+    assert issue_matches_file({"file": "b/src/app.py"}, "src/app.py")
+    assert issue_matches_file({"file": "app.py"}, "src/app.py")
+    assert not issue_matches_file({"file": "src/other.py"}, "src/app.py")
+    assert not issue_matches_file({}, "src/app.py")
+
+
+def test_cache_hits_on_same_template_and_model():
+    cache = ReviewCache(maxsize=10)
+    cache.set(FILE_DIFF, "tpl:1", "model-a", 90, [])
+    assert cache.get(FILE_DIFF, "tpl:1", "model-a") is not None
+    assert cache.get(FILE_DIFF, "tpl:2", "model-a") is None
+    assert cache.get(FILE_DIFF, "tpl:1", "model-b") is None
+
+
+def test_cache_key_includes_instructions():
+    cache = ReviewCache(maxsize=10)
+    cache.set(FILE_DIFF, "tpl:1", "model-a", 90, [], instructions="关注安全问题")
+    assert cache.get(FILE_DIFF, "tpl:1", "model-a", "关注安全问题") is not None
+    assert cache.get(FILE_DIFF, "tpl:1", "model-a") is None
+    assert cache.get(FILE_DIFF, "tpl:1", "model-a", "关注性能问题") is None
+
+
+def test_cache_entry_holds_only_file_data():
+    cache = ReviewCache(maxsize=10)
+    issues = [{"file": "app.py", "line": 11, "title": "命名不规范"}]
+    cache.set(FILE_DIFF, "tpl:1", "model-a", 90, issues)
+    assert cache.get(FILE_DIFF, "tpl:1", "model-a") == {"score": 90, "issues": issues}
+
+
+def test_disabled_cache_never_hits():
+    cache = ReviewCache(maxsize=10, enabled=False)
+    cache.set(FILE_DIFF, "tpl:1", "model-a", 90, [])
+    assert cache.get(FILE_DIFF, "tpl:1", "model-a") is None
+
+
+def _review_result(issues=None, **kwargs) -> ReviewResult:
+    return ReviewResult(score=85, level="low", summary="ok", categories=[], issues=issues or [], **kwargs)
+
+
+def test_partially_failed_result_is_not_cached(monkeypatch):
+    cache = ReviewCache(maxsize=10)
+    monkeypatch.setattr(review_service_module, "review_cache", cache)
+    ReviewService._store_review_cache(_review_result(failed_count=1), {"app.py": FILE_DIFF}, "tpl:1", "model-a")
+    assert cache.get(FILE_DIFF, "tpl:1", "model-a") is None
+
+    ReviewService._store_review_cache(_review_result(), {"app.py": FILE_DIFF}, "tpl:1", "model-a")
+    assert cache.get(FILE_DIFF, "tpl:1", "model-a") is not None
+
+
+def test_chunked_result_is_not_cached(monkeypatch):
+    cache = ReviewCache(maxsize=10)
+    monkeypatch.setattr(review_service_module, "review_cache", cache)
+    ReviewService._store_review_cache(_review_result(chunk_count=3), {"app.py": FILE_DIFF}, "tpl:1", "model-a")
+    assert cache.get(FILE_DIFF, "tpl:1", "model-a") is None
+
+
+def test_stored_issues_are_filtered_per_file(monkeypatch):
+    cache = ReviewCache(maxsize=10)
+    monkeypatch.setattr(review_service_module, "review_cache", cache)
+    other_diff = FILE_DIFF.replace("app.py", "util.py")
+    issues = [{"file": "app.py", "line": 11, "title": "A"}, {"file": "util.py", "line": 11, "title": "B"}]
+    ReviewService._store_review_cache(
+        _review_result(issues=issues), {"app.py": FILE_DIFF, "util.py": other_diff}, "tpl:1", "model-a", "说明"
+    )
+    assert [issue["title"] for issue in cache.get(FILE_DIFF, "tpl:1", "model-a", "说明")["issues"]] == ["A"]
+    assert [issue["title"] for issue in cache.get(other_diff, "tpl:1", "model-a", "说明")["issues"]] == ["B"]
@@ -0,0 +1,159 @@
+"""
+合并请求统计过期与按需刷新测试
+"""
+import asyncio
+from datetime import datetime, timezone
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.database import Base
+from app.libs.gitlabx.models import MergeRequestInfo, UserInfo
+from app.models import MergeRequest, MergeRequestSyncState, Project
+from app.services.sync import service as sync_module
+from app.services.sync.service import SyncService
+
+UPDATED_AT = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+
+class _FailingGitLab:
+    async def get_merge_request(self, project_id, mr_iid):
+        raise RuntimeError("gitlab unavailable")
+
+
+class _StubGitLab:
+    async def get_merge_request(self, project_id, mr_iid):
+        return _mr_info("new-sha")
+
+    async def get_merge_request_changes_stats(self, project_id, mr_iid):
+        return {"additions": 7, "deletions": 2, "files": 1}
+
+    async def get_merge_request_commits(self, project_id, mr_iid):
+        return []
+
+
+def _mr_info(sha: str) -> MergeRequestInfo:
+    return MergeRequestInfo(
+        id=101,
+        iid=1,
+        title="MR 1",
+        state="opened",
+        source_branch="feature",
+        target_branch="main",
+        author=UserInfo(id=1, username="dev", name="Dev"),
+        web_url="https://gitlab.example.com/mr/1",
+        created_at=UPDATED_AT,
+        updated_at=UPDATED_AT,
+        sha=sha,
+    )
+
+
+async def _with_session(scenario):
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+
+    # pysqlite默认不发出BEGIN，RELEASE SAVEPOINT会直接提交，按SQLAlchemy文档的方式自行开启事务
+    @event.listens_for(engine.sync_engine, "connect")
+    def _disable_pysqlite_transaction(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine.sync_engine, "begin")
+    def _begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    try:
+        async with session_factory() as session:
+            project = Project(gitlab_id=10, name="demo", namespace="group", web_url="https://gitlab.example.com/demo")
+            session.add(project)
+            await session.flush()
+            mr = MergeRequest(
+                gitlab_id=1,
+                project_id=project.id,
+                title="MR 1",
+                author="dev",
+                source_branch="feature",
+                target_branch="main",
+                state="opened",
+                mr_created_at=UPDATED_AT,
+                mr_updated_at=UPDATED_AT,
+                last_commit_sha="new-sha",
+            )
+            session.add(mr)
+            await session.flush()
+            # webhook已写入新SHA，统计仍对应旧SHA
+            session.add(MergeRequestSyncState(merge_request_id=mr.id, stats_commit_sha="old-sha"))
+            await session.commit()
+            return await scenario(session, project, mr)
+    finally:
+        await engine.dispose()
+
+
+def test_batch_sync_refetches_mr_with_stale_stats(monkeypatch):
+    service = SyncService()
+    fetched = []
+    upserted = []
+
+    async def fetch_details(project, mr_iid):
+        fetched.append(mr_iid)
+        return {"additions": 3, "deletions": 1, "files": 2}, []
+
+    async def upsert(session, rows, existing_keys=None):
+        upserted.extend(rows)
+        return {"created": 0, "updated": len(rows)}
+
+    monkeypatch.setattr(service, "_fetch_mr_details", fetch_details)
+    monkeypatch.setattr(sync_module, "upsert_merge_requests", upsert)
+
+    async def scenario(session, project, mr):
+        # 更新时间和SHA都与库中一致，只有统计过期
+        result = await service._sync_merge_request_batch(session, project, [_mr_info("new-sha")])
+        state = await session.execute(
+            select(MergeRequestSyncState).where(MergeRequestSyncState.merge_request_id == mr.id)
+        )
+        return result, state.scalar_one_or_none()
+
+    result, state = asyncio.run(_with_session(scenario))
+    assert fetched == [1]
+    assert upserted[0]["additions_count"] == 3
+    assert result["updated"] == 1
+    assert result["complete"] is True
+    assert state is None
+
+
+def test_ensure_stats_keeps_caller_transaction_open_on_failure():
+    service = SyncService()
+    service._gitlab_client = _FailingGitLab()
+
+    async def scenario(session, project, mr):
+        # 调用方（审查）在同一会话中的未提交修改
+        mr.title = "edited by review"
+        refreshed = await service.ensure_merge_request_stats(session, project, mr)
+        assert session.in_transaction()
+        await session.rollback()
+        await session.refresh(mr)
+        return refreshed, mr.title
+
+    refreshed, title = asyncio.run(_with_session(scenario))
+    assert refreshed is True
+    # 没有被刷新逻辑提交
+    assert title == "MR 1"
+
+
+def test_ensure_stats_refreshes_without_committing():
+    service = SyncService()
+    service._gitlab_client = _StubGitLab()
+
+    async def scenario(session, project, mr):
+        refreshed = await service.ensure_merge_request_stats(session, project, mr)
+        additions = mr.additions_count
+        await session.rollback()
+        await session.refresh(mr)
+        return refreshed, additions, mr.additions_count
+
+    refreshed, additions, after_rollback = asyncio.run(_with_session(scenario))
+    assert refreshed is True
+    assert additions == 7
+    # 刷新结果留在调用方事务中，由调用方决定提交
+    assert after_rollback == 0
@@ -0,0 +1,124 @@
+"""
+批量写入（Upsert）测试
+"""
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import mysql, postgresql
+
+from app.services.sync.upsert import upsert_merge_requests, upsert_projects
+
+NOW = datetime(2024, 1, 1, tzinfo=timezone.utc)
+DIALECTS = {"mysql": mysql.dialect(), "postgresql": postgresql.dialect()}
+
+
+class _Result:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def fetchall(self):
+        return self._rows
+
+
+class _FakeSession:
+    """记录执行的语句，查询返回预设的已有记录"""
+
+    def __init__(self, dialect: str, existing_rows=()):
+        self.dialect = dialect
+        self.existing_rows = list(existing_rows)
+        self.statements = []
+
+    def get_bind(self):
+        return SimpleNamespace(dialect=SimpleNamespace(name=self.dialect))
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return _Result(self.existing_rows)
+
+    def sql(self, index: int = -1) -> str:
+        return str(self.statements[index].compile(dialect=DIALECTS[self.dialect]))
+
+
+def _project_row(gitlab_id: int):
+    return {"gitlab_id": gitlab_id, "name": f"p{gitlab_id}", "namespace": "group", "web_url": "https://x", "updated_at": NOW}
+
+
+def _mr_row(gitlab_id: int, project_id: int = 1):
+    return {
+        "project_id": project_id,
+        "gitlab_id": gitlab_id,
+        "title": f"MR {gitlab_id}",
+        "state": "opened",
+        "mr_created_at": NOW,
+        "mr_updated_at": NOW,
+        "created_at": NOW,
+        "updated_at": NOW,
+    }
+
+
+@pytest.mark.parametrize("dialect", ["mysql", "postgresql"])
+def test_upsert_projects_counts_created_and_updated(dialect):
+    session = _FakeSession(dialect, existing_rows=[(2,)])
+    result = asyncio.run(upsert_projects(session, [_project_row(1), _project_row(2), _project_row(3)]))
+    assert result == {"created": 2, "updated": 1}
+    assert len(session.statements) == 2
+
+
+def test_upsert_projects_without_rows_does_nothing():
+    session = _FakeSession("mysql")
+    assert asyncio.run(upsert_projects(session, [])) == {"created": 0, "updated": 0}
+    assert session.statements == []
+
+
+def test_upsert_merge_requests_uses_given_existing_keys():
+    session = _FakeSession("postgresql")
+    rows = [_mr_row(1), _mr_row(2), _mr_row(3)]
+    result = asyncio.run(upsert_merge_requests(session, rows, existing_keys={(1, 1), (1, 3), (2, 9)}))
+    assert result == {"created": 1, "updated": 2}
+    # 已提供已有记录时只执行写入语句
+    assert len(session.statements) == 1
+
+
+def test_upsert_merge_requests_queries_existing_keys():
+    session = _FakeSession("mysql", existing_rows=[(1, 2)])
+    result = asyncio.run(upsert_merge_requests(session, [_mr_row(1), _mr_row(2)]))
+    assert result == {"created": 1, "updated": 1}
+    assert len(session.statements) == 2
+
+
+def test_postgresql_upsert_keeps_creation_columns():
+    session = _FakeSession("postgresql")
+    asyncio.run(upsert_merge_requests(session, [_mr_row(1)], existing_keys=set()))
+    sql = session.sql()
+    assert "ON CONFLICT (project_id, gitlab_id) DO UPDATE SET" in sql
+    update_clause = sql.split("DO UPDATE SET", 1)[1]
+    assert "title = excluded.title" in update_clause
+    assert "updated_at = now()" in update_clause
+    for column in ("mr_created_at", "created_at =", "gitlab_id ="):
+        assert column not in update_clause
+
+
+def test_mysql_upsert_uses_on_duplicate_key_update():
+    session = _FakeSession("mysql")
+    asyncio.run(upsert_merge_requests(session, [_mr_row(1)], existing_keys=set()))
+    sql = session.sql()
+    assert "ON DUPLICATE KEY UPDATE" in sql
+    assert "mr_created_at = " not in sql.split("ON DUPLICATE KEY UPDATE", 1)[1]
+
+
+def test_unsupported_dialect_raises():
+    session = _FakeSession("sqlite")
+    with pytest.raises(ValueError):
+        asyncio.run(upsert_merge_requests(session, [_mr_row(1)], existing_keys=set()))
+
+
+def test_rows_with_different_columns_are_written_separately():
+    session = _FakeSession("postgresql")
+    with_count = dict(_mr_row(2), changes_count=4)
+    result = asyncio.run(upsert_merge_requests(session, [_mr_row(1), with_count, _mr_row(3)], existing_keys={(1, 1)}))
+    assert result == {"created": 2, "updated": 1}
+    assert len(session.statements) == 2
+    assert "changes_count = excluded.changes_count" not in session.sql(0)
+    assert "changes_count = excluded.changes_count" in session.sql(1)
@@ -0,0 +1,161 @@
+"""
+MR增量同步水位线测试
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.libs.gitlabx.models import MergeRequestInfo, PaginationInfo, UserInfo
+from app.models import ProjectSyncState
+from app.services.sync import service as sync_module
+from app.services.sync.parallel import PartialFetchError, fetch_all_pages
+from app.services.sync.service import SyncService
+
+BASE_TIME = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def _mr(iid: int, minutes: int) -> MergeRequestInfo:
+    return MergeRequestInfo(
+        id=1000 + iid,
+        iid=iid,
+        title=f"MR {iid}",
+        state="opened",
+        source_branch="feature",
+        target_branch="main",
+        author=UserInfo(id=1, username="dev", name="Dev"),
+        web_url=f"https://gitlab.example.com/mr/{iid}",
+        created_at=BASE_TIME,
+        updated_at=BASE_TIME + timedelta(minutes=minutes),
+        sha=f"sha{iid}",
+    )
+
+
+class _FakeResult:
+    def fetchall(self):
+        return []
+
+
+class _FakeSavepoint:
+    def __init__(self, session):
+        self.session = session
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.session.rollbacks += 1
+        return False
+
+
+class _FakeSession:
+    """只支持批量同步查询已有MR（返回空结果）和保存点"""
+
+    def __init__(self):
+        self.rollbacks = 0
+
+    async def execute(self, statement):
+        return _FakeResult()
+
+    def begin_nested(self):
+        return _FakeSavepoint(self)
+
+
+def _fetcher(pages, failing=()):
+    async def fetch_page(page):
+        if page in failing:
+            raise RuntimeError(f"page {page} failed")
+        return pages[page - 1], PaginationInfo(
+            page=page, total_pages=len(pages), has_next=page < len(pages)
+        )
+    return fetch_page
+
+
+def test_fetch_all_pages_returns_all_items():
+    items = asyncio.run(fetch_all_pages(_fetcher([[1, 2], [3], [4]]), 2))
+    assert items == [1, 2, 3, 4]
+
+
+def test_fetch_all_pages_raises_on_failed_page():
+    with pytest.raises(PartialFetchError) as exc_info:
+        asyncio.run(fetch_all_pages(_fetcher([[1, 2], [3], [4]], failing={2}), 2))
+    assert exc_info.value.items == [1, 2, 4]
+    assert exc_info.value.failed_pages == [2]
+
+
+def test_fetch_all_pages_sequential_raises_on_failed_page():
+    async def fetch_page(page):
+        if page == 3:
+            raise RuntimeError("boom")
+        return [page], PaginationInfo(page=page, has_next=True)
+
+    with pytest.raises(PartialFetchError) as exc_info:
+        asyncio.run(fetch_all_pages(fetch_page, 2))
+    assert exc_info.value.items == [1, 2]
+    assert exc_info.value.failed_pages == [3]
+
+
+def test_advance_watermark_uses_latest_saved_mr():
+    state = ProjectSyncState(project_id=1, mr_updated_watermark=BASE_TIME)
+    SyncService()._advance_watermark(state, [_mr(1, 5), _mr(2, 30)], BASE_TIME)
+    assert state.mr_updated_watermark == BASE_TIME + timedelta(minutes=30)
+
+
+def test_advance_watermark_keeps_position_when_incomplete():
+    state = ProjectSyncState(project_id=1, mr_updated_watermark=BASE_TIME)
+    SyncService()._advance_watermark(state, [_mr(1, 30)], BASE_TIME, complete=False)
+    assert state.mr_updated_watermark == BASE_TIME
+
+
+def _batch_service(monkeypatch, failing_iids=(), upsert_error=None):
+    service = SyncService()
+
+    async def fetch_details(project, mr_iid):
+        if mr_iid in failing_iids:
+            raise RuntimeError("detail failed")
+        return {"additions": 1, "deletions": 1, "files": 1}, []
+
+    async def upsert(session, rows, existing_keys=None):
+        if upsert_error:
+            raise upsert_error
+        return {"created": len(rows), "updated": 0}
+
+    monkeypatch.setattr(service, "_fetch_mr_details", fetch_details)
+    monkeypatch.setattr(sync_module, "upsert_merge_requests", upsert)
+    return service
+
+
+def test_batch_reports_only_saved_mrs_on_detail_failure(monkeypatch):
+    service = _batch_service(monkeypatch, failing_iids={2})
+    project = SimpleNamespace(id=1, name="demo", gitlab_id=10)
+    result = asyncio.run(
+        service._sync_merge_request_batch(_FakeSession(), project, [_mr(1, 5), _mr(2, 30)])
+    )
+    assert [mr.iid for mr in result["saved"]] == [1]
+    assert result["synced"] == 1
+    assert result["complete"] is False
+
+
+def test_batch_reports_nothing_saved_on_upsert_failure(monkeypatch):
+    service = _batch_service(monkeypatch, upsert_error=RuntimeError("db down"))
+    project = SimpleNamespace(id=1, name="demo", gitlab_id=10)
+    session = _FakeSession()
+    result = asyncio.run(
+        service._sync_merge_request_batch(session, project, [_mr(1, 5)])
+    )
+    assert result["saved"] == []
+    assert result["complete"] is False
+    # 失败的批次只回滚自己的保存点
+    assert session.rollbacks == 1
+
+
+def test_merge_request_row_keeps_changes_count_without_stats():
+    project = SimpleNamespace(id=1)
+    service = SyncService()
+    assert "changes_count" not in service._build_merge_request_row(project, _mr(1, 5), None, [])
+    row = service._build_merge_request_row(project, _mr(1, 5), {"files": 3, "additions": 1, "deletions": 2}, [])
+    assert row["changes_count"] == 3
+    listed = _mr(2, 5).model_copy(update={"changes_count": 7})
+    assert service._build_merge_request_row(project, listed, None, [])["changes_count"] == 7
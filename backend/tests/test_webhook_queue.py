@@ -0,0 +1,98 @@
+"""
+Webhook事件队列测试
+"""
+import asyncio
+
+from app.services.webhook.queue import WebhookQueue
+
+
+def _mr_event(iid: int, action: str):
+    return {"project": {"id": 1}, "object_attributes": {"iid": iid, "action": action}}
+
+
+def test_events_within_window_are_coalesced():
+    async def scenario():
+        calls = []
+
+        async def processor(event_type, data):
+            calls.append(data["object_attributes"]["action"])
+
+        queue = WebhookQueue(coalesce_seconds=0.01, workers=2)
+        queue.set_processor(processor)
+        await queue.start()
+        assert queue.enqueue("Merge Request Hook", _mr_event(1, "open"))["coalesced"] is False
+        assert queue.enqueue("Merge Request Hook", _mr_event(1, "update"))["coalesced"] is True
+        await queue.stop()
+        return calls, queue.stats()
+
+    calls, stats = asyncio.run(scenario())
+    assert calls == ["update"]
+    assert stats["coalesced"] == 1
+    assert stats["processed"] == 1
+
+
+def test_same_key_is_not_processed_concurrently():
+    async def scenario():
+        calls = []
+        active = 0
+        max_active = 0
+        release = asyncio.Event()
+        started = asyncio.Event()
+
+        async def processor(event_type, data):
+            nonlocal active, max_active
+            active += 1
+            max_active = max(max_active, active)
+            calls.append(data["object_attributes"]["action"])
+            started.set()
+            if len(calls) == 1:
+                await release.wait()
+            active -= 1
+
+        queue = WebhookQueue(coalesce_seconds=0.01, workers=3)
+        queue.set_processor(processor)
+        await queue.start()
+
+        queue.enqueue("Merge Request Hook", _mr_event(1, "open"))
+        await asyncio.wait_for(started.wait(), timeout=1)
+        # 第一次处理进行中，后续事件超过合并窗口后被派发
+        queue.enqueue("Merge Request Hook", _mr_event(1, "update"))
+        await asyncio.sleep(0.05)
+        queue.enqueue("Merge Request Hook", _mr_event(1, "approved"))
+        await asyncio.sleep(0.05)
+        assert calls == ["open"]
+
+        release.set()
+        await queue.stop()
+        return calls, max_active, queue.stats()
+
+    calls, max_active, stats = asyncio.run(scenario())
+    assert max_active == 1
+    # 处理期间到达的事件合并为一次后续处理，使用最新的数据
+    assert calls == ["open", "approved"]
+    assert stats["deferred"] >= 1
+    assert stats["running"] == 0
+
+
+def test_different_keys_run_in_parallel():
+    async def scenario():
+        both_started = asyncio.Event()
+        started = set()
+
+        async def processor(event_type, data):
+            started.add(data["object_attributes"]["iid"])
+            if len(started) == 2:
+                both_started.set()
+            await asyncio.wait_for(both_started.wait(), timeout=1)
+
+        queue = WebhookQueue(coalesce_seconds=0.01, workers=2)
+        queue.set_processor(processor)
+        await queue.start()
+        queue.enqueue("Merge Request Hook", _mr_event(1, "open"))
+        queue.enqueue("Merge Request Hook", _mr_event(2, "open"))
+        await queue.stop()
+        return queue.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["processed"] == 2
+    assert stats["failed"] == 0